@@ -12,6 +12,7 @@
 
 #include <pluginlib/class_loader.h>
 #include <std_srvs/Empty.h>
+#include <tf/transform_listener.h>
 
 namespace mrta_planner_service
 {
@@ -19,7 +20,6 @@ namespace mrta_planner_service
     costmap_2d::Costmap2DROS *planner_costmap_ros_;
 
     boost::shared_ptr<nav_core::BaseGlobalPlanner> planner_;
-    pluginlib::ClassLoader<nav_core::BaseGlobalPlanner> bgp_loader_;
 }
 
 #endif //MRTA_MRTA_PLANNER_SERVICE_H
@@ -0,0 +1,230 @@
+""" agenda_tour
+
+This class keeps track of the order in which a robot will perform the
+(uncompleted) tasks in its agenda, and of what that tour costs.
+
+Rather than solving the tour again every time the robot bids, the tour is
+updated as things change:
+
+  - When a task is won, it is inserted where it adds the least cost.
+  - When a task is completed, it is removed and its neighbours are joined.
+  - When the robot moves, the tour is "re-rooted" at its new position: only
+    the cost of the first leg changes, and that is looked up lazily (when
+    the tour's cost is next needed), so pose updates stay cheap.
+
+Each of these needs at most one distance field's worth of path costs, no
+matter how long the agenda is. optimize() solves the whole tour again (see
+mrta.tour.solve_tour()) when there's time to do so.
+
+The tour's cost is the sum of its legs: the path cost from the robot to the
+first task, then from each task to the next.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import math
+
+import numpy as np
+
+import mrta.cost_oracle
+import mrta.tour
+
+
+class AgendaTour(object):
+
+    def __init__(self, path_costs, tolerance=0.1, time_budget=mrta.tour.DEFAULT_TIME_BUDGET):
+        """
+        :param path_costs: a function that takes a start pose and a list of
+                           goal poses and returns a list of path costs (e.g.,
+                           RobotController.get_path_costs())
+        :param float tolerance: how far (in meters) the robot may move before
+                                the first leg's cost is looked up again
+        :param float time_budget: seconds that optimize() may spend improving
+                                  large tours (see mrta.tour.solve_tour())
+        """
+        self.path_costs = path_costs
+        self.tolerance = tolerance
+        self.time_budget = time_budget
+
+        # Where the tour starts (the robot's position)
+        self.start = None
+
+        # The robot's latest position, set by set_start(). Applied before the
+        # tour is next used.
+        self._pending_start = None
+
+        # Tasks, in the order they'll be performed, and their poses
+        self.tasks = []
+        self.poses = []
+
+        # legs[i] is the path cost to tasks[i] from tasks[i - 1] (or from
+        # start, for i == 0). legs[0] is None if it needs to be looked up.
+        self.legs = []
+
+    def __len__(self):
+        return len(self.tasks)
+
+    def copy(self):
+        """ A copy of the tour, which can be used (e.g., to value bids) while
+        this one changes.
+        """
+        self._apply_start()
+
+        tour = AgendaTour(self.path_costs, self.tolerance, self.time_budget)
+        tour.start = self.start
+        tour.tasks = list(self.tasks)
+        tour.poses = list(self.poses)
+        tour.legs = list(self.legs)
+
+        return tour
+
+    def set_start(self, pose):
+        """ Re-root the tour at pose (e.g., the robot's current position). This
+        is cheap enough to call on every pose update.
+        """
+        self._pending_start = pose
+
+    def _apply_start(self):
+        pose = self._pending_start
+        if pose is None or pose is self.start:
+            return
+
+        if self.start is not None:
+            start_x, start_y = mrta.cost_oracle.xy(self.start)
+            x, y = mrta.cost_oracle.xy(pose)
+            if math.hypot(x - start_x, y - start_y) <= self.tolerance:
+                return
+
+        self.start = pose
+
+        if self.legs:
+            self.legs[0] = None
+
+    def _refresh(self):
+        """ Look up the first leg's cost, if we need to """
+        self._apply_start()
+
+        if self.legs and self.legs[0] is None:
+            self.legs[0] = self.path_costs(self.start, [self.poses[0]])[0]
+
+    @property
+    def cost(self):
+        """ The cost of the whole tour """
+        self._refresh()
+        return float(sum(self.legs))
+
+    @property
+    def end_pose(self):
+        """ Where the tour ends: the last task's pose, or start if there are no tasks """
+        self._apply_start()
+
+        if self.poses:
+            return self.poses[-1]
+
+        return self.start
+
+    def insertion(self, pose, costs=None):
+        """
+        Find where a task at pose would add the least cost to the tour. The
+        tour isn't changed.
+
+        :param geometry_msgs.msg.Pose pose: the new task's pose
+        :param float[] costs: the path costs from pose to start and to each
+                              task, if they've already been looked up
+        :return: the cost it adds and the position (index into tasks) to insert it at
+        :rtype: (float, int)
+        """
+        added, position, costs = self._insertion(pose, costs)
+        return added, position
+
+    def _insertion(self, pose, costs=None):
+        """ As insertion(), but also returns the path costs from pose to
+        start and to every task.
+        """
+        self._refresh()
+
+        # Path costs from the new task to start and to every task
+        if costs is None:
+            costs = self.path_costs(pose, [self.start] + self.poses)
+
+        # Appending it to the end of the tour...
+        best_position = len(self.tasks)
+        best_added = costs[-1]
+
+        # ...or inserting it before tasks[position]
+        for position in xrange(len(self.tasks)):
+            added = costs[position] + costs[position + 1] - self.legs[position]
+
+            if added < best_added:
+                best_added = added
+                best_position = position
+
+        return float(best_added), best_position, costs
+
+    def insert(self, task, pose, costs=None):
+        """ Insert task (at pose) into the tour where it adds the least cost
+        (see insertion())
+
+        :return: the cost it added
+        :rtype: float
+        """
+        added, position, costs = self._insertion(pose, costs)
+
+        # The leg to the new task and, unless it's last, the leg from it
+        new_legs = [costs[position]]
+        if position < len(self.tasks):
+            new_legs.append(costs[position + 1])
+
+        self.tasks.insert(position, task)
+        self.poses.insert(position, pose)
+        self.legs[position:position + 1] = new_legs
+
+        return added
+
+    def remove(self, task):
+        """ Remove task from the tour (e.g., when it has been completed) """
+        if task not in self.tasks:
+            return
+
+        position = self.tasks.index(task)
+
+        del self.tasks[position]
+        del self.poses[position]
+        del self.legs[position]
+
+        # Join the task's neighbours
+        if position < len(self.tasks):
+            if position == 0:
+                self.legs[0] = None
+            else:
+                self.legs[position] = self.path_costs(self.poses[position - 1], [self.poses[position]])[0]
+
+    def clear(self):
+        """ Remove every task from the tour """
+        del self.tasks[:]
+        del self.poses[:]
+        del self.legs[:]
+
+    def optimize(self):
+        """ Solve the whole tour again, from scratch """
+        self._apply_start()
+
+        if not self.tasks:
+            return
+
+        # Path costs between start and every task, one row at a time
+        all_poses = [self.start] + self.poses
+        costs = np.array([self.path_costs(p, all_poses) for p in all_poses], dtype=np.float64)
+
+        tour, cost = mrta.tour.solve_tour(costs, time_budget=self.time_budget)
+
+        # Large tours aren't solved optimally, so keep the order we have if
+        # it's no worse
+        current_tour = range(len(all_poses))
+        if mrta.tour.tour_cost(costs, current_tour) <= cost:
+            tour = current_tour
+
+        # Node 0 is start, node i is tasks[i - 1]
+        self.tasks = [self.tasks[node - 1] for node in tour[1:]]
+        self.poses = [self.poses[node - 1] for node in tour[1:]]
+        self.legs = [float(costs[tour[i], tour[i + 1]]) for i in xrange(len(tour) - 1)]
@@ -0,0 +1,243 @@
+""" bid_matrix
+
+This class stores the bids received in an auction round in a dense matrix,
+with a row per robot and a column per "item" that robots bid on:
+
+  - In single-item rounds (OSI, PSI, SSI, ...), an item is a task.
+
+  - In combinatorial rounds (SUM, MAX), an item is a bundle of tasks,
+    identified by a bitmask over the round's tasks (bit i is set if the
+    bundle includes task i, as in mrta.bundle_valuation). Column 0, the empty
+    bundle, is never bid on.
+
+Robots get a row when they first bid. Items that a robot hasn't bid on hold
+MISSING, so the lowest bids can be found with numpy (e.g., argpartition)
+without looking at which bids are there. The number of bids received is
+kept as bids arrive, so counting them takes constant time.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import numpy as np
+
+import mrta.bundle_valuation
+
+# The value of a bid that hasn't been received
+MISSING = np.inf
+
+
+class BidMatrix(object):
+
+    def __init__(self, task_ids, combinatorial=False):
+        """
+        :param str[] task_ids: the ids of the tasks announced in the round
+        :param bool combinatorial: True if robots bid on bundles of tasks,
+                                   False if they bid on single tasks
+        """
+        self.task_ids = list(task_ids)
+        self.combinatorial = combinatorial
+
+        # Column (or bit, for bundles) of each task
+        self.task_index = dict((task_id, i) for i, task_id in enumerate(self.task_ids))
+
+        if combinatorial:
+            self.num_items = 1 << len(self.task_ids)
+        else:
+            self.num_items = len(self.task_ids)
+
+        # Row of each robot, in the order they first bid, and how many
+        # (distinct) bids it has made
+        self.robot_ids = []
+        self.robot_index = {}
+        self.robot_counts = []
+
+        self.values = np.full((0, self.num_items), MISSING)
+
+        # The number of (distinct) bids received
+        self.count = 0
+
+    def __len__(self):
+        """ The number of robots that have bid """
+        return len(self.robot_ids)
+
+    def _row(self, robot_id):
+        """ The robot's row, which is added if it hasn't bid before """
+        if robot_id not in self.robot_index:
+            self.robot_index[robot_id] = len(self.robot_ids)
+            self.robot_ids.append(robot_id)
+            self.robot_counts.append(0)
+            self.values = np.vstack((self.values, np.full((1, self.num_items), MISSING)))
+
+        return self.robot_index[robot_id]
+
+    def robot_count(self, robot_id):
+        """ The number of (distinct) bids robot_id has made """
+        if robot_id not in self.robot_index:
+            return 0
+
+        return self.robot_counts[self.robot_index[robot_id]]
+
+    def item(self, task_ids):
+        """ The column of the bid on task_ids (a task id, for single-item
+        rounds, or a tuple of task ids), or None if it isn't in this round
+        """
+        if isinstance(task_ids, basestring):
+            task_ids = (task_ids,)
+
+        try:
+            indices = [self.task_index[task_id] for task_id in task_ids]
+        except KeyError:
+            return None
+
+        if self.combinatorial:
+            return sum(1 << i for i in set(indices)) or None
+
+        if len(indices) != 1:
+            return None
+
+        return indices[0]
+
+    def get(self, robot_id, task_ids, default=None):
+        """ The robot's bid on task_ids (see item()), or default if it hasn't bid """
+        column = self.item(task_ids)
+
+        if column is None or robot_id not in self.robot_index:
+            return default
+
+        value = self.values[self.robot_index[robot_id], column]
+
+        if value == MISSING:
+            return default
+
+        return float(value)
+
+    def _set(self, row, columns, values):
+        """ Record bids in row, counting the ones we didn't have yet """
+        columns = np.asarray(columns, dtype=np.int64)
+
+        new_count = len(np.unique(columns[self.values[row, columns] == MISSING]))
+        self.count += new_count
+        self.robot_counts[row] += new_count
+
+        self.values[row, columns] = values
+
+    def add(self, robot_id, task_ids, value):
+        """
+        Record a bid
+
+        :param str robot_id: name of the bidding robot
+        :param task_ids: the tasks bid on (see item())
+        :param float value: the bid
+        :return: False if the tasks aren't in this round (so the bid was ignored)
+        :rtype: bool
+        """
+        column = self.item(task_ids)
+        if column is None:
+            return False
+
+        self._set(self._row(robot_id), [column], [float(value)])
+
+        return True
+
+    def add_bundles(self, robot_id, task_ids, bundles, values):
+        """
+        Record a robot's bids on bundles of tasks (e.g., from a mrta.msg.TaskBids message)
+
+        :param str robot_id: name of the bidding robot
+        :param str[] task_ids: the tasks that bundles are bitmasks over
+        :param int[] bundles: bitmasks over task_ids
+        :param float[] values: the bids
+        :return: the number of bids recorded (bids on tasks that aren't in
+                 this round are ignored)
+        :rtype: int
+        """
+        bundles = np.asarray(bundles, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+
+        if list(task_ids) == self.task_ids and self.combinatorial:
+            # Bundles are already our columns
+            columns = bundles
+        else:
+            columns = np.array([self.item([task_ids[i] for i in mrta.bundle_valuation.mask_indices(int(bundle))])
+                                for bundle in bundles])
+            known = np.array([c is not None for c in columns], dtype=bool)
+            columns = columns[known].astype(np.int64)
+            values = values[known]
+
+        if len(columns):
+            self._set(self._row(robot_id), columns, values)
+
+        return len(columns)
+
+    def values_excluding(self, exclude):
+        """ A copy of values in which the bids of robots in exclude[task_id]
+        (e.g., those already awarded the task) are MISSING. Single-item rounds only.
+        """
+        values = self.values.copy()
+
+        if exclude:
+            for task_id, column in self.task_index.items():
+                for robot_id in exclude.get(task_id, ()):
+                    if robot_id in self.robot_index:
+                        values[self.robot_index[robot_id], column] = MISSING
+
+        return values
+
+    def lowest(self, k, exclude=None):
+        """
+        The robots with the k lowest bids on each task, lowest first. Robots
+        that haven't bid on a task are left out. Single-item rounds only.
+
+        :param k: how many robots to return, either for every task (an int) or
+                  for each task (a list, in the order of task_ids)
+        :param dict exclude: robots to leave out, keyed by task id
+        :return: a list of robot ids for each task, in the order of task_ids
+        :rtype: list[]
+        """
+        if isinstance(k, (int, long)):
+            k = [k] * len(self.task_ids)
+
+        winners = [[] for task_id in self.task_ids]
+
+        num_robots = len(self.robot_ids)
+        max_k = min(max(k) if k else 0, num_robots)
+        if max_k <= 0:
+            return winners
+
+        values = self.values_excluding(exclude)
+
+        # The max_k lowest bids in each column (in no particular order), then in
+        # order. (Fancy indexing rather than take_along_axis(), which needs
+        # numpy 1.15.)
+        cols = np.arange(values.shape[1])
+        rows = np.argpartition(values, max_k - 1, axis=0)[:max_k]
+        lowest_values = values[rows, cols]
+        order = np.argsort(lowest_values, axis=0, kind='mergesort')
+        rows = rows[order, cols]
+        lowest_values = lowest_values[order, cols]
+
+        for column in xrange(len(self.task_ids)):
+            for i in xrange(min(k[column], max_k)):
+                if lowest_values[i, column] == MISSING:
+                    break
+                winners[column].append(self.robot_ids[rows[i, column]])
+
+        return winners
+
+    def lowest_overall(self, exclude=None):
+        """
+        The lowest bid on any task. Single-item rounds only.
+
+        :param dict exclude: robots to leave out, keyed by task id
+        :return: a tuple of <robot_id>, <task_id>, <bid value>, or None if there are no bids
+        """
+        if not self.robot_ids or not self.task_ids:
+            return None
+
+        values = self.values_excluding(exclude)
+
+        row, column = np.unravel_index(np.argmin(values), values.shape)
+        if values[row, column] == MISSING:
+            return None
+
+        return self.robot_ids[row], self.task_ids[column], float(values[row, column])
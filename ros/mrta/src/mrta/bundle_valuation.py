@@ -0,0 +1,150 @@
+""" bundle_valuation
+
+This class values bundles (subsets) of announced tasks for combinatorial
+mechanisms (e.g., SUM and MAX), where a robot bids on every bundle.
+
+A bundle's value is the marginal cost of adding it to the robot's agenda: the
+cost of a tour (from the robot's position) of every task in the agenda plus
+the bundle, minus the cost of a tour of the agenda alone. The agenda's own
+tour comes from mrta.tour.solve_tour().
+
+Bundles are identified by bitmasks over the announced tasks: bit i is set if
+the bundle includes announced task i. The tour for a bundle is built from the
+tour for the same bundle without its highest task, by inserting that task
+where it adds the least cost (cheapest insertion). Every tour is therefore
+built with one insertion, rather than from scratch.
+
+All costs come from a single matrix of path costs between the robot's
+position, its agenda's tasks and the announced tasks, so no path costs are
+looked up while valuing bundles. Given the agenda's tour, the matrix only
+needs the costs between consecutive tasks in that tour and the rows (and
+columns) of the announced tasks.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import numpy as np
+
+import mrta.tour
+
+
+def mask_indices(mask):
+    """ The indices of the bits that are set in mask, lowest first
+
+    mask_indices(0b1011) --> [0, 1, 3]
+    """
+    indices = []
+    i = 0
+    while mask:
+        if mask & 1:
+            indices.append(i)
+        mask >>= 1
+        i += 1
+
+    return indices
+
+
+def cheapest_insertion(costs, tour, node):
+    """ Insert node into tour where it adds the least cost. The tour is open
+    (it doesn't return to its start), and the node can't be inserted before
+    the start.
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] tour: a tour, beginning with its start node
+    :param int node: the node to insert
+    :return: the new tour and the cost added
+    :rtype: (int[], float)
+    """
+    # Appending the node to the end of the tour...
+    best_position = len(tour)
+    best_added = costs[tour[-1], node]
+
+    # ...or inserting it between two consecutive nodes
+    for position in xrange(1, len(tour)):
+        before = tour[position - 1]
+        after = tour[position]
+        added = costs[before, node] + costs[node, after] - costs[before, after]
+
+        if added < best_added:
+            best_added = added
+            best_position = position
+
+    return tour[:best_position] + [node] + tour[best_position:], float(best_added)
+
+
+class BundleValuator(object):
+
+    def __init__(self, costs, num_agenda, num_announced, base_tour=None, base_cost=None,
+                 time_budget=mrta.tour.DEFAULT_TIME_BUDGET):
+        """
+        :param numpy.ndarray costs: a square matrix of path costs. Node 0 is
+            the robot's position, nodes 1..num_agenda are the (uncompleted)
+            tasks in its agenda and the next num_announced nodes are the
+            announced tasks.
+        :param int num_agenda: number of tasks in the agenda
+        :param int num_announced: number of announced tasks
+        :param int[] base_tour: a tour of the agenda (e.g., from mrta.agenda_tour.AgendaTour),
+            beginning with node 0. If None, one is solved for.
+        :param float base_cost: the cost of base_tour, if known
+        :param float time_budget: seconds to spend on the agenda's tour (see mrta.tour.solve_tour())
+        """
+        self.costs = np.asarray(costs, dtype=np.float64)
+        self.num_agenda = num_agenda
+        self.num_announced = num_announced
+
+        # Unless we're given one, the agenda is toured as in
+        # RobotController._cumulative_cost()
+        if base_tour is None:
+            base_tour, base_cost = mrta.tour.solve_tour(self.costs,
+                                                        range(1, num_agenda + 1),
+                                                        time_budget=time_budget)
+        elif base_cost is None:
+            base_cost = mrta.tour.tour_cost(self.costs, base_tour)
+
+        # Tours and their costs, keyed by bundle bitmask
+        self._tours = {0: base_tour}
+        self._tour_costs = {0: base_cost}
+
+    def announced_node(self, i):
+        """ The node (row/column of costs) of announced task i """
+        return self.num_agenda + 1 + i
+
+    @property
+    def base_cost(self):
+        """ The cost of a tour of the agenda alone """
+        return self._tour_costs[0]
+
+    def _build(self, mask):
+        """ Build the tour for mask (and any subsets it's built from) """
+        # Masks whose tours we need, from mask down to the first that we have
+        pending = []
+        while mask not in self._tours:
+            pending.append(mask)
+            mask &= ~(1 << (mask.bit_length() - 1))
+
+        for mask in reversed(pending):
+            highest = mask.bit_length() - 1
+            prefix = mask & ~(1 << highest)
+
+            tour, added = cheapest_insertion(self.costs, self._tours[prefix], self.announced_node(highest))
+
+            self._tours[mask] = tour
+            self._tour_costs[mask] = self._tour_costs[prefix] + added
+
+    def tour(self, mask):
+        """ The tour of the agenda plus bundle mask
+
+        :return: nodes in the order they're visited, beginning with node 0
+        :rtype: int[]
+        """
+        self._build(mask)
+        return self._tours[mask]
+
+    def cost(self, mask):
+        """ The cost of the tour of the agenda plus bundle mask """
+        self._build(mask)
+        return self._tour_costs[mask]
+
+    def marginal_cost(self, mask):
+        """ The cost of adding bundle mask to the agenda """
+        return self.cost(mask) - self.base_cost
@@ -0,0 +1,266 @@
+""" cbba
+
+The Consensus-Based Bundle Algorithm (CBBA), with which robots allocate tasks
+among themselves, peer-to-peer, rather than through an auctioneer. See:
+
+  Choi, Han-Lim, Luc Brunet, and Jonathan P. How. "Consensus-based
+  decentralized auctions for robust task allocation." IEEE Transactions on
+  Robotics 25.4 (2009): 912-926.
+
+Every robot (an Agent) alternates between two phases until the team agrees:
+
+  1. Bundle construction: the robot adds tasks to its bundle one at a time,
+     each time the task it can add most cheaply (by cheapest insertion into
+     its path, see mrta.bundle_valuation), as long as its bid beats the best
+     bid it knows of. A bid is never lower than the bid on the task added
+     before it, so that adding tasks to a bundle can't make earlier bids
+     look worse, which CBBA needs in order to converge.
+
+  2. Consensus: robots exchange what they know (the winner of and winning
+     bid on every task, and when they last heard from every robot) and
+     resolve conflicts with the rules of Table 1 in the paper. When a robot
+     is outbid on a task in its bundle, that task and every task it added
+     after it are released.
+
+Bids are costs (e.g., path distances): lower bids win, and ties go to the
+robot with the smaller id.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import mrta.bundle_valuation
+
+# The "winner" of a task that nobody has won (yet), and its "winning bid"
+NO_WINNER = ''
+NO_BID = float('inf')
+
+# What consensus does with a task's winner and winning bid
+UPDATE = 'update'  # take the sender's
+RESET = 'reset'    # forget them
+LEAVE = 'leave'    # keep ours
+
+
+def outbids(bid, robot_id, other_bid, other_robot_id):
+    """ True if robot_id's bid beats other_robot_id's (which may be NO_WINNER) """
+    if robot_id == NO_WINNER:
+        return False
+
+    if other_robot_id == NO_WINNER:
+        return True
+
+    return (bid, robot_id) < (other_bid, other_robot_id)
+
+
+class Agent(object):
+
+    def __init__(self, robot_id, task_ids, costs, base_tour, task_nodes,
+                 excluded=None, max_bundle=None, max_bid=NO_BID):
+        """
+        :param str robot_id: our name
+        :param str[] task_ids: the ids of the tasks being allocated
+        :param numpy.ndarray costs: path costs between nodes (e.g., our
+            position, the tasks in our agenda and the tasks being allocated)
+        :param int[] base_tour: our tour before we win anything: the node of
+            our position, then those of our agenda's tasks, in order
+        :param int[] task_nodes: the node of each task being allocated
+        :param excluded: the indices of tasks we may not bid on (e.g.,
+            because they're already in our agenda)
+        :param int max_bundle: the most tasks we may win (None for no limit)
+        :param float max_bid: we don't bid this much or more (e.g., on
+            unreachable tasks)
+        """
+        self.robot_id = robot_id
+        self.task_ids = list(task_ids)
+        self.costs = costs
+        self.base_tour = list(base_tour)
+        self.task_nodes = list(task_nodes)
+        self.excluded = set(excluded or [])
+        self.max_bundle = max_bundle
+        self.max_bid = max_bid
+
+        # The winner of and winning bid on each task, as far as we know
+        self.winners = [NO_WINNER] * len(self.task_ids)
+        self.winning_bids = [NO_BID] * len(self.task_ids)
+
+        # When we last heard (directly or through others) from each robot
+        self.stamps = {}
+
+        # The tasks we've won (indices), in the order we added them, and our
+        # tour through them
+        self.bundle = []
+        self.tour = list(self.base_tour)
+
+    def state(self):
+        """ What we know of the allocation, to compare with other robots' """
+        return tuple(self.winners), tuple(self.winning_bids)
+
+    def won_task_ids(self):
+        """ The ids of the tasks in our bundle, in the order we added them """
+        return [self.task_ids[i] for i in self.bundle]
+
+    def build_bundle(self):
+        """
+        Add tasks to our bundle until we can't outbid anyone on any more
+        (phase 1)
+
+        :return: True if we added any tasks
+        :rtype: bool
+        """
+        added_any = False
+
+        while self.max_bundle is None or len(self.bundle) < self.max_bundle:
+            floor = self.winning_bids[self.bundle[-1]] if self.bundle else 0.0
+
+            best = None
+            for i in xrange(len(self.task_ids)):
+                if i in self.excluded or i in self.bundle:
+                    continue
+
+                tour, added = mrta.bundle_valuation.cheapest_insertion(self.costs, self.tour, self.task_nodes[i])
+                bid = max(added, floor)
+
+                if bid >= self.max_bid:
+                    continue
+
+                if not outbids(bid, self.robot_id, self.winning_bids[i], self.winners[i]):
+                    continue
+
+                if best is None or bid < best[0]:
+                    best = (bid, i, tour)
+
+            if best is None:
+                break
+
+            bid, i, tour = best
+
+            self.bundle.append(i)
+            self.tour = tour
+            self.winners[i] = self.robot_id
+            self.winning_bids[i] = bid
+
+            added_any = True
+
+        return added_any
+
+    def _rule(self, j, sender, winner, bid, sender_stamps):
+        """ What to do with task j, given the sender's winner and winning bid
+        (Table 1 in the paper)
+        """
+        me = self.robot_id
+        my_winner = self.winners[j]
+
+        def newer(robot_id):
+            """ True if the sender heard from robot_id more recently than we did """
+            return sender_stamps.get(robot_id, 0.0) > self.stamps.get(robot_id, 0.0)
+
+        def older(robot_id):
+            """ True if we heard from robot_id more recently than the sender did """
+            return sender_stamps.get(robot_id, 0.0) < self.stamps.get(robot_id, 0.0)
+
+        better = outbids(bid, winner, self.winning_bids[j], my_winner)
+
+        if winner == sender:
+            if my_winner == me:
+                return UPDATE if better else LEAVE
+            elif my_winner in (sender, NO_WINNER):
+                return UPDATE
+            else:
+                return UPDATE if newer(my_winner) or better else LEAVE
+
+        elif winner == me:
+            if my_winner == sender:
+                return RESET
+            elif my_winner in (me, NO_WINNER):
+                return LEAVE
+            else:
+                return RESET if newer(my_winner) else LEAVE
+
+        elif winner == NO_WINNER:
+            if my_winner == sender:
+                return UPDATE
+            elif my_winner in (me, NO_WINNER):
+                return LEAVE
+            else:
+                return UPDATE if newer(my_winner) else LEAVE
+
+        # The sender thinks a third robot won the task
+        if my_winner == me:
+            return UPDATE if newer(winner) and better else LEAVE
+        elif my_winner == sender:
+            return UPDATE if newer(winner) else RESET
+        elif my_winner in (winner, NO_WINNER):
+            return UPDATE if newer(winner) else LEAVE
+
+        # ...and we think a fourth robot did
+        if newer(winner) and (newer(my_winner) or better):
+            return UPDATE
+        elif newer(my_winner) and older(winner):
+            return RESET
+
+        return LEAVE
+
+    def update(self, sender, task_ids, winners, winning_bids, stamps, stamp):
+        """
+        Merge what another robot knows into what we know (phase 2), and
+        release the tasks in our bundle that we've been outbid on (and those
+        we added after them)
+
+        :param str sender: the other robot
+        :param str[] task_ids: the tasks it's allocating (if they aren't ours,
+            the message is ignored)
+        :param str[] winners: the winner of each task, as far as it knows
+        :param float[] winning_bids: the winning bid on each task
+        :param dict stamps: when it last heard from each robot
+        :param float stamp: when it sent this
+        :return: True if what we know changed
+        :rtype: bool
+        """
+        if sender == self.robot_id or list(task_ids) != self.task_ids:
+            return False
+
+        before = self.state()
+
+        sender_stamps = dict(stamps)
+        sender_stamps[sender] = stamp
+
+        for j in xrange(len(self.task_ids)):
+            winner = winners[j]
+            bid = winning_bids[j] if winner != NO_WINNER else NO_BID
+
+            action = self._rule(j, sender, winner, bid, sender_stamps)
+
+            if action == UPDATE:
+                self.winners[j] = winner
+                self.winning_bids[j] = bid
+            elif action == RESET:
+                self.winners[j] = NO_WINNER
+                self.winning_bids[j] = NO_BID
+
+        for robot_id, robot_stamp in sender_stamps.items():
+            if robot_id != self.robot_id:
+                self.stamps[robot_id] = max(self.stamps.get(robot_id, 0.0), robot_stamp)
+
+        self._release()
+
+        return self.state() != before
+
+    def _release(self):
+        """ Drop the first task in our bundle that we no longer win, and every task after it """
+        for position, i in enumerate(self.bundle):
+            if self.winners[i] == self.robot_id:
+                continue
+
+            for later in self.bundle[position + 1:]:
+                if self.winners[later] == self.robot_id:
+                    self.winners[later] = NO_WINNER
+                    self.winning_bids[later] = NO_BID
+
+            self.bundle = self.bundle[:position]
+
+            # The tour through what's left of the bundle (which it was built
+            # with, so its bids still stand)
+            self.tour = list(self.base_tour)
+            for kept in self.bundle:
+                self.tour = mrta.bundle_valuation.cheapest_insertion(self.costs, self.tour, self.task_nodes[kept])[0]
+
+            return
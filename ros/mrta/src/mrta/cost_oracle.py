@@ -0,0 +1,457 @@
+"""cost_oracle
+
+This class answers path cost (distance) queries from memory, without calling
+the global planner. It loads the occupancy map referenced by one of the map
+server's .yaml files (see mrta/config/maps), inflates obstacles by the robot's
+radius the way the global costmap does, and computes geodesic (shortest-path)
+distances over the free cells of the resulting grid with Dijkstra's algorithm.
+
+The result of every search is a "distance field": the distance from one start
+cell to every other cell in the map. Fields are kept in memory, so any number
+of goals can be looked up for a start that we've seen before.
+
+A CostOracle may be shared between threads. Its cache of fields is locked
+only while it's read or updated, not while a search runs.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+from collections import OrderedDict
+import math
+import os.path
+import sys
+import threading
+
+import numpy as np
+from PIL import Image
+import scipy.ndimage
+import scipy.sparse
+import scipy.sparse.csgraph
+import yaml
+
+import rospkg
+
+# The cost of a path that can't be found. This is the same 'very large' value
+# returned by PlannerProxy._lookup_path_cost() when the planner fails.
+UNREACHABLE_COST = float(sys.maxint)
+
+# Robot footprint radius, in meters. See robot_radius in
+# mrta_robot_controller/param/move_base_generic/costmap_common_params.yaml
+DEFAULT_ROBOT_RADIUS = 0.175
+
+# We don't need centimeter-level precision to compare path costs. Maps with a
+# finer resolution than this are downsampled before searching.
+DEFAULT_RESOLUTION = 0.05
+
+# Start and goal points that fall inside an obstacle (or too close to one) are
+# moved to the nearest free cell, as long as it's within this many meters.
+# This plays the same role as the 'tolerance' field of a make_plan request.
+DEFAULT_SNAP_DISTANCE = 0.5
+
+# How much memory (in bytes) the cached distance fields may take up. A field
+# holds a float32 for every cell of the grid, so a grid of 325,000 cells has
+# room for about 25 fields.
+DEFAULT_MAX_FIELD_BYTES = 32 * 1024 * 1024
+
+# Distance fields are kept at single precision (to the nearest few microns)
+FIELD_DTYPE = np.float32
+
+# How many landmarks to use for lower bounds (see select_landmarks())
+DEFAULT_LANDMARKS = 8
+
+# Paths through an 8-connected grid are at most 1/cos(pi/8) (about 8%) longer
+# than the shortest path through continuous space
+GRID_PATH_FACTOR = math.cos(math.pi / 8)
+
+
+def xy(point):
+    """ Return the (x, y) coordinates of a geometry_msgs.msg.Pose,
+    a geometry_msgs.msg.Point, an mrta.Point or an (x, y) tuple.
+    """
+    if hasattr(point, 'position'):
+        point = point.position
+
+    if hasattr(point, 'x'):
+        return float(point.x), float(point.y)
+
+    return float(point[0]), float(point[1])
+
+
+def resolve_map_path(map_file):
+    """ Map files given without a directory are looked up in mrta/config/maps,
+    the same place the launch files pass to map_server.
+    """
+    if os.path.isabs(map_file) or os.path.exists(map_file):
+        return map_file
+
+    pkg = rospkg.RosPack()
+    return os.path.join(pkg.get_path('mrta'), 'config', 'maps', map_file)
+
+
+class CostOracle(object):
+
+    def __init__(self, map_file, robot_radius=DEFAULT_ROBOT_RADIUS, resolution=DEFAULT_RESOLUTION,
+                 snap_distance=DEFAULT_SNAP_DISTANCE, max_field_bytes=DEFAULT_MAX_FIELD_BYTES):
+        """
+        :param str map_file: a map_server .yaml file, e.g. 'smartlab_ugv_arena.yaml'
+        :param float robot_radius: obstacles are inflated by this many meters
+        :param float resolution: (approximate) size, in meters, of a grid cell to search over
+        :param float snap_distance: maximum distance to move a point that isn't in free space
+        :param int max_field_bytes: how much memory the cached distance fields may take up
+            (the most recently used field is always kept)
+        """
+        self.map_file = resolve_map_path(map_file)
+        self.robot_radius = robot_radius
+        self.snap_distance = snap_distance
+        self.max_field_bytes = max_field_bytes
+
+        # Incremented every time the grid changes, so that anyone holding on to
+        # a distance field can tell whether it's stale.
+        self.version = 0
+
+        # Distance fields, keyed by the (flat) index of their start cell
+        self._fields = OrderedDict()
+        self._field_bytes = 0
+
+        # Protects _fields, _field_bytes and the query counters
+        self._lock = threading.Lock()
+
+        # Distance fields from landmark cells, one per row. These are used to
+        # compute lower bounds on path costs (see lower_bound()).
+        self.landmark_count = 0
+        self._landmark_fields = None
+
+        # Query counters
+        self.hits = 0
+        self.misses = 0
+
+        free = self._load_map(self.map_file)
+        self._downsample(free, resolution)
+
+    def _load_map(self, map_file):
+        """ Read a map the way map_server does and return a boolean grid of
+        free cells. Row 0 of the grid is the bottom of the map (i.e., rows
+        increase with y).
+        """
+        with open(map_file, 'rb') as yaml_file:
+            map_info = yaml.load(yaml_file)
+
+        image_path = map_info['image']
+        if not os.path.isabs(image_path):
+            image_path = os.path.join(os.path.dirname(map_file), image_path)
+
+        self.map_resolution = float(map_info['resolution'])
+        self.origin = (float(map_info['origin'][0]), float(map_info['origin'][1]))
+
+        occupied_thresh = float(map_info.get('occupied_thresh', 0.65))
+        free_thresh = float(map_info.get('free_thresh', 0.196))
+        negate = int(map_info.get('negate', 0))
+
+        pixels = np.asarray(Image.open(image_path).convert('L'), dtype=np.float64)
+
+        # Probability that a cell is occupied, as in map_server's image_loader
+        if negate:
+            occupancy = pixels / 255.0
+        else:
+            occupancy = (255.0 - pixels) / 255.0
+
+        # Unknown cells (neither free nor occupied) are not traversable
+        free = occupancy < free_thresh
+
+        # Images are stored top row first
+        free = np.flipud(free)
+
+        # Inflate obstacles: a cell is only traversable if the robot's
+        # footprint centered there doesn't touch an obstacle.
+        clearance = scipy.ndimage.distance_transform_edt(free) * self.map_resolution
+
+        return clearance > self.robot_radius
+
+    def _downsample(self, free, resolution):
+        """ Reduce the map to roughly the given resolution, keeping a coarse
+        cell traversable if at least half of the fine cells it covers are.
+        """
+        factor = max(1, int(round(resolution / self.map_resolution)))
+
+        if factor > 1:
+            rows = (free.shape[0] // factor) * factor
+            cols = (free.shape[1] // factor) * factor
+            blocks = free[:rows, :cols].reshape(rows // factor, factor, cols // factor, factor)
+            free = blocks.mean(axis=(1, 3)) >= 0.5
+
+        self.resolution = self.map_resolution * factor
+        self.set_grid(free)
+
+    def set_grid(self, free):
+        """ Replace the grid of traversable cells (e.g., after the map changes)
+        and rebuild the search graph. Any cached distance fields are discarded.
+
+        :param numpy.ndarray free: 2d boolean array, True where the robot may travel
+        """
+        self.free = free
+        self.shape = free.shape
+        self.graph = self._build_graph(free)
+
+        # For every cell, the index of the nearest free cell (and the distance
+        # to it), used to snap points that fall inside obstacles.
+        snap_dist, snap_idx = scipy.ndimage.distance_transform_edt(~free, return_indices=True)
+        self._snap_dist = snap_dist * self.resolution
+        self._snap_idx = np.ravel_multi_index(snap_idx, free.shape)
+
+        with self._lock:
+            self._fields.clear()
+            self._field_bytes = 0
+            self.version += 1
+
+        self._landmark_fields = None
+        if self.landmark_count:
+            self.select_landmarks(self.landmark_count)
+
+    def _build_graph(self, free):
+        """ An 8-connected graph of free cells. Edge weights are distances in meters. """
+        rows, cols = free.shape
+        index = np.arange(rows * cols).reshape(rows, cols)
+
+        sources = []
+        targets = []
+        weights = []
+
+        # Only half of the neighbors are needed, since the graph is undirected
+        for d_row, d_col in ((0, 1), (1, 0), (1, 1), (1, -1)):
+            r0, r1 = max(0, -d_row), rows - max(0, d_row)
+            c0, c1 = max(0, -d_col), cols - max(0, d_col)
+
+            here = free[r0:r1, c0:c1]
+            there = free[r0 + d_row:r1 + d_row, c0 + d_col:c1 + d_col]
+            both = here & there
+
+            sources.append(index[r0:r1, c0:c1][both])
+            targets.append(index[r0 + d_row:r1 + d_row, c0 + d_col:c1 + d_col][both])
+            weights.append(np.full(both.sum(), self.resolution * math.hypot(d_row, d_col)))
+
+        sources = np.concatenate(sources)
+        targets = np.concatenate(targets)
+        weights = np.concatenate(weights)
+
+        return scipy.sparse.csr_matrix((weights, (sources, targets)), shape=(rows * cols, rows * cols))
+
+    def cell_index(self, point):
+        """ The flat grid index of the free cell nearest to point, or None if
+        point is off the map or farther than snap_distance from free space.
+        """
+        x, y = xy(point)
+        col = int(math.floor((x - self.origin[0]) / self.resolution))
+        row = int(math.floor((y - self.origin[1]) / self.resolution))
+
+        if not (0 <= row < self.shape[0] and 0 <= col < self.shape[1]):
+            return None
+
+        if self._snap_dist[row, col] > self.snap_distance:
+            return None
+
+        return int(self._snap_idx[row, col])
+
+    def _snap_distance(self, point):
+        """ How far point is from the center of the cell cell_index() returns """
+        x, y = xy(point)
+        col = int(math.floor((x - self.origin[0]) / self.resolution))
+        row = int(math.floor((y - self.origin[1]) / self.resolution))
+
+        # Half the diagonal of a cell, plus the distance to the nearest free cell
+        return self.resolution * math.sqrt(2) / 2 + self._snap_dist[row, col]
+
+    def cell_center(self, index):
+        """ The (x, y) coordinates of the center of a cell """
+        row, col = np.unravel_index(index, self.shape)
+        return (self.origin[0] + (col + 0.5) * self.resolution,
+                self.origin[1] + (row + 0.5) * self.resolution)
+
+    def _search(self, indices):
+        """ Run Dijkstra's algorithm from each of the given cells, cache the
+        fields and return them (as a dictionary keyed by cell index). The
+        cache isn't locked during the search.
+        """
+        version = self.version
+        graph = self.graph
+
+        # Search in batches that fit in the cache (dijkstra() returns float64)
+        field_bytes = graph.shape[0] * np.dtype(FIELD_DTYPE).itemsize
+        batch_size = max(1, self.max_field_bytes // field_bytes)
+
+        found = {}
+        for batch_start in xrange(0, len(indices), batch_size):
+            batch = indices[batch_start:batch_start + batch_size]
+            fields = scipy.sparse.csgraph.dijkstra(graph, directed=False, indices=batch)
+
+            for index, field in zip(batch, np.atleast_2d(fields)):
+                field[np.isinf(field)] = UNREACHABLE_COST
+                found[index] = field.astype(FIELD_DTYPE)
+
+            with self._lock:
+                # Don't cache fields from a grid that has since been replaced
+                if self.version != version:
+                    continue
+
+                for index in batch:
+                    if index not in self._fields:
+                        self._fields[index] = found[index]
+                        self._field_bytes += found[index].nbytes
+
+                self._evict()
+
+        return found
+
+    def _evict(self):
+        """ Drop the least recently used fields until the cache fits in
+        max_field_bytes (the newest field is always kept). The caller must
+        hold _lock.
+        """
+        while len(self._fields) > 1 and self._field_bytes > self.max_field_bytes:
+            index, field = self._fields.popitem(last=False)
+            self._field_bytes -= field.nbytes
+
+    def field(self, start):
+        """ The distance field (distances to every cell, as a flat array) from
+        start, or None if start isn't in free space.
+        """
+        index = self.cell_index(start)
+        if index is None:
+            return None
+
+        with self._lock:
+            field = self._fields.pop(index, None)
+            if field is not None:
+                self.hits += 1
+                # Mark as most recently used
+                self._fields[index] = field
+            else:
+                self.misses += 1
+
+        if field is None:
+            field = self._search([index])[index]
+
+        return field
+
+    def precompute(self, points):
+        """ Compute distance fields for every point in one pass. After this,
+        cost() and costs() between any of the points are answered from memory,
+        as long as their fields fit in max_field_bytes.
+        """
+        indices = set()
+        for point in points:
+            index = self.cell_index(point)
+            if index is not None:
+                indices.add(index)
+
+        with self._lock:
+            indices = [i for i in sorted(indices) if i not in self._fields]
+
+        if indices:
+            self._search(indices)
+
+    def costs(self, start, goals):
+        """ Path costs from start to each of goals
+
+        :param start: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :param goals: a list of the same
+        :return: a list of distances in meters (UNREACHABLE_COST if there's no path)
+        :rtype: float[]
+        """
+        return self.field_costs(self.field(start), goals)
+
+    def field_costs(self, field, goals):
+        """ Look up the costs of goals in a distance field returned by field()
+
+        :param numpy.ndarray field: a distance field (may be None)
+        :param goals: a list of geometry_msgs.msg.Pose, mrta.Point or (x, y) tuples
+        :return: a list of distances in meters (UNREACHABLE_COST if there's no path)
+        :rtype: float[]
+        """
+        costs = []
+        for goal in goals:
+            goal_index = self.cell_index(goal)
+            if field is None or goal_index is None:
+                costs.append(UNREACHABLE_COST)
+            else:
+                costs.append(float(field[goal_index]))
+
+        return costs
+
+    def cost(self, start, goal):
+        """ Path cost from start to goal
+
+        :param start: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :param goal: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :return: distance in meters (UNREACHABLE_COST if there's no path)
+        :rtype: float
+        """
+        return self.costs(start, [goal])[0]
+
+    def select_landmarks(self, count=DEFAULT_LANDMARKS):
+        """ Choose landmark cells for lower_bound() and compute their distance
+        fields. Landmarks are spread out by repeatedly picking the reachable
+        cell that is farthest from all of the landmarks chosen so far.
+
+        :param int count: number of landmarks
+        """
+        self.landmark_count = count
+
+        free_indices = np.flatnonzero(self.free)
+        if not count or not len(free_indices):
+            self._landmark_fields = None
+            return
+
+        # Start from the free cell farthest from the center of the map
+        rows, cols = np.unravel_index(free_indices, self.shape)
+        center_dist = np.hypot(rows - self.shape[0] / 2.0, cols - self.shape[1] / 2.0)
+        landmark = int(free_indices[np.argmax(center_dist)])
+
+        fields = []
+        nearest = None
+        for i in xrange(count):
+            field = scipy.sparse.csgraph.dijkstra(self.graph, directed=False, indices=landmark)
+            fields.append(field)
+
+            nearest = field if nearest is None else np.minimum(nearest, field)
+
+            # The next landmark is the reachable cell farthest from the others
+            candidates = np.where(np.isinf(nearest), -1.0, nearest)
+            landmark = int(np.argmax(candidates))
+            if candidates[landmark] <= 0.0:
+                break
+
+        self._landmark_fields = np.vstack(fields)
+
+    def lower_bound(self, start, goal):
+        """ A lower bound on the cost of the path from start to goal, by the
+        triangle inequality over the landmarks' distance fields (the "ALT"
+        bound). The bound is scaled and reduced to allow for our grid's
+        discretization, so that it shouldn't exceed the length of any path
+        the planner could find.
+
+        :param start: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :param goal: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :return: a lower bound in meters (0.0 if no bound can be found)
+        :rtype: float
+        """
+        if self._landmark_fields is None:
+            return 0.0
+
+        start_index = self.cell_index(start)
+        goal_index = self.cell_index(goal)
+        if start_index is None or goal_index is None:
+            return 0.0
+
+        from_landmarks = self._landmark_fields[:, start_index]
+        to_landmarks = self._landmark_fields[:, goal_index]
+
+        # Only landmarks that can reach both points give a valid bound
+        valid = np.isfinite(from_landmarks) & np.isfinite(to_landmarks)
+        if not valid.any():
+            return 0.0
+
+        bound = np.max(np.abs(from_landmarks[valid] - to_landmarks[valid]))
+
+        slack = self._snap_distance(start) + self._snap_distance(goal)
+
+        return max(0.0, float(bound) * GRID_PATH_FACTOR - slack)
@@ -0,0 +1,173 @@
+""" costmap_manager
+
+This class keeps track of the state of a costmap's layers (enabled or not)
+and of whether the costmap has been updated since they last changed.
+
+Layers are enabled and disabled through their dynamic_reconfigure servers.
+A reconfigure request only returns once the server has applied it, and the
+server's parameter updates are watched to keep our idea of each layer's state
+current, so we never have to poll the parameter server. Requests that
+wouldn't change anything aren't sent at all.
+
+After a change, the costmap isn't "fresh" until it has published an update
+(on its costmap or costmap_updates topic). Callers that need a costmap that
+reflects their changes (e.g., before planning) can wait for that with
+wait_until_fresh(), rather than sleeping for a fixed amount of time.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+from threading import Condition
+
+import dynamic_reconfigure.client
+import map_msgs.msg
+import nav_msgs.msg
+import rospy
+
+# The layers we may enable and disable
+DEFAULT_LAYERS = ['obstacle_layer', 'static_layer']
+
+
+class CostmapManager(object):
+
+    def __init__(self, costmap_ns, layers=DEFAULT_LAYERS, timeout=5):
+        """
+        :param str costmap_ns: the costmap's namespace, e.g. '/robot_1/move_base_node/global_costmap'
+        :param str[] layers: names of the layers to manage
+        :param float timeout: seconds to wait for each layer's reconfigure server
+        """
+        self.costmap_ns = costmap_ns
+
+        # Notified whenever a layer's state changes or a costmap update arrives
+        self._condition = Condition()
+
+        # Keys are layer names, values are True/False (or None if unknown)
+        self._enabled = {}
+
+        # Keys are layer names, values are dynamic_reconfigure clients
+        self._clients = {}
+
+        # Incremented whenever the costmap changes (see mark_stale())
+        self.version = 0
+
+        # When the costmap last changed, and when we last heard it was updated
+        self._stale_since = rospy.Time(0)
+        self._last_update = rospy.Time(0)
+
+        for layer in layers:
+            self._enabled[layer] = None
+
+            layer_srv = "{0}/{1}".format(costmap_ns, layer)
+            rospy.loginfo("CostmapManager: Starting {0} parameter client".format(layer_srv))
+
+            self._clients[layer] = dynamic_reconfigure.client.Client(
+                layer_srv,
+                timeout=timeout,
+                config_callback=lambda config, layer=layer: self._on_layer_config(layer, config))
+
+            # Start with the layer's current configuration
+            self._on_layer_config(layer, self._clients[layer].get_configuration(timeout=timeout))
+
+        self.costmap_sub = rospy.Subscriber("{0}/costmap".format(costmap_ns),
+                                            nav_msgs.msg.OccupancyGrid,
+                                            self._on_costmap_update)
+
+        self.costmap_updates_sub = rospy.Subscriber("{0}/costmap_updates".format(costmap_ns),
+                                                    map_msgs.msg.OccupancyGridUpdate,
+                                                    self._on_costmap_update)
+
+    def _on_layer_config(self, layer, config):
+        """ Called by a layer's dynamic_reconfigure client when its configuration changes """
+        if config is None or 'enabled' not in config:
+            return
+
+        with self._condition:
+            self._enabled[layer] = bool(config['enabled'])
+            self._condition.notify_all()
+
+    def _on_costmap_update(self, msg):
+        """ Called when the costmap (or a part of it) is published """
+        with self._condition:
+            self._last_update = rospy.get_rostime()
+            self._condition.notify_all()
+
+    def is_enabled(self, layer):
+        """ True if the layer is enabled, False if not, None if we don't know """
+        with self._condition:
+            return self._enabled[layer]
+
+    def _reconfigure(self, layer, enabled):
+        """ Enable or disable a layer. Returns once the change has been applied. """
+        rospy.logdebug("CostmapManager: {0} {1}/{2}".format('Enabling' if enabled else 'Disabling',
+                                                             self.costmap_ns,
+                                                             layer))
+
+        config = self._clients[layer].update_configuration({'enabled': enabled})
+
+        # The server has applied the change by the time update_configuration()
+        # returns. We record its reply in case its update message is late.
+        self._on_layer_config(layer, config)
+
+    def set_layers(self, enabled=None, reset=()):
+        """
+        Apply a set of layer changes in one go. Layers that are already in
+        the requested state are left alone.
+
+        :param dict enabled: keys are layer names, values are True (enable) or False (disable)
+        :param str[] reset: layers to disable and re-enable, which makes them
+                            (and the costmap) update completely. A reset layer
+                            is always left enabled.
+        """
+        if enabled is None:
+            enabled = {}
+
+        changed = False
+
+        for layer in reset:
+            if self.is_enabled(layer):
+                self._reconfigure(layer, False)
+            self._reconfigure(layer, True)
+            changed = True
+
+        for layer, layer_enabled in enabled.items():
+            if layer in reset or self.is_enabled(layer) == layer_enabled:
+                continue
+            self._reconfigure(layer, layer_enabled)
+            changed = True
+
+        if changed:
+            self.mark_stale()
+
+    def mark_stale(self):
+        """ Note that the costmap has changed (e.g., it has been cleared), so
+        it isn't fresh until its next update.
+        """
+        with self._condition:
+            self.version += 1
+            self._stale_since = rospy.get_rostime()
+
+    def is_fresh(self):
+        """ True if the costmap has been updated since it last changed """
+        with self._condition:
+            return self._last_update > self._stale_since
+
+    def wait_until_fresh(self, timeout):
+        """ Wait (at most timeout seconds) until the costmap has been updated
+        since it last changed.
+
+        :param float timeout: seconds
+        :return: True if the costmap is fresh, False if we timed out
+        :rtype: bool
+        """
+        deadline = rospy.get_rostime() + rospy.Duration(timeout)
+
+        with self._condition:
+            while not self._last_update > self._stale_since:
+                remaining = (deadline - rospy.get_rostime()).to_sec()
+                if remaining <= 0.0 or rospy.is_shutdown():
+                    rospy.logwarn("CostmapManager: {0} not updated after {1} seconds".format(self.costmap_ns,
+                                                                                             timeout))
+                    return False
+                self._condition.wait(remaining)
+
+        return True
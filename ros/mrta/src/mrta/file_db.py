@@ -92,3 +92,6 @@ class FileDB:
 
     def exists(self, key):
         return key in self.db
+
+    def keys(self):
+        return self.db.keys()
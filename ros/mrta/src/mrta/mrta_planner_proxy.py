@@ -7,7 +7,9 @@ the purpose of finding global plans and their costs.
 
 # Standard Python modules
 import math
+from multiprocessing.pool import ThreadPool
 import sys
+import threading
 import time
 
 # ROS stuff
@@ -18,16 +20,34 @@ import nav_msgs.msg
 import nav_msgs.srv
 import std_srvs.srv
 
+import mrta.path_cost_cache
+import mrta.srv
+
 import pprint
 
 pp = pprint.PrettyPrinter(indent=4)
 
+# Number of planner queries to have in flight at once
+DEFAULT_PLANNER_THREADS = 4
+
 
 class PlannerProxy:
     # def __init__(self, robot_name, plan_srv_name, cc_srv_name, glob_obs_layer_srv, glob_static_layer_srv):
-    def __init__(self, robot_name):
+    def __init__(self, robot_name, cost_oracle=None, path_cost_db=None,
+                 cache_resolution=mrta.path_cost_cache.DEFAULT_RESOLUTION,
+                 cache_size=mrta.path_cost_cache.DEFAULT_MAX_ENTRIES,
+                 planner_threads=DEFAULT_PLANNER_THREADS):
         self.robot_name = robot_name                        # Name of the robot, possible a dummy (e.g., "robot_0")
 
+        # An optional mrta.cost_oracle.CostOracle. If given, path costs are
+        # computed from the map in memory and the planner is only called when
+        # the oracle can't find a path.
+        self.cost_oracle = cost_oracle
+
+        # An optional mrta.path_cost_db.PathCostDB. If given, path costs are
+        # looked up there before calling the planner, and new ones are added.
+        self.path_cost_db = path_cost_db
+
         # self.plan_srv_name = plan_srv_name                  # Global planner service name
         # self.cc_src_name = cc_srv_name                      # Clear costmaps service name
         # self.glob_obs_layer_srv = glob_obs_layer_srv        # Global obstacle layer name
@@ -37,6 +57,7 @@ class PlannerProxy:
         self.plan_srv_name = "/{0}/move_base_node/GlobalPlanner/make_plan".format(self.robot_name)
         # self.plan_srv_name = "/{0}/move_base_node/HRTeamPlanner/make_plan".format(self.robot_name)
         self.cc_srv_name = "/{0}/move_base_node/clear_costmaps".format(self.robot_name)
+        self.path_costs_srv_name = "/{0}/get_path_costs".format(self.robot_name)
         self.glob_obs_layer_srv = "/{0}/move_base_node/global_costmap/obstacle_layer".format(self.robot_name)
         self.glob_obs_layer_enabled = '/{0}/move_base_node/global_costmap/obstacle_layer/enabled'.format(self.robot_name)
         self.glob_static_layer_srv = '/{0}/move_base_node/global_costmap/static_layer'.format(self.robot_name)
@@ -51,13 +72,27 @@ class PlannerProxy:
         self._nav_plan_client = None
         self._clear_costmaps_client = None
 
+        # Whether the batch path cost service was found when we started
+        self._path_costs_available = False
+
+        # Each thread that calls the planner gets its own persistent
+        # connections (see _get_nav_plan_client() and _get_path_costs_client())
+        self._thread_clients = threading.local()
+
         self.init_service_clients()
 
         # Maintain a cache of path distances between points so that we don't
         # have to look them up (via an expensive service call) every time.
-        # Keys are tuples in the form of ((start_x,start_y),(goal_x,goal_y))#
-        # and values are distances in meters (floats).
-        self._path_distance_cache = {}
+        self._path_distance_cache = mrta.path_cost_cache.PathCostCache(cache_resolution, cache_size)
+
+        # Protects the cache and the path cost database, which may be used
+        # from several threads at once. (The cost oracle does its own locking,
+        # and isn't called with this held, since it may have to search.)
+        self._lock = threading.Lock()
+
+        # Planner queries that don't depend on each other are run in parallel
+        # by this pool of threads
+        self._pool = ThreadPool(planner_threads)
 
     def _disable_obstacle_layer(self):
         """ Disable the obstacle layer of the global costmap """
@@ -126,8 +161,7 @@ class PlannerProxy:
         rospy.wait_for_service(self.plan_srv_name)
         rospy.logdebug("PlannerProxy: Service {0} ready.".format(self.plan_srv_name))
 
-        self._nav_plan_client = rospy.ServiceProxy(self.plan_srv_name,
-                                                   nav_msgs.srv.GetPlan)
+        self._nav_plan_client = self._get_nav_plan_client()
 
         # Set up client for the service that clear costmaps
         rospy.loginfo("PlannerProxy: Starting 'clear_costmaps' service client")
@@ -139,6 +173,17 @@ class PlannerProxy:
         self._clear_costmaps_client = rospy.ServiceProxy(self.cc_srv_name,
                                                          std_srvs.srv.Empty)
 
+        # The batch path cost service (see mrta_planner_service) is optional.
+        # Without it, get_path_costs() calls make_plan once per pair.
+        rospy.loginfo("PlannerProxy: Starting 'get_path_costs' service client")
+        try:
+            rospy.wait_for_service(self.path_costs_srv_name, timeout=1.0)
+            self._path_costs_available = True
+            rospy.logdebug("PlannerProxy: Service {0} ready.".format(self.path_costs_srv_name))
+        except rospy.ROSException:
+            rospy.logwarn("PlannerProxy: Service {0} not available, path costs will be looked up one at a time".format(
+                self.path_costs_srv_name))
+
     def _is_reachable_distance(self, distance):
         """
         True if the distance is some 'reasonable' number (e.g. less than 10000).
@@ -184,6 +229,52 @@ class PlannerProxy:
 
         return pose_msg
 
+    def _get_nav_plan_client(self):
+        """
+        The calling thread's persistent connection to the planner service.
+        rospy service proxies can't be shared between threads, so each thread
+        gets its own, which is kept open between calls.
+
+        :rtype: rospy.ServiceProxy
+        """
+        client = getattr(self._thread_clients, 'nav_plan_client', None)
+
+        if client is None:
+            rospy.wait_for_service(self.plan_srv_name)
+            client = rospy.ServiceProxy(self.plan_srv_name,
+                                        nav_msgs.srv.GetPlan,
+                                        persistent=True)
+            self._thread_clients.nav_plan_client = client
+
+        return client
+
+    def _get_path_costs_client(self):
+        """
+        The calling thread's persistent connection to the batch path cost
+        service (see _get_nav_plan_client()).
+
+        :return: a service proxy, or None if the service isn't available
+        :rtype: rospy.ServiceProxy
+        """
+        if not self._path_costs_available:
+            return None
+
+        client = getattr(self._thread_clients, 'path_costs_client', None)
+
+        if client is None:
+            try:
+                rospy.wait_for_service(self.path_costs_srv_name, timeout=1.0)
+            except rospy.ROSException:
+                rospy.logwarn("PlannerProxy: Service {0} not available".format(self.path_costs_srv_name))
+                return None
+
+            client = rospy.ServiceProxy(self.path_costs_srv_name,
+                                        mrta.srv.GetPathCosts,
+                                        persistent=True)
+            self._thread_clients.path_costs_client = client
+
+        return client
+
     def _make_nav_plan(self, start, goal):
         """ Create a global plan between start and goal
 
@@ -206,10 +297,7 @@ class PlannerProxy:
         req.tolerance = 0.1
 
         try:
-            rospy.logdebug("PlannerProxy: Waiting for service {0}".format(self.plan_srv_name))
-            rospy.wait_for_service(self.plan_srv_name)
-            rospy.logdebug("PlannerProxy: Service ready.")
-            resp = self._nav_plan_client(req)
+            resp = self._get_nav_plan_client()(req)
 
             rospy.logdebug("PlannerProxy: Got plan:\n{0}".format(pp.pformat(resp)))
 
@@ -218,6 +306,13 @@ class PlannerProxy:
         except rospy.ServiceException, e:
             rospy.logerr("PlannerProxy: Service call failed: {0}".format(e))
 
+            # The connection may have been lost (e.g., move_base restarted).
+            # Reconnect on the next call.
+            self._thread_clients.nav_plan_client.close()
+            self._thread_clients.nav_plan_client = None
+
+            return []
+
     def _lookup_path_cost(self, start, goal):
         """
         Call the global planner service to obtain a path from start to goal
@@ -229,6 +324,35 @@ class PlannerProxy:
         navstack_module.cpp at:
         https://code.google.com/p/alufr-ros-pkg/source/browse/.
 
+        If a cost oracle (mrta.cost_oracle.CostOracle) has been loaded, the
+        cost is looked up there instead, and the planner is only used as a
+        fallback.
+
+        :param geometry_msgs.msg.Pose: start
+        :param geometry_msgs.msg.Pose: goal
+        :return: The cost of the shortest path from start to goal
+        :rtype: float
+        """
+
+        # Try the cost oracle first. If it can't find a path (e.g., start or
+        # goal is off the map), fall back to asking the planner.
+        if self.cost_oracle is not None:
+            path_cost = self.cost_oracle.cost(start, goal)
+            if self._is_reachable_distance(path_cost):
+                rospy.logdebug("PlannerProxy ({0}): Oracle path cost from ({1},{2}) to ({3},{4}) is {5}".format(
+                    self.robot_name,
+                    start.position.x, start.position.y,
+                    goal.position.x, goal.position.y,
+                    path_cost))
+                return path_cost
+
+        return self._plan_path_cost(start, goal)
+
+    def _plan_path_cost(self, start, goal):
+        """
+        Call the global planner service to obtain a path from start to goal
+        and calculate its cost (see _lookup_path_cost()).
+
         :param geometry_msgs.msg.Pose: start
         :param geometry_msgs.msg.Pose: goal
         :return: The cost of the shortest path from start to goal
@@ -293,34 +417,34 @@ class PlannerProxy:
         :rtype: float
         """
 
-        # Let's consider the distances start->goal and goal->start
-        # to be equivalent. We'll need keys to look up (and possibly
-        # store) distances for each direction
-        start_tuple = (start.position.x, start.position.y)
-        goal_tuple = (goal.position.x, goal.position.y)
-        sg_key = (start_tuple, goal_tuple)
-        gs_key = (goal_tuple, start_tuple)
-
-        # The distance to return
-        distance = None
-
-        # First check the cache
-        if sg_key in self._path_distance_cache and self._is_reachable_distance(self._path_distance_cache[sg_key]):
-            distance = self._path_distance_cache[sg_key]
-            rospy.logdebug("  CACHE HIT (sg), distance=={0}".format(distance))
-        elif gs_key in self._path_distance_cache and self._is_reachable_distance(self._path_distance_cache[gs_key]):
-            distance = self._path_distance_cache[gs_key]
-            rospy.logdebug("  CACHE HIT (gs), distance=={0}".format(distance))
+        # First check the cache. It considers the distances start->goal and
+        # goal->start to be equivalent.
+        with self._lock:
+            distance = self._path_distance_cache.get(start, goal)
+
+        if distance is not None:
+            rospy.logdebug("  CACHE HIT, distance=={0}".format(distance))
 
         # Otherwise call the planner to find the distance
         else:
             rospy.logdebug("  CACHE MISS, LOOKING UP...")
 
-            distance = self._lookup_path_cost(start, goal)
+            if self.path_cost_db is not None:
+                with self._lock:
+                    distance = self.path_cost_db.get(start, goal)
 
-            # Store the distance in the cache
-            self._path_distance_cache[sg_key] = distance
-            self._path_distance_cache[gs_key] = distance
+            if distance is None:
+                distance = self._lookup_path_cost(start, goal)
+
+                if self.path_cost_db is not None and self._is_reachable_distance(distance):
+                    with self._lock:
+                        self.path_cost_db.put(start, goal, distance)
+
+            # Store the distance in the cache. Unreachable distances aren't
+            # stored, so that we try again next time.
+            if self._is_reachable_distance(distance):
+                with self._lock:
+                    self._path_distance_cache.put(start, goal, distance)
 
         rospy.logdebug("({0}): get_path_cost: ({1},{2})->({3},{4}) == {5}".format(
             self.robot_name,
@@ -329,3 +453,119 @@ class PlannerProxy:
             distance))
 
         return distance
+
+    def _lookup_path_costs(self, pairs):
+        """
+        Call the batch path cost service to get the costs of many
+        (start, goal) pairs at once.
+
+        :param pairs: a list of (geometry_msgs.msg.Pose, geometry_msgs.msg.Pose) tuples
+        :return: path costs, or None if the service isn't available or the call failed
+        :rtype: float[]
+        """
+        client = self._get_path_costs_client()
+        if client is None:
+            return None
+
+        req = mrta.srv.GetPathCostsRequest()
+        req.starts = [self._pose_to_posestamped(start) for (start, goal) in pairs]
+        req.goals = [self._pose_to_posestamped(goal) for (start, goal) in pairs]
+        req.tolerance = 0.1
+
+        try:
+            resp = client(req)
+        except rospy.ServiceException, e:
+            rospy.logerr("PlannerProxy: Service call failed: {0}".format(e))
+
+            # Reconnect on the next call (see _make_nav_plan())
+            client.close()
+            self._thread_clients.path_costs_client = None
+
+            return None
+
+        # If a path can't be calculated, its cost is the maximum int value
+        return [c if c > 0.0 else float(sys.maxint) for c in resp.costs]
+
+    def get_path_cost_async(self, start, goal):
+        """
+        Like get_path_cost(), but returns immediately. The path cost is found
+        by one of our pool of planner threads.
+
+        :param geometry_msgs.msg.Pose start: start point
+        :param geometry_msgs.msg.Pose goal: end point
+        :return: a future; its get() method returns the distance in meters
+        :rtype: multiprocessing.pool.AsyncResult
+        """
+        return self._pool.apply_async(self.get_path_cost, (start, goal))
+
+    def get_path_costs(self, pairs):
+        """
+        Get the path distances for a list of (start, goal) pairs. Distances
+        we've seen before come from the cache, then the cost oracle (if any)
+        is tried. The rest are looked up with a single call to the batch path
+        cost service or, if that isn't available, with concurrent calls to the
+        planner from our pool of planner threads.
+
+        :param pairs: a list of (geometry_msgs.msg.Pose, geometry_msgs.msg.Pose) tuples
+        :return: distances in meters, in the same order as pairs
+        :rtype: float[]
+        """
+        distances = [None] * len(pairs)
+
+        # Indices of the pairs we still need to look up
+        missing = []
+
+        with self._lock:
+            for i, (start, goal) in enumerate(pairs):
+                distances[i] = self._path_distance_cache.get(start, goal)
+                if distances[i] is None:
+                    missing.append(i)
+
+            if missing and self.path_cost_db is not None:
+                still_missing = []
+                for i in missing:
+                    distance = self.path_cost_db.get(pairs[i][0], pairs[i][1])
+                    if distance is None:
+                        still_missing.append(i)
+                    else:
+                        distances[i] = distance
+
+                missing = still_missing
+
+        if missing and self.cost_oracle is not None:
+            self.cost_oracle.precompute([pairs[i][0] for i in missing])
+
+            still_missing = []
+            for i in missing:
+                distance = self.cost_oracle.cost(pairs[i][0], pairs[i][1])
+                if self._is_reachable_distance(distance):
+                    distances[i] = distance
+                else:
+                    still_missing.append(i)
+
+            missing = still_missing
+
+        if missing:
+            rospy.logdebug("PlannerProxy ({0}): looking up {1} path costs".format(self.robot_name, len(missing)))
+
+            looked_up = self._lookup_path_costs([pairs[i] for i in missing])
+
+            if looked_up is None:
+                # Fire off every query at once, then wait for all of them
+                results = [self._pool.apply_async(self._plan_path_cost, pairs[i]) for i in missing]
+                looked_up = [result.get() for result in results]
+
+            with self._lock:
+                for i, distance in zip(missing, looked_up):
+                    distances[i] = distance
+
+                    if self.path_cost_db is not None and self._is_reachable_distance(distance):
+                        self.path_cost_db.put(pairs[i][0], pairs[i][1], distance)
+
+        # Store the (reachable) distances in the cache
+        with self._lock:
+            for (start, goal), distance in zip(pairs, distances):
+                if self._is_reachable_distance(distance):
+                    self._path_distance_cache.put(start, goal, distance)
+
+        return distances
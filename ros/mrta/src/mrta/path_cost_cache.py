@@ -0,0 +1,101 @@
+""" path_cost_cache
+
+An in-memory cache of path costs between pairs of points.
+
+Points are snapped to a grid before they're used as keys, so that a robot's
+(continuously jittering) AMCL pose still finds the costs we've looked up from
+nearly the same spot. start->goal and goal->start share an entry. The cache
+holds at most a fixed number of entries, evicting the least-recently-used.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+from collections import OrderedDict
+import math
+
+import mrta.cost_oracle
+
+# Points are snapped to a grid of this size (in meters)
+DEFAULT_RESOLUTION = 0.05
+
+# Maximum number of entries to keep
+DEFAULT_MAX_ENTRIES = 10000
+
+
+class PathCostCache(object):
+
+    def __init__(self, resolution=DEFAULT_RESOLUTION, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param float resolution: points are snapped to a grid of this many meters
+        :param int max_entries: maximum number of entries to keep
+        """
+        self.resolution = resolution
+        self.max_entries = max_entries
+
+        # Keys are pairs of snapped points, values are path costs. Entries are
+        # kept in least- to most-recently-used order.
+        self._costs = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _snap(self, point):
+        x, y = mrta.cost_oracle.xy(point)
+        return (int(math.floor(x / self.resolution + 0.5)),
+                int(math.floor(y / self.resolution + 0.5)))
+
+    def _key(self, start, goal):
+        """ start->goal and goal->start share the same key """
+        start_key = self._snap(start)
+        goal_key = self._snap(goal)
+
+        return min(start_key, goal_key), max(start_key, goal_key)
+
+    def get(self, start, goal):
+        """ The cached cost of the path between start and goal, or None
+
+        :param start: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :param goal: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :rtype: float
+        """
+        key = self._key(start, goal)
+
+        cost = self._costs.pop(key, None)
+        if cost is None:
+            self.misses += 1
+            return None
+
+        # Mark as most recently used
+        self._costs[key] = cost
+        self.hits += 1
+
+        return cost
+
+    def put(self, start, goal, cost):
+        """ Cache the cost of the path between start and goal """
+        key = self._key(start, goal)
+
+        self._costs.pop(key, None)
+        self._costs[key] = cost
+
+        while len(self._costs) > self.max_entries:
+            self._costs.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        """ Discard every entry (e.g., when the costmaps have been cleared) """
+        self._costs.clear()
+
+    def __len__(self):
+        return len(self._costs)
+
+    def stats(self):
+        """ Hit, miss and eviction counts and the current size
+
+        :rtype: dict
+        """
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._costs)}
@@ -0,0 +1,228 @@
+""" path_cost_db
+
+A path cost cache that is kept on disk (in a mrta.file_db.FileDB), so that
+path costs found in one run can be reused by every node in later runs.
+
+Costs are only valid for the map and costmap configuration they were planned
+on, so they are stored under a "namespace": a hash of the map files and the
+costmap parameters that affect path lengths. Endpoints are quantized, so that
+points which differ by less than the map's resolution share an entry.
+
+Every entry is stored under its own key (the namespace followed by the
+quantized endpoints), so writing new entries doesn't mean reading and
+rewriting everything that's already on disk. Entries for the current
+namespace are read into memory when the cache is created. New entries are
+kept in memory until flush() is called; autoflush() does this periodically
+and on shutdown, so that the database's lock is only held briefly and
+rarely.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import hashlib
+import os.path
+import threading
+
+import rospy
+import yaml
+
+import mrta.cost_oracle
+import mrta.file_db
+
+# Name of the database file, relative to the mrta package
+PATH_COST_DB_FILENAME = 'path_costs.db'
+
+# Endpoints are rounded to the nearest multiple of this (in meters)
+DEFAULT_QUANTUM = 0.05
+
+# How often (in seconds) autoflush() writes new entries to disk
+DEFAULT_FLUSH_PERIOD = 30.0
+
+# Parameters of the global costmap that change the paths the planner returns
+COSTMAP_PARAM_NAMES = ['robot_radius',
+                       'footprint',
+                       'footprint_padding',
+                       'inflation_radius',
+                       'cost_scaling_factor',
+                       'lethal_cost_threshold',
+                       'resolution']
+
+
+def get_costmap_params(costmap_ns):
+    """ Read the parameters named in COSTMAP_PARAM_NAMES from the parameter
+    server (e.g., from '/robot_1/move_base_node/global_costmap').
+
+    :param str costmap_ns: namespace of the global costmap's parameters
+    :return: a dictionary of parameter names to values (None if not set)
+    :rtype: dict
+    """
+    params = {}
+    for name in COSTMAP_PARAM_NAMES:
+        params[name] = rospy.get_param("{0}/{1}".format(costmap_ns, name), None)
+
+    return params
+
+
+def map_hash(map_file):
+    """ A hash of a map_server .yaml file and the image it refers to """
+    map_file = mrta.cost_oracle.resolve_map_path(map_file)
+
+    sha = hashlib.sha1()
+
+    with open(map_file, 'rb') as yaml_file:
+        yaml_data = yaml_file.read()
+    sha.update(yaml_data)
+
+    image_path = yaml.load(yaml_data)['image']
+    if not os.path.isabs(image_path):
+        image_path = os.path.join(os.path.dirname(map_file), image_path)
+
+    with open(image_path, 'rb') as image_file:
+        sha.update(image_file.read())
+
+    return sha.hexdigest()
+
+
+class PathCostDB(object):
+
+    def __init__(self, map_file, costmap_params=None, quantum=DEFAULT_QUANTUM, filename=PATH_COST_DB_FILENAME):
+        """
+        :param str map_file: the map_server .yaml file the planner is using
+        :param dict costmap_params: costmap parameters (see get_costmap_params())
+        :param float quantum: endpoints are rounded to multiples of this many meters
+        :param str filename: database file name, relative to the mrta package
+        """
+        self.quantum = quantum
+        self.filename = filename
+
+        if costmap_params is None:
+            costmap_params = {}
+
+        sha = hashlib.sha1(map_hash(map_file))
+        sha.update(repr(sorted(costmap_params.items())))
+        sha.update(repr(quantum))
+        self.namespace = sha.hexdigest()
+
+        # Entries for our namespace. Keys are pairs of quantized endpoints,
+        # values are path costs.
+        self._costs = {}
+
+        # Entries we've added since the last flush()
+        self._new_costs = {}
+
+        # Guards _costs and _new_costs, which may be written by one thread
+        # while another flushes. It isn't held while the database is open.
+        self._lock = threading.Lock()
+
+        self._flush_timer = None
+
+        self.hits = 0
+        self.misses = 0
+
+        self.load()
+
+    def _key(self, start, goal):
+        """ A quantized key for the pair of points. start->goal and goal->start
+        share the same key.
+        """
+        start_xy = mrta.cost_oracle.xy(start)
+        goal_xy = mrta.cost_oracle.xy(goal)
+
+        start_q = (int(round(start_xy[0] / self.quantum)), int(round(start_xy[1] / self.quantum)))
+        goal_q = (int(round(goal_xy[0] / self.quantum)), int(round(goal_xy[1] / self.quantum)))
+
+        return min(start_q, goal_q), max(start_q, goal_q)
+
+    def _db_key(self, key):
+        """ The database key of an entry, e.g. '<namespace>/10,-4,32,7' """
+        (start_x, start_y), (goal_x, goal_y) = key
+        return "{0}/{1},{2},{3},{4}".format(self.namespace, start_x, start_y, goal_x, goal_y)
+
+    @staticmethod
+    def _parse_db_key(db_key):
+        """ The inverse of _db_key() (without the namespace) """
+        start_x, start_y, goal_x, goal_y = [int(v) for v in db_key.rsplit('/', 1)[1].split(',')]
+        return (start_x, start_y), (goal_x, goal_y)
+
+    def load(self):
+        """ Read every entry for our namespace from the database """
+        prefix = self.namespace + '/'
+        costs = {}
+
+        db = mrta.file_db.FileDB()
+        try:
+            db.open(self.filename)
+            for db_key in db.keys():
+                if db_key.startswith(prefix):
+                    costs[self._parse_db_key(db_key)] = db[db_key]
+        except:
+            rospy.logerr("Error reading path costs from {0}".format(self.filename))
+        finally:
+            db.close()
+
+        with self._lock:
+            self._costs.update(costs)
+
+        rospy.loginfo("Loaded {0} path costs from {1}".format(len(costs), self.filename))
+
+    def flush(self):
+        """ Write the entries we've added to the database """
+        with self._lock:
+            new_costs = self._new_costs
+            self._new_costs = {}
+
+        if not new_costs:
+            return
+
+        db = mrta.file_db.FileDB()
+        try:
+            db.open(self.filename)
+            for key, cost in new_costs.iteritems():
+                db[self._db_key(key)] = cost
+        except:
+            rospy.logerr("Error writing path costs to {0}".format(self.filename))
+
+            # Try again next time
+            with self._lock:
+                new_costs.update(self._new_costs)
+                self._new_costs = new_costs
+        finally:
+            db.close()
+
+    def autoflush(self, period=DEFAULT_FLUSH_PERIOD):
+        """ Call flush() every period seconds, and when the node shuts down
+
+        :param float period: seconds between flushes
+        """
+        if self._flush_timer is not None:
+            self._flush_timer.shutdown()
+
+        self._flush_timer = rospy.Timer(rospy.Duration(period), lambda event: self.flush())
+        rospy.on_shutdown(self.flush)
+
+    def get(self, start, goal):
+        """ The cost of the path between start and goal, or None if we don't have it
+
+        :param start: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :param goal: a geometry_msgs.msg.Pose, mrta.Point or (x, y) tuple
+        :rtype: float
+        """
+        key = self._key(start, goal)
+
+        with self._lock:
+            cost = self._costs.get(key)
+
+        if cost is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return cost
+
+    def put(self, start, goal, cost):
+        """ Store the cost of the path between start and goal """
+        key = self._key(start, goal)
+
+        with self._lock:
+            self._costs[key] = cost
+            self._new_costs[key] = cost
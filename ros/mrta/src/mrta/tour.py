@@ -0,0 +1,270 @@
+""" tour
+
+Solve for the cheapest order in which a robot can visit a set of task points.
+
+Tours are "open": they begin at a fixed start node (e.g., the robot's current
+position) and end at whichever node is visited last, without returning to
+the start. Every function works on a square matrix of path costs between
+nodes and returns tours as lists of node indices, beginning with the start.
+
+solve_tour() picks an algorithm by the number of nodes to visit:
+
+  - Up to HELD_KARP_MAX_NODES, the Held-Karp dynamic program finds an
+    optimal tour.
+
+  - Beyond that, a nearest-neighbour tour is improved by 2-opt and Or-opt
+    moves until no move improves it or a time budget runs out.
+
+The local search moves assume that path costs are symmetric, which they are
+(up to planner noise) for the paths a robot drives.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import time
+
+import numpy as np
+
+# Solve tours of at most this many nodes (not counting the start) optimally
+HELD_KARP_MAX_NODES = 12
+
+# Default time limit (in seconds) for improving larger tours
+DEFAULT_TIME_BUDGET = 0.2
+
+# The longest run of consecutive nodes an Or-opt move relocates
+OR_OPT_MAX_SEGMENT = 3
+
+# Ignore "improvements" smaller than this (to avoid cycling on rounding error)
+EPSILON = 1e-9
+
+
+def greedy_tour(costs, nodes, start=0):
+    """ A tour of nodes from start, always visiting the closest unvisited node next
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] nodes: nodes to visit
+    :param int start: the node to start from
+    :return: the nodes in the order they're visited, beginning with start
+    :rtype: int[]
+    """
+    tour = [start]
+    remaining = list(nodes)
+
+    while remaining:
+        # Ties go to the node listed first, as in RobotController._nearest_task()
+        next_node = min(remaining, key=lambda n: costs[tour[-1], n])
+        tour.append(next_node)
+        remaining.remove(next_node)
+
+    return tour
+
+
+def tour_cost(costs, tour):
+    """ The cost of visiting the nodes of tour in order """
+    return float(sum(costs[tour[i], tour[i + 1]] for i in xrange(len(tour) - 1)))
+
+
+def held_karp(costs, nodes, start=0):
+    """ An optimal tour of nodes from start, by dynamic programming over
+    subsets of nodes. Takes O(2^n * n^2) time and O(2^n * n) space for n nodes.
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] nodes: nodes to visit
+    :param int start: the node to start from
+    :return: the nodes in the order they're visited, beginning with start
+    :rtype: int[]
+    """
+    nodes = list(nodes)
+    n = len(nodes)
+
+    if n < 2:
+        return [start] + nodes
+
+    # Costs between the nodes to visit (by their position in nodes)
+    sub_costs = costs[np.ix_(nodes, nodes)]
+
+    # best[mask, j] is the cost of the cheapest tour from start that visits
+    # every node in mask, ending at node j. parent[mask, j] is the node
+    # visited before j in that tour.
+    best = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+
+    bits = 1 << np.arange(n)
+    for j in xrange(n):
+        best[bits[j], j] = costs[start, nodes[j]]
+
+    for mask in xrange(1, 1 << n):
+        members = np.flatnonzero(mask & bits)
+        if len(members) < 2:
+            continue
+
+        # candidates[a, k]: reach members[a] last, having visited the rest of
+        # mask and ending at node k before it
+        candidates = best[mask ^ bits[members], :] + sub_costs[:, members].T
+
+        previous = np.argmin(candidates, axis=1)
+        best[mask, members] = candidates[np.arange(len(members)), previous]
+        parent[mask, members] = previous
+
+    # Walk back from the cheapest complete tour
+    mask = (1 << n) - 1
+    j = int(np.argmin(best[mask]))
+
+    reversed_tour = []
+    while j >= 0:
+        reversed_tour.append(nodes[j])
+        mask, j = mask ^ (1 << j), int(parent[mask, j])
+
+    return [start] + reversed_tour[::-1]
+
+
+def two_opt(costs, tour, deadline=None):
+    """ Improve tour by reversing segments of it, until no reversal helps or
+    the deadline passes. The start (tour[0]) stays put.
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] tour: a tour, beginning with its start node
+    :param float deadline: a time.time() by which to stop, or None
+    :return: True if the tour was improved
+    :rtype: bool
+    """
+    improved = False
+    last = len(tour) - 1
+
+    improving = True
+    while improving:
+        improving = False
+
+        for i in xrange(1, last):
+            if deadline is not None and time.time() > deadline:
+                return improved
+
+            before = tour[i - 1]
+            first = tour[i]
+
+            for j in xrange(i + 1, last + 1):
+                end = tour[j]
+
+                # Reversing tour[i..j] replaces edges (before, first) and
+                # (end, after) with (before, end) and (first, after). An open
+                # tour has no edge after its last node.
+                delta = costs[before, end] - costs[before, first]
+                if j < last:
+                    after = tour[j + 1]
+                    delta += costs[first, after] - costs[end, after]
+
+                if delta < -EPSILON:
+                    tour[i:j + 1] = tour[i:j + 1][::-1]
+                    first = tour[i]
+                    improved = improving = True
+
+    return improved
+
+
+def or_opt(costs, tour, deadline=None):
+    """ Improve tour by moving runs of up to OR_OPT_MAX_SEGMENT consecutive
+    nodes elsewhere in it, until no move helps or the deadline passes. The
+    start (tour[0]) stays put.
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] tour: a tour, beginning with its start node
+    :param float deadline: a time.time() by which to stop, or None
+    :return: True if the tour was improved
+    :rtype: bool
+    """
+    improved = False
+
+    improving = True
+    while improving:
+        improving = False
+
+        for length in xrange(1, OR_OPT_MAX_SEGMENT + 1):
+            for i in xrange(1, len(tour) - length + 1):
+                if deadline is not None and time.time() > deadline:
+                    return improved
+
+                # Remove the segment tour[i:i + length]...
+                segment = tour[i:i + length]
+                before = tour[i - 1]
+                after = tour[i + length] if i + length < len(tour) else None
+
+                removed = costs[before, segment[0]]
+                if after is not None:
+                    removed += costs[segment[-1], after] - costs[before, after]
+
+                rest = tour[:i] + tour[i + length:]
+
+                # ...and find the cheapest place to put it back
+                best_delta = -EPSILON
+                best_position = None
+                for position in xrange(1, len(rest) + 1):
+                    if position == i:
+                        continue
+
+                    prev_node = rest[position - 1]
+                    added = costs[prev_node, segment[0]]
+                    if position < len(rest):
+                        next_node = rest[position]
+                        added += costs[segment[-1], next_node] - costs[prev_node, next_node]
+
+                    if added - removed < best_delta:
+                        best_delta = added - removed
+                        best_position = position
+
+                if best_position is not None:
+                    tour[:] = rest[:best_position] + segment + rest[best_position:]
+                    improved = improving = True
+                    break
+
+            if improving:
+                break
+
+    return improved
+
+
+def local_search(costs, nodes, start=0, time_budget=DEFAULT_TIME_BUDGET):
+    """ A nearest-neighbour tour of nodes from start, improved by 2-opt and
+    Or-opt moves for at most time_budget seconds.
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] nodes: nodes to visit
+    :param int start: the node to start from
+    :param float time_budget: seconds
+    :return: the nodes in the order they're visited, beginning with start
+    :rtype: int[]
+    """
+    deadline = time.time() + time_budget
+
+    tour = greedy_tour(costs, nodes, start)
+
+    # Alternate between the two neighbourhoods until neither helps
+    while time.time() < deadline:
+        two_opt(costs, tour, deadline)
+        if not or_opt(costs, tour, deadline):
+            break
+
+    return tour
+
+
+def solve_tour(costs, nodes=None, start=0, time_budget=DEFAULT_TIME_BUDGET):
+    """ A cheap (optimal, if there are few enough nodes) tour of nodes from start
+
+    :param numpy.ndarray costs: matrix of path costs between nodes
+    :param int[] nodes: nodes to visit. By default, every node but start.
+    :param int start: the node to start from
+    :param float time_budget: seconds to spend improving tours that are too
+                              large to solve optimally
+    :return: the tour (beginning with start) and its cost
+    :rtype: (int[], float)
+    """
+    costs = np.asarray(costs, dtype=np.float64)
+
+    if nodes is None:
+        nodes = [n for n in xrange(len(costs)) if n != start]
+
+    if len(nodes) <= HELD_KARP_MAX_NODES:
+        tour = held_karp(costs, nodes, start)
+    else:
+        tour = local_search(costs, nodes, start, time_budget)
+
+    return tour, tour_cost(costs, tour)
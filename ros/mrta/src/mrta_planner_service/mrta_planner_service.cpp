@@ -4,48 +4,32 @@
 
 #include <ros/ros.h>
 #include <nav_msgs/GetPlan.h>
+#include <mrta/GetPathCosts.h>
+
+#include <cmath>
+#include <limits>
 
 #include <mrta_planner_service/mrta_planner_service.h>
 
 namespace mrta_planner_service {
 
-    bool planService(nav_msgs::GetPlan::Request &req, nav_msgs::GetPlan::Response &resp) {
-        //make sure we have a costmap for our planner
-        if (planner_costmap_ros_ == NULL) {
-            ROS_ERROR("move_base cannot make a plan for you because it doesn't have a costmap");
-            return false;
-        }
-        tf::Stamped <tf::Pose> global_pose;
-        if (!planner_costmap_ros_->getRobotPose(global_pose)) {
-            ROS_ERROR("move_base cannot make a plan for you because it could not get the start pose of the robot");
-            return false;
-        }
-        geometry_msgs::PoseStamped start;
-        //if the user does not specify a start pose, identified by an empty frame id, then use the robot's pose
-        if (req.start.header.frame_id == "")
-            tf::poseStampedTFToMsg(global_pose, start);
-        else
-            start = req.start;
-
-        //update the copy of the costmap the planner uses
-        //clearCostmapWindows(2 * clearing_radius_, 2 * clearing_radius_);
-
+    bool makePlanWithTolerance(const geometry_msgs::PoseStamped &start, const geometry_msgs::PoseStamped &goal,
+                               float tolerance, std::vector <geometry_msgs::PoseStamped> &global_plan) {
         //first try to make a plan to the exact desired goal
-        std::vector <geometry_msgs::PoseStamped> global_plan;
-        if (!planner_->makePlan(start, req.goal, global_plan) || global_plan.empty()) {
+        if (!planner_->makePlan(start, goal, global_plan) || global_plan.empty()) {
             ROS_DEBUG_NAMED("move_base",
                             "Failed to find a plan to exact goal of (%.2f, %.2f), searching for a feasible goal within tolerance",
-                            req.goal.pose.position.x, req.goal.pose.position.y);
+                            goal.pose.position.x, goal.pose.position.y);
 
             //search outwards for a feasible goal within the specified tolerance
             geometry_msgs::PoseStamped p;
-            p = req.goal;
+            p = goal;
             bool found_legal = false;
             float resolution = planner_costmap_ros_->getCostmap()->getResolution();
             float search_increment = resolution * 3.0;
-            if (req.tolerance > 0.0 && req.tolerance < search_increment) search_increment = req.tolerance;
+            if (tolerance > 0.0 && tolerance < search_increment) search_increment = tolerance;
             for (float max_offset = search_increment;
-                 max_offset <= req.tolerance && !found_legal; max_offset += search_increment) {
+                 max_offset <= tolerance && !found_legal; max_offset += search_increment) {
                 for (float y_offset = 0; y_offset <= max_offset && !found_legal; y_offset += search_increment) {
                     for (float x_offset = 0; x_offset <= max_offset && !found_legal; x_offset += search_increment) {
 
@@ -61,15 +45,15 @@ namespace mrta_planner_service {
                             for (float x_mult = -1.0; x_mult <= 1.0 + 1e-9 && !found_legal; x_mult += 2.0) {
                                 if (x_offset < 1e-9 && x_mult < -1.0 + 1e-9) continue;
 
-                                p.pose.position.y = req.goal.pose.position.y + y_offset * y_mult;
-                                p.pose.position.x = req.goal.pose.position.x + x_offset * x_mult;
+                                p.pose.position.y = goal.pose.position.y + y_offset * y_mult;
+                                p.pose.position.x = goal.pose.position.x + x_offset * x_mult;
 
                                 if (planner_->makePlan(start, p, global_plan)) {
                                     if (!global_plan.empty()) {
 
                                         //adding the (unreachable) original goal to the end of the global plan, in case the local planner can get you there
                                         //(the reachable goal should have been added by the global planner)
-                                        global_plan.push_back(req.goal);
+                                        global_plan.push_back(goal);
 
                                         found_legal = true;
                                         ROS_DEBUG_NAMED("move_base", "Found a plan to point (%.2f, %.2f)",
@@ -87,6 +71,42 @@ namespace mrta_planner_service {
             }
         }
 
+        return !global_plan.empty();
+    }
+
+    double planLength(const std::vector <geometry_msgs::PoseStamped> &plan) {
+        double length = 0.0;
+        for (unsigned int i = 1; i < plan.size(); ++i) {
+            length += hypot(plan[i].pose.position.x - plan[i - 1].pose.position.x,
+                            plan[i].pose.position.y - plan[i - 1].pose.position.y);
+        }
+        return length;
+    }
+
+    bool planService(nav_msgs::GetPlan::Request &req, nav_msgs::GetPlan::Response &resp) {
+        //make sure we have a costmap for our planner
+        if (planner_costmap_ros_ == NULL) {
+            ROS_ERROR("move_base cannot make a plan for you because it doesn't have a costmap");
+            return false;
+        }
+        tf::Stamped <tf::Pose> global_pose;
+        if (!planner_costmap_ros_->getRobotPose(global_pose)) {
+            ROS_ERROR("move_base cannot make a plan for you because it could not get the start pose of the robot");
+            return false;
+        }
+        geometry_msgs::PoseStamped start;
+        //if the user does not specify a start pose, identified by an empty frame id, then use the robot's pose
+        if (req.start.header.frame_id == "")
+            tf::poseStampedTFToMsg(global_pose, start);
+        else
+            start = req.start;
+
+        //update the copy of the costmap the planner uses
+        //clearCostmapWindows(2 * clearing_radius_, 2 * clearing_radius_);
+
+        std::vector <geometry_msgs::PoseStamped> global_plan;
+        makePlanWithTolerance(start, req.goal, req.tolerance, global_plan);
+
         //copy the plan into a message to send out
         resp.plan.poses.resize(global_plan.size());
         for (unsigned int i = 0; i < global_plan.size(); ++i) {
@@ -96,34 +116,74 @@ namespace mrta_planner_service {
         return true;
     }
 
-    int main(int argc, char **argv) {
-        ros::init(argc, argv, "mrta_planner_service");
-
-        ros::NodeHandle n;
-        ros::NodeHandle private_nh("~");
+    bool pathCostsService(mrta::GetPathCosts::Request &req, mrta::GetPathCosts::Response &resp) {
+        //make sure we have a costmap for our planner
+        if (planner_costmap_ros_ == NULL) {
+            ROS_ERROR("mrta_planner_service cannot compute path costs because it doesn't have a costmap");
+            return false;
+        }
+        if (req.starts.size() != 1 && req.starts.size() != req.goals.size()) {
+            ROS_ERROR("mrta_planner_service needs one start, or one start per goal (got %lu starts and %lu goals)",
+                      req.starts.size(), req.goals.size());
+            return false;
+        }
 
-        std::string global_planner;
-        private_nh.param("base_global_planner", global_planner, std::string("navfn/NavfnROS"));
+        //the cost of a path that can't be found, the same as float(sys.maxint) in our Python code
+        const double unreachable_cost = static_cast<double>(std::numeric_limits<long>::max());
 
-        //create the ros wrapper for the planner's costmap... and initializer a pointer we'll use with the underlying map
-        planner_costmap_ros_ = new costmap_2d::Costmap2DROS("global_costmap", tf_);
-        planner_costmap_ros_->pause();
+        resp.costs.resize(req.goals.size());
+        for (unsigned int i = 0; i < req.goals.size(); ++i) {
+            const geometry_msgs::PoseStamped &start = req.starts.size() == 1 ? req.starts[0] : req.starts[i];
 
-        //initialize the global planner
-        try {
-            planner_ = bgp_loader_.createInstance(global_planner);
-            planner_->initialize(bgp_loader_.getName(global_planner), planner_costmap_ros_);
-        } catch (const pluginlib::PluginlibException& ex) {
-            ROS_FATAL("Failed to create the %s planner, are you sure it is properly registered and that the containing library is built? Exception: %s", global_planner.c_str(), ex.what());
-            exit(1);
+            std::vector <geometry_msgs::PoseStamped> global_plan;
+            if (makePlanWithTolerance(start, req.goals[i], req.tolerance, global_plan)) {
+                resp.costs[i] = planLength(global_plan);
+            } else {
+                resp.costs[i] = unreachable_cost;
+            }
         }
 
-        ros::ServiceServer service = n.advertiseService("make_plan", planService);
-        ROS_INFO("Ready to plan paths.");
+        return true;
+    }
+}
 
-        ros::spin();
+int main(int argc, char **argv) {
+    using namespace mrta_planner_service;
 
-        return 0;
+    ros::init(argc, argv, "mrta_planner_service");
+
+    ros::NodeHandle n;
+    ros::NodeHandle private_nh("~");
+
+    std::string global_planner;
+    private_nh.param("base_global_planner", global_planner, std::string("navfn/NavfnROS"));
+
+    //the costmap and planner need these (as in move_base), for as long as we're running
+    tf::TransformListener tf(ros::Duration(10));
+    pluginlib::ClassLoader<nav_core::BaseGlobalPlanner> bgp_loader("nav_core", "nav_core::BaseGlobalPlanner");
+
+    //create the ros wrapper for the planner's costmap... and initializer a pointer we'll use with the underlying map.
+    //we only plan with it, so it keeps running (move_base pauses its own until it has a goal)
+    planner_costmap_ros_ = new costmap_2d::Costmap2DROS("global_costmap", tf);
+
+    //initialize the global planner
+    try {
+        planner_ = bgp_loader.createInstance(global_planner);
+        planner_->initialize(bgp_loader.getName(global_planner), planner_costmap_ros_);
+    } catch (const pluginlib::PluginlibException& ex) {
+        ROS_FATAL("Failed to create the %s planner, are you sure it is properly registered and that the containing library is built? Exception: %s", global_planner.c_str(), ex.what());
+        exit(1);
     }
 
-}
\ No newline at end of file
+    ros::ServiceServer service = n.advertiseService("make_plan", planService);
+    ros::ServiceServer costs_service = n.advertiseService("get_path_costs", pathCostsService);
+    ROS_INFO("Ready to plan paths.");
+
+    ros::spin();
+
+    //release the planner before its class loader goes away
+    planner_.reset();
+    delete planner_costmap_ros_;
+
+    return 0;
+}
@@ -0,0 +1,96 @@
+""" test_bid_matrix
+
+Compare mrta.bid_matrix's lowest bids with a brute-force search through the
+bids that were made.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import random
+import unittest
+
+import mrta.bid_matrix
+
+# The number of random rounds to try
+TRIALS = 200
+
+
+def random_round(rng):
+    """ A BidMatrix of random bids (some missing, some tied), the bids as a
+    dictionary keyed by (robot_id, task_id), and robots to exclude
+    """
+    task_ids = [str(t) for t in xrange(rng.randint(1, 5))]
+    robot_ids = ['robot_{0}'.format(r) for r in xrange(rng.randint(1, 5))]
+
+    bids = mrta.bid_matrix.BidMatrix(task_ids)
+    values = {}
+
+    for robot_id in robot_ids:
+        for task_id in task_ids:
+            if rng.random() < 0.7:
+                value = rng.choice([1.0, 2.0, 3.0, rng.uniform(0.0, 5.0)])
+                bids.add(robot_id, task_id, value)
+                values[(robot_id, task_id)] = value
+
+    exclude = {}
+    for robot_id, task_id in values:
+        if rng.random() < 0.2:
+            exclude.setdefault(task_id, []).append(robot_id)
+
+    return bids, values, exclude
+
+
+class TestBidMatrix(unittest.TestCase):
+
+    def test_lowest(self):
+        rng = random.Random(0)
+
+        for trial in xrange(TRIALS):
+            bids, values, exclude = random_round(rng)
+            k = rng.randint(1, 4)
+
+            winners = bids.lowest(k, exclude)
+
+            for task_id, task_winners in zip(bids.task_ids, winners):
+                expected = sorted(value for (robot_id, t), value in values.items()
+                                  if t == task_id and robot_id not in exclude.get(task_id, ()))
+
+                self.assertEqual(len(set(task_winners)), len(task_winners))
+                self.assertEqual([values[(robot_id, task_id)] for robot_id in task_winners], expected[:k])
+
+    def test_lowest_per_task(self):
+        rng = random.Random(1)
+
+        for trial in xrange(TRIALS):
+            bids, values, exclude = random_round(rng)
+            k = [rng.randint(0, 3) for task_id in bids.task_ids]
+
+            winners = bids.lowest(k)
+
+            for task_id, task_k, task_winners in zip(bids.task_ids, k, winners):
+                expected = sorted(value for (robot_id, t), value in values.items() if t == task_id)
+
+                self.assertEqual([values[(robot_id, task_id)] for robot_id in task_winners], expected[:task_k])
+
+    def test_lowest_overall(self):
+        rng = random.Random(2)
+
+        for trial in xrange(TRIALS):
+            bids, values, exclude = random_round(rng)
+
+            lowest = bids.lowest_overall(exclude)
+
+            remaining = [value for (robot_id, task_id), value in values.items()
+                         if robot_id not in exclude.get(task_id, ())]
+
+            if not remaining:
+                self.assertIsNone(lowest)
+                continue
+
+            robot_id, task_id, value = lowest
+            self.assertEqual(value, min(remaining))
+            self.assertEqual(values[(robot_id, task_id)], value)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,166 @@
+""" test_cbba
+
+Check mrta.cbba's agents on small, random teams: a lone agent's bundle
+against a brute-force search over insertion positions, and a team's
+allocation (once its agents have exchanged what they know until nothing
+changes) for agreement and conflicts.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import unittest
+
+import numpy as np
+
+import mrta.cbba
+import mrta.tour
+
+# The number of random teams to try
+TRIALS = 100
+
+# Give up on consensus after this many rounds of messages
+MAX_ROUNDS = 100
+
+
+def random_agents(rng, num_robots, num_tasks, max_bundle=None):
+    """ An agent for each robot, with its own position and the tasks' """
+    points = rng.uniform(0.0, 20.0, size=(num_robots + num_tasks, 2))
+    all_costs = np.hypot(*(points[:, np.newaxis, :] - points[np.newaxis, :, :]).transpose(2, 0, 1))
+
+    task_ids = [str(t) for t in xrange(num_tasks)]
+
+    agents = []
+    for r in xrange(num_robots):
+        # Node 0 is the robot, then the tasks
+        nodes = [r] + range(num_robots, num_robots + num_tasks)
+        agents.append(mrta.cbba.Agent('robot_{0}'.format(r),
+                                      task_ids,
+                                      all_costs[np.ix_(nodes, nodes)],
+                                      base_tour=[0],
+                                      task_nodes=range(1, num_tasks + 1),
+                                      max_bundle=max_bundle))
+
+    return agents
+
+
+def brute_force_bundle(costs, task_nodes):
+    """ The tasks a lone agent adds, in order, its bids on them and its tour:
+    each time, the task with the lowest bid, which is the least cost it can
+    add at any position in the tour (but no less than the previous bid)
+    """
+    tour = [0]
+    bundle = []
+    bids = []
+
+    while len(bundle) < len(task_nodes):
+        floor = bids[-1] if bids else 0.0
+
+        best = None
+        for i, node in enumerate(task_nodes):
+            if i in bundle:
+                continue
+
+            trials = [tour[:position] + [node] + tour[position:] for position in xrange(1, len(tour) + 1)]
+            added, trial = min((mrta.tour.tour_cost(costs, t) - mrta.tour.tour_cost(costs, tour), t) for t in trials)
+
+            # Ties go to the first task
+            bid = max(added, floor)
+            if best is None or bid < best[0] - 1e-9:
+                best = (bid, i, trial)
+
+        bid, i, tour = best
+        bundle.append(i)
+        bids.append(bid)
+
+    return bundle, bids, tour
+
+
+def run_consensus(agents):
+    """ Build bundles and exchange messages (everyone hears everyone) until
+    nothing changes
+
+    :return: the number of rounds it took, or None if it didn't settle
+    """
+    clock = 0.0
+
+    for agent in agents:
+        agent.build_bundle()
+
+    for rounds in xrange(1, MAX_ROUNDS + 1):
+        clock += 1.0
+        messages = [(agent.robot_id, list(agent.winners), list(agent.winning_bids), dict(agent.stamps))
+                    for agent in agents]
+
+        changed = False
+        for agent in agents:
+            for sender, winners, bids, stamps in messages:
+                changed |= agent.update(sender, agent.task_ids, winners, bids, stamps, clock)
+            changed |= agent.build_bundle()
+
+        if not changed:
+            return rounds
+
+    return None
+
+
+class TestCBBA(unittest.TestCase):
+
+    def test_lone_agent(self):
+        rng = np.random.RandomState(0)
+
+        for trial in xrange(TRIALS):
+            agent = random_agents(rng, 1, rng.randint(1, 6))[0]
+
+            agent.build_bundle()
+
+            bundle, bids, tour = brute_force_bundle(agent.costs, agent.task_nodes)
+
+            self.assertEqual(agent.bundle, bundle)
+            for i, bid in zip(bundle, bids):
+                self.assertAlmostEqual(agent.winning_bids[i], bid)
+
+            self.assertEqual(sorted(agent.tour), sorted(tour))
+            self.assertAlmostEqual(mrta.tour.tour_cost(agent.costs, agent.tour), mrta.tour.tour_cost(agent.costs, tour))
+
+    def check_allocation(self, agents, max_bundle=None):
+        self.assertIsNotNone(run_consensus(agents))
+
+        # Everyone agrees...
+        state = agents[0].state()
+        for agent in agents:
+            self.assertEqual(agent.state(), state)
+
+        # ...every task has one winner, which has it in its bundle...
+        winners = state[0]
+        for i, winner in enumerate(winners):
+            owners = [agent.robot_id for agent in agents if i in agent.bundle]
+
+            if winner == mrta.cbba.NO_WINNER:
+                self.assertEqual(owners, [])
+            else:
+                self.assertEqual(owners, [winner])
+
+        # ...and every task is won, if the robots can take them all
+        capacity = len(agents) * (max_bundle or len(winners))
+        self.assertEqual(sum(winner != mrta.cbba.NO_WINNER for winner in winners),
+                         min(capacity, len(winners)))
+
+        for agent in agents:
+            self.assertLessEqual(len(agent.bundle), max_bundle or len(winners))
+            self.assertEqual(sorted(agent.tour[1:]), sorted(agent.task_nodes[i] for i in agent.bundle))
+
+    def test_team(self):
+        rng = np.random.RandomState(1)
+
+        for trial in xrange(TRIALS):
+            self.check_allocation(random_agents(rng, rng.randint(2, 5), rng.randint(1, 7)))
+
+    def test_team_max_bundle(self):
+        rng = np.random.RandomState(2)
+
+        for trial in xrange(TRIALS):
+            self.check_allocation(random_agents(rng, 3, rng.randint(1, 7), max_bundle=2), max_bundle=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+""" test_tour
+
+Compare mrta.tour's tours with brute-force search over every order of a few
+nodes.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+import mrta.tour
+
+# The number of random problems to try for each size
+TRIALS = 20
+
+
+def random_costs(rng, num_nodes):
+    """ Symmetric path costs between random points in the plane """
+    points = rng.uniform(0.0, 20.0, size=(num_nodes, 2))
+    return np.hypot(*(points[:, np.newaxis, :] - points[np.newaxis, :, :]).transpose(2, 0, 1))
+
+
+def brute_force_cost(costs, nodes, start=0):
+    """ The cost of the cheapest open tour of nodes from start, trying every order """
+    return min(mrta.tour.tour_cost(costs, [start] + list(order))
+               for order in itertools.permutations(nodes))
+
+
+class TestTour(unittest.TestCase):
+
+    def check_tour(self, tour, nodes, start):
+        self.assertEqual(tour[0], start)
+        self.assertEqual(sorted(tour[1:]), sorted(nodes))
+
+    def test_held_karp(self):
+        rng = np.random.RandomState(0)
+
+        for num_nodes in xrange(1, 8):
+            for trial in xrange(TRIALS):
+                costs = random_costs(rng, num_nodes)
+                start = rng.randint(num_nodes)
+                nodes = [n for n in xrange(num_nodes) if n != start]
+
+                tour = mrta.tour.held_karp(costs, nodes, start)
+
+                self.check_tour(tour, nodes, start)
+                self.assertAlmostEqual(mrta.tour.tour_cost(costs, tour), brute_force_cost(costs, nodes, start))
+
+    def test_held_karp_asymmetric(self):
+        rng = np.random.RandomState(1)
+
+        for trial in xrange(TRIALS):
+            costs = rng.uniform(1.0, 10.0, size=(6, 6))
+            nodes = [1, 2, 3, 4, 5]
+
+            tour = mrta.tour.held_karp(costs, nodes)
+
+            self.check_tour(tour, nodes, 0)
+            self.assertAlmostEqual(mrta.tour.tour_cost(costs, tour), brute_force_cost(costs, nodes))
+
+    def test_held_karp_subset(self):
+        rng = np.random.RandomState(2)
+
+        for trial in xrange(TRIALS):
+            costs = random_costs(rng, 8)
+            nodes = sorted(rng.choice(np.arange(1, 8), 4, replace=False))
+
+            tour = mrta.tour.held_karp(costs, nodes)
+
+            self.check_tour(tour, nodes, 0)
+            self.assertAlmostEqual(mrta.tour.tour_cost(costs, tour), brute_force_cost(costs, nodes))
+
+    def test_local_search(self):
+        rng = np.random.RandomState(3)
+
+        for trial in xrange(TRIALS):
+            costs = random_costs(rng, 8)
+            nodes = range(1, 8)
+
+            tour = mrta.tour.local_search(costs, nodes, time_budget=1.0)
+
+            # Not necessarily optimal, but a valid tour that's no worse than
+            # the nearest-neighbour tour it started from
+            self.check_tour(tour, nodes, 0)
+            self.assertGreaterEqual(mrta.tour.tour_cost(costs, tour) + 1e-6, brute_force_cost(costs, nodes))
+            self.assertLessEqual(mrta.tour.tour_cost(costs, tour),
+                                 mrta.tour.tour_cost(costs, mrta.tour.greedy_tour(costs, nodes)) + 1e-6)
+
+
+if __name__ == '__main__':
+    unittest.main()
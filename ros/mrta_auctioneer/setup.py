@@ -7,7 +7,7 @@ from catkin_pkg.python_setup import generate_distutils_setup
 
 # fetch values from package.xml
 setup_args = generate_distutils_setup(
-    packages=['p_median'],
+    packages=['p_median', 'winner_determination'],
     scripts=[],
     package_dir={'': 'src'}
 )
@@ -1,43 +1,79 @@
 """
 pmed_greedy.py
 
-Author Ningchuan Xiao <xiao.37@osu.edu>
+A greedy heuristic for the p-median problem: medians are added one at a time,
+each time the vertex that most reduces the total distance from every vertex
+to its nearest median.
+
+The distance from every vertex to its nearest median so far is kept in a
+vector, so every candidate is evaluated at once (in O(n) time each), and the
+vector is updated in place when a median is added.
+
+Based on pmed_greedy.py by Ningchuan Xiao <xiao.37@osu.edu>:
 
 https://github.com/gisalgs/optimization/
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
 """
 
-import sys
-from string import atoi
+import numpy as np
+
+__all__ = ['evaluate', 'pmed_greedy']
 
 INF = float('inf')
 
 
-def evaluate(dist, median, n):
-    sumdist = 0.0
-    p = len(median)
-    for i in range(n):
-        dist0 = INF
-        for j in range(p):
-            if dist[i][median[j]] < dist0:
-                dist0 = dist[i][median[j]]
-        sumdist += dist0
-    return sumdist
+def evaluate(dist, median, n=None):
+    """
+    The total distance from each vertex to its nearest median
+
+    :param dist: a distance matrix (dist[i][j] is the distance from vertex i
+        to vertex j)
+    :param int[] median: the vertices that are medians
+    :param int n: only the first n vertices are counted (all of them by default)
+    :return: the total distance
+    :rtype: float
+    """
+    dist = np.asarray(dist, dtype=float)
+
+    if n is None:
+        n = len(dist)
+
+    if not len(median):
+        return INF
+
+    return float(dist[:n, list(median)].min(axis=1).sum())
 
 
 def pmed_greedy(dist, p):
+    """
+    Choose p medians greedily
+
+    :param dist: a distance matrix (dist[i][j] is the distance from vertex i
+        to vertex j)
+    :param int p: the number of medians to choose
+    :return: the medians, in the order they were chosen
+    :rtype: int[]
+    """
+    dist = np.asarray(dist, dtype=float)
     n = len(dist)
+
     median = []
-    candidates = [i for i in range(n)]
-    for j in range(p):
-        dmin = INF
-        imin = -1
-        for i in candidates:
-            d = evaluate(dist, median+[i], n)
-            if d < dmin:
-                dmin = d
-                imin = i
-        candidates.remove(imin)
+    candidates = np.ones(n, dtype=bool)
+
+    # Each vertex's distance to its nearest median so far
+    nearest = np.full(n, INF)
+
+    for j in range(min(p, n)):
+        # The total distance if each vertex were added as a median
+        totals = np.minimum(dist, nearest[:, np.newaxis]).sum(axis=0)
+
+        # Ties go to the lowest-numbered vertex
+        candidate_ids = np.flatnonzero(candidates)
+        imin = int(candidate_ids[np.argmin(totals[candidate_ids])])
+
+        candidates[imin] = False
         median.append(imin)
+        np.minimum(nearest, dist[:, imin], out=nearest)
 
     return median
-
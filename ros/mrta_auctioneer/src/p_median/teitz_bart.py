@@ -1,136 +1,220 @@
 """
 teitz_bart.py
 
-Author Ningchuan Xiao <xiao.37@osu.edu>
+The Teitz-Bart vertex substitution heuristic for the p-median problem, with
+Whitaker's fast interchange. Starting from p medians, it repeatedly swaps
+the median and non-median whose exchange reduces the total distance most,
+until no swap helps.
+
+Every vertex's nearest and second-nearest medians are kept (as in Whitaker's
+method), so the best median to remove for every candidate is found at once:
+a candidate's gain is what the vertices it's closer to save, less what the
+vertices of the removed median lose by moving to the candidate or to their
+second-nearest median, whichever is closer. After a swap, only the vertices
+that were assigned to the removed median, or are closer to the added one,
+are reassigned.
+
+teitz_bart_multistart() runs the heuristic from several random starts (in
+parallel, if asked to). Start k is seeded with seed + k, so the result
+doesn't depend on how many processes are used.
+
+Based on teitz_bart.py by Ningchuan Xiao <xiao.37@osu.edu>:
 
 https://github.com/gisalgs/optimization/blob/master/teitz_bart.py
-"""
 
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
 
-from bisect import bisect_left
-from string import atoi, split
+import multiprocessing
 import random
-import sys
-#sys.path.append('../networks')
-#from network2listmatrix import network2distancematrix
-#from allpairdist import allpairs
+
+import numpy as np
+
+__all__ = ['update_assignment', 'teitz_bart', 'teitz_bart_multistart']
 
 INF = float('inf')
 
+# Ignore "improvements" smaller than this (to avoid cycling on rounding error)
+EPSILON = 1e-9
+
+# The number of random starts teitz_bart_multistart() makes by default
+DEFAULT_STARTS = 8
 
-def findout(median, fi, dist, d1, d2, N):
+
+def update_assignment(dist, median, d1, d2, p=None, N=None):
     """
-    Determines, given a candidate for insertion (fi), 
-    the best candidate in the solution to replace or remove (fr).
-    This does not change values in median, d1, and d2.
+    Updates d1 and d2 given median so that d1 holds the nearest median to
+    each vertex and d2 holds the second nearest (-1 if there is none)
+
+    :param numpy.ndarray dist: a distance matrix
+    :param int[] median: the medians
+    :param numpy.ndarray d1: (out) each vertex's nearest median
+    :param numpy.ndarray d2: (out) each vertex's second-nearest median
+    :return: the total distance from each vertex to its nearest median
+    :rtype: float
     """
-    w = 0.0
-    v = [0.0 for i in range(N)]
-    for i in range(N):
-        if dist[i][fi] < dist[i][d1[i]]:
-            w += dist[i][d1[i]] - dist[i][fi]
-        else:
-            v[d1[i]] += min(dist[i][fi],
-                            dist[i][d2[i]]) - dist[i][d1[i]]
-    fmin = INF
-    fr = 0
-    for i in median:
-        if v[i] < fmin:
-            fmin = v[i]
-            fr = i
-    fmin = w-fmin
-    return fmin, fr  # gain and vertex to be replaced
-
-
-def update_assignment(dist, median, d1, d2, p, N):
+    median = np.asarray(median, dtype=int)
+    to_medians = dist[:, median]
+
+    order = np.argsort(to_medians, axis=1, kind='mergesort')
+
+    d1[:] = median[order[:, 0]]
+    if len(median) > 1:
+        d2[:] = median[order[:, 1]]
+    else:
+        d2[:] = -1
+
+    return float(to_medians[np.arange(len(dist)), order[:, 0]].sum())
+
+
+def _distances(dist, d1, d2):
+    """ Each vertex's distance to its nearest and second-nearest medians """
+    rows = np.arange(len(dist))
+    dist1 = dist[rows, d1]
+    dist2 = np.where(d2 >= 0, dist[rows, np.maximum(d2, 0)], INF)
+    return dist1, dist2
+
+
+def _best_swap(dist, median, d1, d2):
     """
-    Updates d1 and d2 given median so that d1 holds the 
-    nearestest facility for each node and d2 holds the second
+    Find the swap that reduces the total distance most
+
+    :return: the gain, the median to remove and the vertex to add (the gain
+        is -INF if there's no vertex to add)
     """
-    dist1, dist2 = 0.0, 0.0
-    node1, node2 = -1, -1
-    for i in range(N):
-        dist1, dist2 = INF, INF
-        for j in range(p):
-            if dist[i][median[j]] < dist1:
-                dist2 = dist1
-                node2 = node1
-                dist1 = dist[i][median[j]]
-                node1 = median[j]
-            elif dist[i][median[j]] < dist2:
-                dist2 = dist[i][median[j]]
-                node2 = median[j]
-        d1[i] = node1
-        d2[i] = node2
-    dist1 = 0
-    for i in range(N):
-        dist1 += dist[i][d1[i]]
-    return dist1
-
-
-def next(dist, median, d1, d2, p, N):
+    N = len(dist)
+
+    is_median = np.zeros(N, dtype=bool)
+    is_median[median] = True
+    candidates = np.flatnonzero(~is_median)
+
+    if not len(candidates):
+        return -INF, None, None
+
+    dist1, dist2 = _distances(dist, d1, d2)
+
+    # to_candidates[i, c] is the distance from vertex i to candidate c
+    to_candidates = dist[:, candidates]
+    closer = to_candidates < dist1[:, np.newaxis]
+
+    # What the vertices that are closer to each candidate save
+    saved = np.where(closer, dist1[:, np.newaxis] - to_candidates, 0.0).sum(axis=0)
+
+    # What each of the others would lose if its nearest median were removed
+    lost = np.where(closer, 0.0, np.minimum(to_candidates, dist2[:, np.newaxis]) - dist1[:, np.newaxis])
+
+    # losses[m, c] is what removing median m loses if candidate c is added
+    assigned = (d1[np.newaxis, :] == np.asarray(median)[:, np.newaxis]).astype(float)
+    losses = assigned.dot(lost)
+
+    # Ties go to the first median and the lowest-numbered candidate
+    removed = np.argmin(losses, axis=0)
+    gains = saved - losses[removed, np.arange(len(candidates))]
+
+    best = int(np.argmax(gains))
+
+    return float(gains[best]), median[removed[best]], int(candidates[best])
+
+
+def _reassign(dist, median, d1, d2, fr, fi):
+    """ Update d1 and d2 after median fr is replaced by vertex fi """
+    dist1, dist2 = _distances(dist, d1, d2)
+    to_fi = dist[:, fi]
+
+    # Vertices that were assigned to fr need their nearest two found again
+    lost_median = (d1 == fr) | (d2 == fr)
+    if lost_median.any():
+        rows = np.flatnonzero(lost_median)
+        sub1 = np.empty(len(rows), dtype=int)
+        sub2 = np.empty(len(rows), dtype=int)
+        update_assignment(dist[rows], median, sub1, sub2)
+        d1[rows] = sub1
+        d2[rows] = sub2
+
+    # For the others, fi can only move up to first or second
+    kept = ~lost_median
+    first = kept & (to_fi < dist1)
+    second = kept & ~first & (to_fi < dist2)
+
+    d2[first] = d1[first]
+    d1[first] = fi
+    d2[second] = fi
+
+
+def teitz_bart(dist, p, verbose=False, seed=None, median=None):
     """
     INPUT
       dist: distance matrix
-      median: list of integers for selected vertices
-      d1: list of nearest facility for each vertex
-      d2: list of second nearest facility
-      p: number of facilities to locate
-      N: number of vertices on the nextwork
+      p: number of medians to be selected
+      verbose: whether intermediate results are printed
+      seed: seeds the random start (the random module's state is used if None)
+      median: a start to use instead of a random one
     OUTPUT
       r: total distance
       median: list of integers for selected vertices
     """
-    bestgain = -INF
-    for i in range(N):
-        gain, fr1 = findout(median, i, dist, d1, d2, N)
-        if i in median:
-            continue
-        if gain > bestgain:
-            bestgain = gain
-            fr = fr1
-            fi = i
-    r = 0
-    print "bestgain: {0}".format(bestgain)
-    if bestgain > 0:
-        i = median.index(fr) 
-        median[i] = fi
-        r = update_assignment(dist, median, d1, d2, p, N)
-    return bestgain > 0, r, fr, fi
-
-
-def teitz_bart(dist, p, verbose=False):
-    """
-    INPUT
-      dist: distance matrix
-      p: number of facilities to be selected
-      verbose: whether intermediate results are printed
-    """
+    dist = np.asarray(dist, dtype=float)
     N = len(dist)
-    median = random.sample(range(N), p)
-    d1 = [-1 for i in range(N)]
-    d2 = [-1 for i in range(N)]
-    r = update_assignment(dist, median, d1, d2, p, N)
+    p = min(p, N)
+
+    if median is None:
+        rng = random.Random(seed) if seed is not None else random
+        median = rng.sample(range(N), p)
+    else:
+        median = list(median)
+
+    d1 = np.empty(N, dtype=int)
+    d2 = np.empty(N, dtype=int)
+    r = update_assignment(dist, median, d1, d2)
     if verbose:
         print r
+
     while True:
-        result = next(dist, median, d1, d2, p, N)
-        if result[0]:
-            r = result[1]
-            if verbose:
-                print r
-        else:
+        gain, fr, fi = _best_swap(dist, median, d1, d2)
+        if gain <= EPSILON:
             break
+
+        median[median.index(fr)] = fi
+        _reassign(dist, median, d1, d2, fr, fi)
+
+        r = float(_distances(dist, d1, d2)[0].sum())
+        if verbose:
+            print r
+
     return r, median
 
-#if __name__ == "__main__":
-#    print 'Problem: simple network'
-#    a = network2distancematrix('../data/network-links', True)
-#    allpairs(a)
-#    teitz_bart(a, 2, True)
-#    print 'Problem: pmed1 in OR-lib'
-#    a = network2distancematrix('../data/orlib/pmed1.orlib',
-#                               False)
-#    allpairs(a)
-#    teitz_bart(a, 5, True)
-    
+
+def _run_start(args):
+    """ Run teitz_bart() from one start (in a worker process) """
+    dist, p, seed = args
+    return teitz_bart(dist, p, seed=seed)
+
+
+def teitz_bart_multistart(dist, p, starts=DEFAULT_STARTS, seed=0, processes=1):
+    """
+    Run teitz_bart() from several random starts and keep the best result
+
+    :param dist: a distance matrix
+    :param int p: the number of medians to select
+    :param int starts: the number of random starts
+    :param int seed: start k is seeded with seed + k
+    :param int processes: the number of processes to run starts in (if
+        None, one per CPU)
+    :return: the total distance and the medians of the best start (the first,
+        if several are equally good)
+    :rtype: (float, int[])
+    """
+    dist = np.asarray(dist, dtype=float)
+    jobs = [(dist, p, seed + k) for k in range(starts)]
+
+    if processes == 1 or starts <= 1:
+        results = map(_run_start, jobs)
+    else:
+        pool = multiprocessing.Pool(processes)
+        try:
+            results = pool.map(_run_start, jobs)
+        finally:
+            pool.close()
+            pool.join()
+
+    return min(results, key=lambda result: result[0])
@@ -0,0 +1 @@
+__all__ = ['anytime', 'assignment', 'subset_dp']
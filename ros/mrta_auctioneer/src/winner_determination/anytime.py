@@ -0,0 +1,233 @@
+""" anytime
+
+Time-budgeted winner determination for combinatorial auctions (see
+winner_determination.subset_dp for the problem and how bids are given).
+
+solve() returns the best allocation it can find within a time budget:
+
+  1. Two quick allocations seed the search: subset_dp.greedy()'s, and one in
+     which every task goes to the robot that bid least on it alone (as in PSI).
+
+  2. Each is improved by local search, which moves a task from one robot to
+     another, swaps two robots' tasks or swaps two robots' whole bundles,
+     until no move helps.
+
+  3. Whatever time is left goes to subset_dp.solve(), starting from the best
+     allocation found so far. If it finishes, that allocation is optimal.
+
+Along with the allocation, solve() returns a lower bound on the cost of any
+allocation, from which the optimality gap can be reported.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import time
+
+import numpy as np
+
+from . import subset_dp
+from .subset_dp import SUM, MAX
+
+# Ignore "improvements" smaller than this (to avoid cycling on rounding error)
+EPSILON = 1e-9
+
+
+def psi_allocation(bids):
+    """ Award every task to the robot that bid least on it alone
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b
+    :return: a bundle (bitmask) for each robot
+    :rtype: int[]
+    """
+    num_robots, num_bundles = bids.shape
+    num_tasks = num_bundles.bit_length() - 1
+
+    bundles = [0] * num_robots
+    for task in xrange(num_tasks):
+        bundles[int(np.argmin(bids[:, 1 << task]))] |= 1 << task
+
+    return bundles
+
+
+def lower_bound(bids, objective=SUM):
+    """ A lower bound on the cost of any allocation of every task
+
+    For each task, let share[t] be the lowest bid per task on any bundle that
+    includes t. A winning bid is at least the sum of its bundle's shares, so
+    a SUM allocation costs at least the sum of all shares, and a MAX
+    allocation (in which at most one bundle goes to each robot) at least
+    that sum over the number of robots. Either costs at least the lowest bid
+    on any bundle that includes the most expensive task, too.
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b
+    :param str objective: SUM or MAX
+    :rtype: float
+    """
+    num_robots, num_bundles = bids.shape
+    num_tasks = num_bundles.bit_length() - 1
+
+    if not num_tasks:
+        return 0.0
+
+    bundles = np.arange(1, num_bundles)
+    lowest = bids[:, 1:].min(axis=0)
+
+    sizes = np.zeros(num_bundles - 1)
+    for task in xrange(num_tasks):
+        sizes += (bundles >> task) & 1
+
+    per_task = lowest / sizes
+
+    shares = 0.0
+    largest = 0.0
+    for task in xrange(num_tasks):
+        with_task = (bundles & (1 << task)) != 0
+        shares += per_task[with_task].min()
+        largest = max(largest, lowest[with_task].min())
+
+    if objective == MAX:
+        return max(largest, shares / num_robots)
+
+    return max(largest, shares)
+
+
+def optimality_gap(cost, bound):
+    """ How much more than optimal (at most) an allocation may cost, as a
+    fraction of its cost
+
+    :param float cost: the allocation's cost
+    :param float bound: a lower bound on the optimal cost
+    :rtype: float
+    """
+    if cost <= 0.0:
+        return 0.0
+
+    return max(0.0, (cost - bound) / cost)
+
+
+def _score(values, objective):
+    """ Allocations are compared by cost, then (for MAX, to get off plateaus) by the sum of their bids """
+    if objective == MAX:
+        return values.max(), values.sum()
+
+    return values.sum(), 0.0
+
+
+def local_search(bids, bundles, objective=SUM, deadline=None):
+    """ Improve an allocation by moving tasks between robots, swapping tasks
+    and swapping bundles, until no move improves it or the deadline passes
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b
+    :param int[] bundles: a bundle (bitmask) for each robot. Changed in place.
+    :param str objective: SUM or MAX
+    :param float deadline: a time.time() by which to stop, or None
+    :return: True if the allocation was improved
+    :rtype: bool
+    """
+    num_robots, num_bundles = bids.shape
+    num_tasks = num_bundles.bit_length() - 1
+
+    values = np.array([bids[r, b] if b else 0.0 for r, b in enumerate(bundles)])
+    score = _score(values, objective)
+
+    def try_move(changes):
+        """ Apply changes ({robot: new bundle}) if they improve the allocation """
+        trial = values.copy()
+        for r, b in changes.items():
+            trial[r] = bids[r, b] if b else 0.0
+
+        trial_score = _score(trial, objective)
+        if trial_score[0] < score[0] - EPSILON or \
+                (trial_score[0] <= score[0] + EPSILON and trial_score[1] < score[1] - EPSILON):
+            for r, b in changes.items():
+                bundles[r] = b
+            values[:] = trial
+            return trial_score
+
+        return None
+
+    def moves():
+        """ Every move, as {robot: new bundle} """
+        for r1 in xrange(num_robots):
+            for r2 in xrange(num_robots):
+                if r1 == r2:
+                    continue
+
+                # Give r2 one of r1's tasks
+                for task in xrange(num_tasks):
+                    bit = 1 << task
+                    if bundles[r1] & bit:
+                        yield {r1: bundles[r1] ^ bit, r2: bundles[r2] | bit}
+
+                if r2 < r1:
+                    continue
+
+                # Swap one of r1's tasks for one of r2's
+                for task1 in xrange(num_tasks):
+                    bit1 = 1 << task1
+                    if not bundles[r1] & bit1:
+                        continue
+                    for task2 in xrange(num_tasks):
+                        bit2 = 1 << task2
+                        if bundles[r2] & bit2:
+                            yield {r1: bundles[r1] ^ bit1 | bit2, r2: bundles[r2] ^ bit2 | bit1}
+
+                # Swap bundles
+                yield {r1: bundles[r2], r2: bundles[r1]}
+
+    improved = False
+
+    improving = True
+    while improving:
+        improving = False
+
+        for changes in moves():
+            if deadline is not None and time.time() > deadline:
+                return improved
+
+            new_score = try_move(changes)
+            if new_score is not None:
+                score = new_score
+                improved = improving = True
+                break
+
+    return improved
+
+
+def solve(bids, objective=SUM, time_budget=1.0):
+    """ The best allocation of tasks to robots that can be found in time_budget seconds
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b (see subset_dp.solve())
+    :param str objective: SUM or MAX
+    :param float time_budget: seconds
+    :return: the cost of the allocation, a bundle (bitmask) for each robot
+        and a lower bound on the cost of an optimal allocation (equal to the
+        cost if the allocation is known to be optimal)
+    :rtype: (float, int[], float)
+    """
+    deadline = time.time() + time_budget
+
+    bids = np.array(bids, dtype=np.float64)
+    bids[:, 0] = 0.0
+
+    best_cost = None
+    best_bundles = None
+
+    for bundles in (subset_dp.greedy(bids, objective)[1], psi_allocation(bids)):
+        local_search(bids, bundles, objective, deadline)
+
+        cost = subset_dp.allocation_cost(bids, bundles, objective)
+        if best_cost is None or cost < best_cost:
+            best_cost = cost
+            best_bundles = bundles
+
+    bound = lower_bound(bids, objective)
+
+    # Spend the rest of the budget looking for a better allocation (or
+    # proving there isn't one)
+    if best_cost > bound + EPSILON and time.time() < deadline:
+        best_cost, best_bundles, optimal = subset_dp.solve(bids, objective, best_bundles, deadline)
+        if optimal:
+            bound = best_cost
+
+    return best_cost, best_bundles, min(bound, best_cost)
@@ -0,0 +1,223 @@
+""" assignment
+
+Centralized winner determination from single-item bids (as in PSI), where
+every robot bids on every announced task, alone, from where it is.
+
+A task with num_robots = n must be awarded to n different robots. To keep
+the allocation balanced, no robot may win more than a given number of tasks
+(its capacity; by default, the total number of task awards divided evenly
+among the robots, rounded up). Subject to that, solve() finds either:
+
+  - SUM: the allocation that minimizes the sum of the winning bids, or
+  - MAX: among the allocations that minimize the largest winning bid (the
+    bottleneck), the one that minimizes their sum.
+
+This is a minimum-cost b-matching between robots and tasks, which is solved
+as an assignment problem with scipy.optimize.linear_sum_assignment. Each
+robot is replicated once per task it may win (its slots), and each slot is
+assigned a task or a spare column (if the robot wins fewer tasks):
+
+                 rows                             columns
+    robot r, slot j   --bid on t-->  task t                 (num_robots = 1)
+    robot r, slot j   --0--------->  spare
+
+A task that needs n > 1 robots must go to n different robots, so each of its
+edges (robot r, task t) is split into two nodes, u(r, t) and v(r, t):
+
+    robot r, slot j   --bid on t-->  u(r, t)
+    v(r, t)           --0--------->  u(r, t)                (r doesn't win t)
+    v(r, t)           --0--------->  task t, copy c (n copies)
+
+u(r, t) is assigned either a slot of robot r (r wins t) or v(r, t), so r wins
+t at most once. v(r, t) can only be assigned a copy of task t if u(r, t) is
+assigned a slot of robot r. (Single-robot tasks don't need this, which keeps
+the problem small.)
+
+The MAX objective is solved by a binary search for the smallest bottleneck
+for which every task can be awarded without bids above it.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import numpy as np
+import scipy.optimize
+
+from .subset_dp import SUM, MAX
+
+
+class _Problem(object):
+    """ The assignment problem for an allocation (see above) """
+
+    def __init__(self, bids, num_robots, capacity, allowed):
+        """
+        :param numpy.ndarray bids: bids[r, t] is robot r's bid on task t
+        :param int[] num_robots: the number of robots each task needs
+        :param int capacity: the most tasks any robot may win
+        :param numpy.ndarray allowed: allowed[r, t] is False if r may not win t
+        """
+        num_bidders, num_tasks = bids.shape
+
+        self.num_tasks = num_tasks
+        self.num_robots = num_robots
+
+        single = [t for t in xrange(num_tasks) if num_robots[t] == 1]
+        multi = [t for t in xrange(num_tasks) if num_robots[t] > 1]
+
+        num_slots = num_bidders * capacity
+        num_edges = num_bidders * len(multi)
+        num_copies = sum(num_robots[t] for t in multi)
+        num_spares = num_slots - len(single) - num_copies
+
+        # Columns: single-robot tasks, u(r, t), copies of multi-robot tasks, spares
+        first_u = len(single)
+        first_copy = first_u + num_edges
+        first_spare = first_copy + num_copies
+
+        # More than any allocation that only uses allowed bids
+        self.forbidden = bids[allowed].sum() + 1.0
+
+        size = num_slots + num_edges
+        self.costs = np.full((size, size), self.forbidden)
+
+        # What each column is: ('task', t), ('u', r, t) or ('copy', t), and the
+        # row of each v(r, t), by its u column
+        self.columns = [None] * size
+        self.v_rows = {}
+
+        for column, t in enumerate(single):
+            self.columns[column] = ('task', t)
+
+        copy = first_copy
+        for t in multi:
+            for c in xrange(num_robots[t]):
+                self.columns[copy] = ('copy', t)
+                copy += 1
+
+        for r in xrange(num_bidders):
+            slots = slice(r * capacity, (r + 1) * capacity)
+
+            for column, t in enumerate(single):
+                if allowed[r, t]:
+                    self.costs[slots, column] = bids[r, t]
+
+            copy = first_copy
+            for i, t in enumerate(multi):
+                u = first_u + r * len(multi) + i
+                v = num_slots + r * len(multi) + i
+
+                self.columns[u] = ('u', r, t)
+                self.v_rows[u] = v
+
+                if allowed[r, t]:
+                    self.costs[slots, u] = bids[r, t]
+
+                self.costs[v, u] = 0.0
+                self.costs[v, copy:copy + num_robots[t]] = 0.0
+                copy += num_robots[t]
+
+            self.costs[slots, first_spare:first_spare + num_spares] = 0.0
+
+        self.num_slots = num_slots
+        self.capacity = capacity
+
+    def solve(self):
+        """
+        The cheapest allocation using only allowed bids
+
+        :return: the winners (robot indices) of each task, and whether every
+            task could be awarded to as many robots as it needs
+        :rtype: (list[], bool)
+        """
+        rows, columns = scipy.optimize.linear_sum_assignment(self.costs)
+        assigned = dict(zip(rows, columns))
+
+        winners = [[] for t in xrange(self.num_tasks)]
+
+        for row in xrange(self.num_slots):
+            column = assigned[row]
+            if self.costs[row, column] >= self.forbidden or self.columns[column] is None:
+                continue
+
+            r = row // self.capacity
+
+            if self.columns[column][0] == 'task':
+                winners[self.columns[column][1]].append(r)
+
+            elif self.columns[column][0] == 'u':
+                # r wins t if v(r, t) took one of t's copies (if the problem
+                # is infeasible, it may have been given something else)
+                t = self.columns[column][2]
+                v = self.v_rows[column]
+                v_column = assigned[v]
+
+                if self.costs[v, v_column] < self.forbidden and self.columns[v_column] == ('copy', t):
+                    winners[t].append(r)
+
+        complete = all(len(winners[t]) == self.num_robots[t] for t in xrange(self.num_tasks))
+
+        return winners, complete
+
+
+def _assign(bids, num_robots, capacity, allowed):
+    """ See _Problem.solve() """
+    return _Problem(bids, num_robots, capacity, allowed).solve()
+
+
+def solve(bids, num_robots=None, capacity=None, objective=SUM):
+    """
+    An allocation of tasks to robots, given their bids on single tasks
+
+    :param numpy.ndarray bids: bids[r, t] is robot r's bid on task t. Bids
+        that are missing (or that robots can't carry out) are np.inf.
+    :param int[] num_robots: the number of (different) robots each task
+        needs. By default, one each.
+    :param int capacity: the most tasks any robot may win. At least (and by
+        default) the total number of robots that tasks need, divided by the
+        number of robots and rounded up.
+    :param str objective: SUM or MAX
+    :return: the winners (robot indices) of each task. A task that can't be
+        awarded to as many robots as it needs (e.g., because too few robots
+        bid on it) gets fewer winners.
+    :rtype: list[]
+    """
+    bids = np.asarray(bids, dtype=np.float64)
+    num_bidders, num_tasks = bids.shape
+
+    if num_robots is None:
+        num_robots = [1] * num_tasks
+    num_robots = [min(int(n), num_bidders) for n in num_robots]
+
+    if not num_bidders or not num_tasks:
+        return [[] for t in xrange(num_tasks)]
+
+    # Every task must fit
+    min_capacity = max(-(-sum(num_robots) // num_bidders), 1)
+
+    if capacity is None:
+        capacity = min_capacity
+    capacity = max(int(capacity), min_capacity)
+
+    allowed = np.isfinite(bids)
+
+    if objective == MAX:
+        # The smallest bottleneck with which every task can be awarded (or,
+        # if no bottleneck is small enough, no bottleneck)
+        thresholds = np.unique(bids[allowed])
+        low, high = 0, len(thresholds) - 1
+
+        if _assign(bids, num_robots, capacity, allowed)[1]:
+            while low < high:
+                middle = (low + high) // 2
+                below = allowed & (bids <= thresholds[middle])
+
+                if _assign(bids, num_robots, capacity, below)[1]:
+                    high = middle
+                else:
+                    low = middle + 1
+
+            allowed = allowed & (bids <= thresholds[low])
+
+    elif objective != SUM:
+        raise ValueError("Unknown objective: {0}".format(objective))
+
+    return _assign(bids, num_robots, capacity, allowed)[0]
@@ -0,0 +1,260 @@
+""" subset_dp
+
+Exact winner determination for combinatorial auctions (e.g., SUM and MAX),
+where every robot bids on every bundle (subset) of the announced tasks.
+
+Each robot is awarded at most one bundle (the bundles of different robots
+don't overlap) and every task is awarded to some robot. A robot's bid on a
+bundle is what the whole bundle costs it, so the objective is either:
+
+  - SUM: the sum of the winning bids, or
+  - MAX: the largest winning bid.
+
+Bundles are identified by bitmasks over the tasks: bit i is set if the bundle
+includes task i. Bids are given as a matrix with a row per robot and a column
+per bundle.
+
+solve() runs a dynamic program over bundles. best[k, mask] is the cheapest
+way to award the tasks in mask to the first k robots:
+
+    best[k, mask] = min over sub of (best[k - 1, mask ^ sub] (+ or max) bids[k - 1, sub])
+
+where sub ranges over the submasks of mask (including the empty bundle). For
+n tasks and m robots, this takes O(3^n * m) time. Masks are visited in
+increasing order, so one pass computes every robot's row, and the submasks of
+each mask only need to be enumerated once.
+
+Bids are never negative, so neither objective can improve by adding a bundle.
+A greedy allocation (or one given by the caller, e.g. from
+winner_determination.anytime) gives an initial bound. Bundles that cost at
+least as much are pruned, as are partial allocations that would, given a
+lower bound on the cost of awarding the rest of the tasks (branch and bound).
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import time
+
+import numpy as np
+
+# Objectives
+SUM = 'SUM'
+MAX = 'MAX'
+
+# Check the deadline (if any) every this many masks
+DEADLINE_CHECK_INTERVAL = 256
+
+
+def _combine(objective):
+    """ The function that adds a bid to the cost of an allocation """
+    if objective == SUM:
+        return np.add
+    elif objective == MAX:
+        return np.maximum
+
+    raise ValueError("Unknown objective: {0}".format(objective))
+
+
+def _submask_table(num_bits, shift=0):
+    """ table[i] holds every submask of i (including 0, which comes first),
+    shifted left by shift bits, for every i < 2^num_bits
+    """
+    table = [np.zeros(1, dtype=np.int64)]
+
+    for i in xrange(1, 1 << num_bits):
+        highest = 1 << (i.bit_length() - 1)
+        lower = table[i ^ highest]
+        table.append(np.concatenate((lower, lower | (highest << shift))))
+
+    return table
+
+
+class Submasks(object):
+    """ Enumerates the submasks of masks of num_bits bits.
+
+    Storing the submasks of every mask would take O(3^n) space, so masks are
+    split into a low and a high half. Each half's submasks are tabulated
+    (O(3^(n/2)) space) and combined as they're needed.
+    """
+
+    def __init__(self, num_bits):
+        self.low_bits = num_bits // 2
+        self.low_mask = (1 << self.low_bits) - 1
+
+        self.low_table = _submask_table(self.low_bits)
+        self.high_table = _submask_table(num_bits - self.low_bits, self.low_bits)
+
+    def __call__(self, mask):
+        """ The (non-empty) submasks of mask
+
+        :rtype: numpy.ndarray
+        """
+        low = self.low_table[mask & self.low_mask]
+        high = self.high_table[mask >> self.low_bits]
+
+        # Both tables list 0 first, so the first combination is the empty mask
+        return (low[np.newaxis, :] | high[:, np.newaxis]).ravel()[1:]
+
+
+def _lowest_bids(bids):
+    """ A lower bound on the largest winning bid in any allocation of the
+    tasks in each mask: for every task in mask, the lowest bid on any bundle
+    that includes it, and the largest of those.
+    """
+    num_bundles = bids.shape[1]
+    num_tasks = num_bundles.bit_length() - 1
+
+    bundles = np.arange(num_bundles)
+    robot_lowest = bids[:, 1:].min(axis=0)
+
+    lowest = np.zeros(num_bundles)
+    for task in xrange(num_tasks):
+        with_task = (bundles & (1 << task)) != 0
+        task_lowest = robot_lowest[with_task[1:]].min()
+        lowest[with_task] = np.maximum(lowest[with_task], task_lowest)
+
+    return lowest
+
+
+def allocation_cost(bids, bundles, objective=SUM):
+    """ The cost of awarding bundles[r] to robot r, for every robot
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b
+    :param int[] bundles: a bundle (bitmask) for each robot
+    :param str objective: SUM or MAX
+    :rtype: float
+    """
+    values = [float(bids[r, b]) for r, b in enumerate(bundles) if b]
+
+    if not values:
+        return 0.0
+
+    if objective == SUM:
+        return sum(values)
+
+    return max(values)
+
+
+def greedy(bids, objective=SUM):
+    """ Award tasks one at a time, each to the robot whose bundle it makes
+    the allocation cheapest to extend.
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b
+    :param str objective: SUM or MAX
+    :return: the cost of the allocation and a bundle (bitmask) for each robot
+    :rtype: (float, int[])
+    """
+    bids = np.asarray(bids, dtype=np.float64)
+    num_robots, num_bundles = bids.shape
+    num_tasks = num_bundles.bit_length() - 1
+
+    combine = _combine(objective)
+    reduce_ = combine.reduce
+
+    bundles = [0] * num_robots
+    values = np.zeros(num_robots)
+
+    for task in xrange(num_tasks):
+        bit = 1 << task
+
+        # Each robot's bid if it were given the task, and what that would
+        # make the allocation cost
+        extended = np.array([bids[r, bundles[r] | bit] for r in xrange(num_robots)])
+
+        costs = np.empty(num_robots)
+        for r in xrange(num_robots):
+            trial = values.copy()
+            trial[r] = extended[r]
+            costs[r] = reduce_(trial)
+
+        winner = int(np.argmin(costs))
+        bundles[winner] |= bit
+        values[winner] = extended[winner]
+
+    return allocation_cost(bids, bundles, objective), bundles
+
+
+def solve(bids, objective=SUM, incumbent=None, deadline=None):
+    """ An optimal allocation of tasks to robots, given their bids on bundles
+
+    :param numpy.ndarray bids: bids[r, b] is robot r's bid on bundle b (a
+        bitmask over the tasks). The number of columns must be 2^(number of
+        tasks). Bids must not be negative. Column 0 (the empty bundle) is
+        ignored.
+    :param str objective: SUM or MAX
+    :param int[] incumbent: an allocation (a bundle for each robot) to
+        improve on. By default, the greedy() allocation.
+    :param float deadline: a time.time() by which to give up (and return the
+        incumbent), or None
+    :return: the cost of the allocation, a bundle (bitmask) for each robot
+        and whether the allocation is known to be optimal
+    :rtype: (float, int[], bool)
+    """
+    bids = np.array(bids, dtype=np.float64)
+    num_robots, num_bundles = bids.shape
+    full_mask = num_bundles - 1
+
+    combine = _combine(objective)
+
+    bids[:, 0] = 0.0
+
+    # We only look for allocations that are cheaper than the incumbent
+    if incumbent is None:
+        bound, incumbent = greedy(bids, objective)
+    else:
+        bound = allocation_cost(bids, incumbent, objective)
+
+    # Bundles that at least one robot bids less than the bound on
+    useful = (bids < bound).any(axis=0)
+
+    # Awarding the tasks in mask costs at least lowest[mask]
+    lowest = _lowest_bids(bids)
+
+    # best[k, mask] and the bundle robot k - 1 gets in it (0 if none)
+    best = np.full((num_robots + 1, num_bundles), np.inf)
+    best[:, 0] = 0.0
+    choice = np.zeros((num_robots + 1, num_bundles), dtype=np.int64)
+
+    robots = np.arange(num_robots)
+    submasks = Submasks(full_mask.bit_length())
+
+    for mask in xrange(1, num_bundles):
+        if deadline is not None and mask % DEADLINE_CHECK_INTERVAL == 0 and time.time() > deadline:
+            return bound, list(incumbent), False
+
+        subs = submasks(mask)
+        rest = mask ^ subs
+
+        # best[num_robots] is the cheapest way to award rest to any robots
+        keep = useful[subs] & (best[num_robots, rest] < bound)
+        if not keep.any():
+            continue
+
+        subs = subs[keep]
+        rest = rest[keep]
+
+        # values[k, s]: award subs[s] to robot k and rest to the robots before it
+        values = combine(best[:num_robots, rest], bids[:, subs])
+
+        index = np.argmin(values, axis=1)
+        candidates = values[robots, index]
+
+        # Robot k either wins its best bundle here or nothing
+        best[1:, mask] = np.minimum.accumulate(candidates)
+        choice[1:, mask] = np.where(candidates < best[:num_robots, mask], subs[index], 0)
+
+        # Prune mask if awarding the tasks outside it would take us past the bound
+        if combine(best[num_robots, mask], lowest[full_mask ^ mask]) >= bound:
+            best[:, mask] = np.inf
+
+    if not best[num_robots, full_mask] < bound:
+        return bound, list(incumbent), True
+
+    # Walk back from the full set of tasks
+    bundles = [0] * num_robots
+    mask = full_mask
+    for k in xrange(num_robots, 0, -1):
+        bundles[k - 1] = int(choice[k, mask])
+        mask ^= bundles[k - 1]
+
+    return float(best[num_robots, full_mask]), bundles, True
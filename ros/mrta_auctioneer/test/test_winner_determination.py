@@ -0,0 +1,194 @@
+""" test_winner_determination
+
+Compare winner_determination's solvers with brute-force search on small,
+random auctions.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import itertools
+import unittest
+
+import numpy as np
+
+from winner_determination import anytime, assignment, subset_dp
+from winner_determination.subset_dp import SUM, MAX
+
+# Costs are compared to within this
+EPSILON = 1e-6
+
+# The number of random auctions to try for each size
+TRIALS = 20
+
+
+def random_bundle_bids(rng, num_robots, num_tasks):
+    """ Random, non-negative bids by every robot on every bundle of tasks """
+    bids = rng.uniform(1.0, 20.0, size=(num_robots, 1 << num_tasks))
+    bids[:, 0] = 0.0
+    return bids
+
+
+def brute_force_bundles(bids, objective):
+    """ The cost of the cheapest allocation of bundles, trying every way of
+    awarding each task to a robot
+    """
+    num_robots, num_bundles = bids.shape
+    num_tasks = num_bundles.bit_length() - 1
+
+    best = None
+    for task_winners in itertools.product(xrange(num_robots), repeat=num_tasks):
+        bundles = [0] * num_robots
+        for task, robot in enumerate(task_winners):
+            bundles[robot] |= 1 << task
+
+        cost = subset_dp.allocation_cost(bids, bundles, objective)
+        if best is None or cost < best:
+            best = cost
+
+    return best
+
+
+def brute_force_assignment(bids, num_robots, capacity, objective):
+    """ The (largest bid, sum of bids) of the best allocation of single tasks,
+    trying every set of winners for every task
+    """
+    num_bidders, num_tasks = bids.shape
+
+    best = None
+    choices = [itertools.combinations(xrange(num_bidders), n) for n in num_robots]
+    for task_winners in itertools.product(*[list(c) for c in choices]):
+        won = [0] * num_bidders
+        for winners in task_winners:
+            for r in winners:
+                won[r] += 1
+
+        if max(won) > capacity:
+            continue
+
+        score = _assignment_score(bids, task_winners, objective)
+        if best is None or score < best:
+            best = score
+
+    return best
+
+
+def _assignment_score(bids, task_winners, objective):
+    """ What an allocation of single tasks is minimizing: the sum of winning
+    bids (SUM) or the largest winning bid, then the sum (MAX)
+    """
+    values = [bids[r, t] for t, winners in enumerate(task_winners) for r in winners]
+
+    if objective == SUM:
+        return sum(values),
+
+    return max(values), sum(values)
+
+
+def is_partition(bundles, num_tasks):
+    """ True if every task is in exactly one bundle """
+    covered = 0
+    for bundle in bundles:
+        if covered & bundle:
+            return False
+        covered |= bundle
+
+    return covered == (1 << num_tasks) - 1
+
+
+class TestSubsetDP(unittest.TestCase):
+
+    def test_optimal(self):
+        rng = np.random.RandomState(0)
+
+        for objective in (SUM, MAX):
+            for num_robots in (1, 2, 3):
+                for num_tasks in (1, 2, 3, 4):
+                    for trial in xrange(TRIALS):
+                        bids = random_bundle_bids(rng, num_robots, num_tasks)
+
+                        cost, bundles, optimal = subset_dp.solve(bids, objective)
+
+                        self.assertTrue(optimal)
+                        self.assertTrue(is_partition(bundles, num_tasks))
+                        self.assertAlmostEqual(cost, subset_dp.allocation_cost(bids, bundles, objective))
+                        self.assertAlmostEqual(cost, brute_force_bundles(bids, objective))
+
+    def test_greedy_is_feasible(self):
+        rng = np.random.RandomState(1)
+
+        for objective in (SUM, MAX):
+            for trial in xrange(TRIALS):
+                bids = random_bundle_bids(rng, 3, 4)
+
+                cost, bundles = subset_dp.greedy(bids, objective)
+
+                self.assertTrue(is_partition(bundles, 4))
+                self.assertGreaterEqual(cost, brute_force_bundles(bids, objective) - EPSILON)
+
+
+class TestAnytime(unittest.TestCase):
+
+    def test_optimal_given_time(self):
+        rng = np.random.RandomState(2)
+
+        for objective in (SUM, MAX):
+            for num_robots in (1, 2, 3):
+                for num_tasks in (1, 2, 3, 4):
+                    for trial in xrange(TRIALS):
+                        bids = random_bundle_bids(rng, num_robots, num_tasks)
+                        best = brute_force_bundles(bids, objective)
+
+                        cost, bundles, bound = anytime.solve(bids, objective, time_budget=10.0)
+
+                        self.assertTrue(is_partition(bundles, num_tasks))
+                        self.assertAlmostEqual(cost, best)
+                        self.assertLessEqual(bound, best + EPSILON)
+
+    def test_lower_bound(self):
+        rng = np.random.RandomState(3)
+
+        for objective in (SUM, MAX):
+            for trial in xrange(TRIALS):
+                bids = random_bundle_bids(rng, 3, 4)
+
+                self.assertLessEqual(anytime.lower_bound(bids, objective),
+                                     brute_force_bundles(bids, objective) + EPSILON)
+
+
+class TestAssignment(unittest.TestCase):
+
+    def check(self, rng, num_bidders, num_robots, capacity=None):
+        num_tasks = len(num_robots)
+        min_capacity = max(-(-sum(num_robots) // num_bidders), 1)
+
+        for objective in (SUM, MAX):
+            for trial in xrange(TRIALS):
+                bids = rng.uniform(1.0, 20.0, size=(num_bidders, num_tasks))
+
+                winners = assignment.solve(bids, num_robots, capacity, objective)
+
+                for t in xrange(num_tasks):
+                    self.assertEqual(len(set(winners[t])), num_robots[t])
+
+                won = [sum(r in task_winners for task_winners in winners) for r in xrange(num_bidders)]
+                self.assertLessEqual(max(won), max(capacity or 0, min_capacity))
+
+                score = _assignment_score(bids, winners, objective)
+                best = brute_force_assignment(bids, num_robots, max(capacity or 0, min_capacity), objective)
+
+                for value, best_value in zip(score, best):
+                    self.assertAlmostEqual(value, best_value)
+
+    def test_single_robot_tasks(self):
+        rng = np.random.RandomState(4)
+        self.check(rng, 3, [1, 1, 1, 1, 1])
+        self.check(rng, 2, [1, 1, 1], capacity=3)
+
+    def test_multi_robot_tasks(self):
+        rng = np.random.RandomState(5)
+        self.check(rng, 3, [2, 1, 1, 2])
+        self.check(rng, 4, [3, 1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
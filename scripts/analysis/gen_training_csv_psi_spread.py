@@ -348,21 +348,23 @@ def write_training_files(in_file, out_dist, out_run_time, out_execution_phase_ti
             # Turn on weighting
             robot_graph.es['weight'] = 1.0
 
+            # Start poses of every robot
+            start_poses = {}
+            for robot_name in ROBOT_NAMES:
+                start_point = mrta.Point(min_dist_row["{0}_STARTX".format(robot_name.upper())],
+                                         min_dist_row["{0}_STARTY".format(robot_name.upper())])
+                start_poses[robot_name] = planner_proxy._point_to_pose(start_point)
+
+            # Look up the distances between every pair of robots in one batch
+            robot_pairs = list(combinations(ROBOT_NAMES, 2))
+            robot_pair_distances = planner_proxy.get_path_costs([(start_poses[first_robot_name], start_poses[second_robot_name])
+                                                                 for (first_robot_name, second_robot_name) in robot_pairs])
+
             # For every pair of robots
-            for pair in combinations(ROBOT_NAMES, 2):
+            for pair, distance in zip(robot_pairs, robot_pair_distances):
                 first_robot_name = pair[0]
                 second_robot_name = pair[1]
 
-                source_point = mrta.Point(min_dist_row["{0}_STARTX".format(first_robot_name.upper())],
-                                          min_dist_row["{0}_STARTY".format(first_robot_name.upper())])
-                source_pose = planner_proxy._point_to_pose(source_point)
-
-                target_point = mrta.Point(min_dist_row["{0}_STARTX".format(second_robot_name.upper())],
-                                          min_dist_row["{0}_STARTY".format(second_robot_name.upper())])
-                target_pose = planner_proxy._point_to_pose(target_point)
-
-                distance = planner_proxy.get_path_cost(source_pose, target_pose)
-
                 robot_graph[first_robot_name, second_robot_name] = distance
 
             dist_matrix = robot_graph.get_adjacency(type=2, attribute='weight').data
@@ -408,6 +410,14 @@ def write_training_files(in_file, out_dist, out_run_time, out_execution_phase_ti
 
             task_dict = target_point_configs[min_dist_row.TASK_FILE]
 
+            # Look up every robot's distance to every median in one batch, so
+            # that the get_path_cost() calls below come from the cache
+            planner_proxy.get_path_costs([(planner_proxy._point_to_pose(mrta.Point(task_dict[median_task_id][0],
+                                                                                   task_dict[median_task_id][1])),
+                                           start_poses[robot_name])
+                                          for median_task_id in median_task_ids
+                                          for robot_name in ROBOT_NAMES])
+
             for median_task_id in median_task_ids:
                 min_robot_id = None
                 min_robot_distance = None
@@ -617,6 +617,11 @@ def parse_stats(bag_paths, output):
             num_bid_msgs += 1
             bid_msg_bytes = sys.getsizeof(bid_msg)
 
+        # Batched bids count once per bid they carry
+        for bids_msg in run_msgs['/tasks/bids']:
+            num_bid_msgs += len(bids_msg.bids)
+            bid_msg_bytes = sys.getsizeof(bids_msg)
+
         row_fields['NUM_BID_MSGS'] = num_bid_msgs                 # 'NUM_BID_MSGS'
 
         for award_msg in run_msgs['/tasks/award']:
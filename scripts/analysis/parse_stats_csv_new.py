@@ -303,6 +303,11 @@ def main(argv):
             num_bid_msgs += 1
             alloc_msgs_bytes += sys.getsizeof(bid_msg)
 
+        # Batched bids count once per bid they carry
+        for bids_msg in run_msgs['/tasks/bids']:
+            num_bid_msgs += len(bids_msg.bids)
+            alloc_msgs_bytes += sys.getsizeof(bids_msg)
+
         row_fields.append(num_bid_msgs) # 'BID_MSGS'
 
         for award_msg in run_msgs['/tasks/award']:
@@ -136,12 +136,14 @@ def main(argv):
 
                     run_msgs = defaultdict(list)
                     for topic,msg,msg_time in exp.bag.read_messages('/tasks/award'):
-                        print "{0} won task {1}".format(msg.robot_id,msg.tasks[0].task.task_id)
-                        #grid[int(msg.tasks[0].task.task_id)-1][x_pos] = stroke_colors[msg.robot_id]
-
-                        stroke_color = stroke_colors[msg.robot_id]
-                        y_pos = int(msg.tasks[0].task.task_id)-1
-                        grid[y_pos][x_pos] = stroke_color
+                        # An award may list more than one task for its robot
+                        for task_msg in msg.tasks:
+                            print "{0} won task {1}".format(msg.robot_id,task_msg.task.task_id)
+                            #grid[int(task_msg.task.task_id)-1][x_pos] = stroke_colors[msg.robot_id]
+
+                            stroke_color = stroke_colors[msg.robot_id]
+                            y_pos = int(task_msg.task.task_id)-1
+                            grid[y_pos][x_pos] = stroke_color
 
                         #print "y_pos=={0}, x_pos=={1}, stroke_color=={2}".format(y_pos,
                         #                                                         x_pos,
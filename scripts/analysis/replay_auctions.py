@@ -0,0 +1,435 @@
+#!/usr/bin/env python
+
+"""replay_auctions
+
+Replays the auction rounds recorded in experiment bags through the
+auctioneer's winner determination, to check that changes to it still award
+the same tasks to the same robots, and to time it, without relaunching
+experiments.
+
+Each announcement on '/tasks/announce' starts a round. The bids recorded on
+'/tasks/bid' and '/tasks/bids' after it (and before the round's first award)
+are fed to a fresh Auction* object of the announced mechanism, which
+determines the winners as the auctioneer would. Its awards are compared with
+those recorded on '/tasks/award' (before the next announcement).
+
+Every round starts from the awards recorded before it (rather than the
+replayed ones), so that one mismatch doesn't cause others.
+
+Only rounds whose winners the auctioneer determines from bids (OSI, PSI, SSI,
+SUM, MAX and OPT) are replayed. RR, CBBA and manual (MAN) rounds are skipped,
+as are PPSI rounds, whose winners are awarded later (if at all).
+
+Writes a row per round to a CSV file and exits with status 1 if any round's
+awards didn't match.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import argparse
+from collections import defaultdict
+import copy
+import csv
+import glob
+import imp
+import multiprocessing
+import os
+import sys
+from threading import Condition, Lock
+import time
+
+import rosbag
+import rospkg
+
+import mrta
+
+DEFAULT_CSV_FILENAME = 'replay_stats.csv'
+
+field_names = ['BAG_FILENAME',
+               'AUCTION_ROUND',
+               'MECHANISM',
+               'NUM_TASKS',
+               'NUM_BIDDERS',
+               'NUM_BIDS',
+               'WD_TIME',
+               'MATCH',
+               'RECORDED_AWARDS',
+               'REPLAYED_AWARDS']
+
+
+def load_node(package, name):
+    """ Import a node's script (which has no .py extension) as a module, once """
+    if name not in sys.modules:
+        imp.load_source(name, os.path.join(rospkg.RosPack().get_path(package), 'scripts', name))
+
+    return sys.modules[name]
+
+mrta_auctioneer = load_node('mrta_auctioneer', 'mrta_auctioneer')
+
+
+class NullPublisher(object):
+    """ Stands in for a rospy.Publisher whose messages nobody needs """
+
+    def publish(self, msg):
+        pass
+
+
+def timed(auction_class):
+    """
+    A subclass of auction_class that times determine_winner(), from when it's
+    called until it hands the winners to award() (or returns)
+    """
+    class TimedAuction(auction_class):
+
+        def determine_winner(self, e):
+            self.wd_end = None
+            self.wd_start = time.time()
+
+            auction_class.determine_winner(self, e)
+
+            if self.wd_end is None:
+                self.wd_end = time.time()
+
+        def award(self, e):
+            if self.wd_end is None:
+                self.wd_end = time.time()
+
+            auction_class.award(self, e)
+
+    TimedAuction.__name__ = 'Timed' + auction_class.__name__
+
+    return TimedAuction
+
+AUCTIONS = {'OSI': timed(mrta_auctioneer.AuctionOSI),
+            'PSI': timed(mrta_auctioneer.AuctionPSI),
+            'SSI': timed(mrta_auctioneer.AuctionSSI),
+            'SUM': timed(mrta_auctioneer.AuctionSUM),
+            'MAX': timed(mrta_auctioneer.AuctionMAX),
+            'OPT': timed(mrta_auctioneer.AuctionOPT)}
+
+
+class AuctionRound(object):
+    """ The messages of one recorded auction round """
+
+    def __init__(self, auction_round, announce_msg):
+        self.auction_round = auction_round
+        self.announce_msg = announce_msg
+
+        # (topic, message) of each bid, in the order they were recorded
+        self.bid_msgs = []
+
+        self.award_msgs = []
+
+    @property
+    def mechanism(self):
+        return self.announce_msg.mechanism
+
+    def recorded_awards(self):
+        """ The (robot_id, task_id) awards recorded in this round """
+        return awards_of(self.award_msgs)
+
+
+def awards_of(award_msgs):
+    return sorted(set((str(award_msg.robot_id), str(task_msg.task.task_id))
+                      for award_msg in award_msgs
+                      for task_msg in award_msg.tasks))
+
+
+def read_rounds(bag_path):
+    """ The auction rounds recorded in a bag, in order """
+    rounds = []
+
+    bag = rosbag.Bag(bag_path)
+    try:
+        for topic, msg, msg_time in bag.read_messages(topics=['/tasks/announce', '/tasks/bid',
+                                                              '/tasks/bids', '/tasks/award']):
+            if topic == '/tasks/announce':
+                rounds.append(AuctionRound(len(rounds) + 1, msg))
+                continue
+
+            if not rounds:
+                continue
+
+            current = rounds[-1]
+
+            if topic == '/tasks/award':
+                current.award_msgs.append(msg)
+
+            # Bids that arrive once awards are being sent were too late to count
+            elif not current.award_msgs:
+                current.bid_msgs.append((topic, msg))
+    finally:
+        bag.close()
+
+    return rounds
+
+
+class ReplayAuctioneer(mrta_auctioneer.Auctioneer):
+    """ An Auctioneer without a node, which feeds recorded bids to an Auction's
+    winner determination and keeps the awards it sends
+    """
+
+    def __init__(self, wd_time_budget=mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                 opt_objective=mrta_auctioneer.DEFAULT_OPT_OBJECTIVE):
+        self.announce_pub = NullPublisher()
+        self.award_pub = NullPublisher()
+        self.debug_pub = NullPublisher()
+        self.marker_pub = NullPublisher()
+
+        self.tasks_by_id = {}
+        self.team_members = []
+
+        self.auction_round = 0
+        self.bids = {}
+        self.bids_lock = Lock()
+        self.bids_received = Condition(self.bids_lock)
+
+        self.awards_lock = Lock()
+        self.awards_acked = Condition(self.awards_lock)
+        self.unacked_awards = set()
+        self.award_acks = defaultdict(set)
+
+        self.awarded = defaultdict(list)
+
+        self.wd_time_budget = wd_time_budget
+        self.opt_objective = opt_objective
+
+        # The round being replayed, and the awards sent in it
+        self.round = None
+        self.sent_award_msgs = []
+
+    def _task(self, task_msg):
+        """ The task of an announced mrta.msg.SensorSweepTask, the first time it's announced """
+        task_id = str(task_msg.task.task_id)
+
+        if task_id not in self.tasks_by_id:
+            self.tasks_by_id[task_id] = mrta.SensorSweepTask(task_id,
+                                                             float(task_msg.location.x),
+                                                             float(task_msg.location.y),
+                                                             float(task_msg.location.z),
+                                                             int(task_msg.task.num_robots),
+                                                             float(task_msg.task.duration),
+                                                             [str(d) for d in task_msg.task.depends],
+                                                             float(getattr(task_msg.task, 'arrival_time', 0.0)))
+
+        return self.tasks_by_id[task_id]
+
+    def replay(self, auction_round, repeat=1):
+        """
+        Determine the winners of a recorded round, repeat times, each from the
+        awards recorded before it
+
+        :param AuctionRound auction_round: the round
+        :param int repeat: how many times to determine the winners
+        :return: the (robot_id, task_id) awards, and the shortest time winner
+                 determination took
+        """
+        tasks = [self._task(task_msg) for task_msg in auction_round.announce_msg.tasks]
+
+        awarded = copy.deepcopy(self.awarded)
+        task_states = [(task.awarded, task.num_robots_allocated) for task in tasks]
+
+        self.round = auction_round
+        self.auction_round = auction_round.auction_round
+
+        # Auctions won't announce to an empty team
+        self.team_members = sorted(set(str(bid_msg.robot_id) for topic, bid_msg in auction_round.bid_msgs)) or ['nobody']
+
+        wd_time = None
+        awards = None
+
+        for i in xrange(repeat):
+            self.awarded = copy.deepcopy(awarded)
+            for task, (task_awarded, num_robots_allocated) in zip(tasks, task_states):
+                task.awarded = task_awarded
+                task.num_robots_allocated = num_robots_allocated
+
+            self.sent_award_msgs = []
+
+            auction = AUCTIONS[auction_round.mechanism](self, tasks, self.auction_round)
+
+            if wd_time is None or auction.wd_end - auction.wd_start < wd_time:
+                wd_time = auction.wd_end - auction.wd_start
+
+            awards = awards_of(self.sent_award_msgs)
+
+        # Carry on from what was recorded
+        self.awarded = awarded
+        for robot_id, task_id in auction_round.recorded_awards():
+            self.awarded[task_id].append(robot_id)
+
+        for task, (task_awarded, num_robots_allocated) in zip(tasks, task_states):
+            task.awarded = task_awarded
+            task.num_robots_allocated = num_robots_allocated
+
+        return awards, wd_time
+
+    def wait_for_bids(self, auction_round, bids_per_robot):
+        """ Receive the round's recorded bids, all at once """
+        for topic, bid_msg in self.round.bid_msgs:
+            if topic == '/tasks/bids':
+                self.on_bids_received(bid_msg)
+            else:
+                self.on_bid_received(bid_msg)
+
+        return []
+
+    def send_awards(self, award_msgs):
+        self.sent_award_msgs.extend(award_msgs)
+
+    def wait_for_award_acks(self):
+        return []
+
+    def publish_task_markers(self, task_colors):
+        pass
+
+
+def format_awards(awards):
+    return ' '.join("{0}:{1}".format(robot_id, task_id) for robot_id, task_id in awards)
+
+
+# Set in main() before workers start, and inherited by them
+_args = None
+
+
+def replay_bag(bag_path):
+    """
+    Replay every auction round in a bag. Runs in a worker.
+
+    :return: a row (in the order of field_names) for each round replayed
+    """
+    bag_filename = os.path.basename(bag_path)
+
+    try:
+        rounds = read_rounds(bag_path)
+    except:
+        print("Couldn't read auction rounds from {0}: {1}".format(bag_path, sys.exc_info()[1]))
+        return []
+
+    auctioneer = ReplayAuctioneer(_args.wd_time_budget, _args.opt_objective)
+
+    rows = []
+    for auction_round in rounds:
+        if auction_round.mechanism not in AUCTIONS:
+            continue
+
+        recorded = auction_round.recorded_awards()
+
+        try:
+            replayed, wd_time = auctioneer.replay(auction_round, _args.repeat)
+        except:
+            print("{0}: couldn't replay round {1} ({2}): {3}".format(bag_filename,
+                                                                   auction_round.auction_round,
+                                                                   auction_round.mechanism,
+                                                                   sys.exc_info()[1]))
+            replayed, wd_time = None, None
+
+        bids = auctioneer.bids.get(auction_round.auction_round)
+
+        if replayed != recorded:
+            print("{0}: round {1} ({2}) awards don't match! recorded: [{3}], replayed: [{4}]".format(
+                bag_filename, auction_round.auction_round, auction_round.mechanism,
+                format_awards(recorded), format_awards(replayed or [])))
+
+        rows.append([bag_filename,
+                     auction_round.auction_round,
+                     auction_round.mechanism,
+                     len(auction_round.announce_msg.tasks),
+                     len(bids) if bids is not None else 0,
+                     bids.count if bids is not None else 0,
+                     wd_time,
+                     replayed == recorded,
+                     format_awards(recorded),
+                     format_awards(replayed or [])])
+
+    return rows
+
+
+def find_bags(paths):
+    """ Bag files named (or matched) by paths, and those in directories among them """
+    bag_paths = []
+
+    for path_arg in paths:
+        for path in sorted(glob.glob(path_arg)):
+            if os.path.isdir(path):
+                bag_paths.extend(sorted(glob.glob(os.path.join(path, '*.bag'))))
+            else:
+                bag_paths.append(path)
+
+    return bag_paths
+
+
+def main(args):
+    global _args
+    _args = args
+
+    bag_paths = find_bags(args.bag_file)
+
+    print("Replaying {0} bag(s)...".format(len(bag_paths)))
+
+    csv_file = csv.writer(open(args.output, 'wb'))
+    csv_file.writerow(field_names)
+
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap(replay_bag, bag_paths)
+    else:
+        pool = None
+        results = (replay_bag(bag_path) for bag_path in bag_paths)
+
+    # Rounds and winner determination time, by mechanism
+    round_counts = defaultdict(int)
+    mismatch_counts = defaultdict(int)
+    wd_times = defaultdict(float)
+
+    for rows in results:
+        csv_file.writerows(rows)
+
+        for row in rows:
+            mechanism = row[field_names.index('MECHANISM')]
+
+            round_counts[mechanism] += 1
+            wd_times[mechanism] += row[field_names.index('WD_TIME')] or 0.0
+
+            if not row[field_names.index('MATCH')]:
+                mismatch_counts[mechanism] += 1
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    for mechanism in sorted(round_counts):
+        print("{0}: {1} rounds, {2} mismatched, {3:.6f} seconds determining winners ({4:.6f} per round)".format(
+            mechanism, round_counts[mechanism], mismatch_counts[mechanism], wd_times[mechanism],
+            wd_times[mechanism] / round_counts[mechanism]))
+
+    return 1 if any(mismatch_counts.values()) else 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Replay the auction rounds recorded in bags through winner determination.')
+
+    parser.add_argument('bag_file',
+                        nargs='+',
+                        help='Bag file(s) (or directories of them) to replay.')
+    parser.add_argument('-o', '--output',
+                        default=DEFAULT_CSV_FILENAME,
+                        help="Name of the output .csv file")
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of bags to replay in parallel.')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=1,
+                        help='Determine the winners of each round this many times, keeping the shortest time.')
+    parser.add_argument('--wd_time_budget',
+                        type=float,
+                        default=mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                        help='Seconds that SUM/MAX winner determination may take (0 to always find an optimal allocation).')
+    parser.add_argument('--opt_objective',
+                        choices=['SUM', 'MAX'],
+                        default=mrta_auctioneer.DEFAULT_OPT_OBJECTIVE,
+                        help='What OPT minimizes.')
+
+    sys.exit(main(parser.parse_args()))
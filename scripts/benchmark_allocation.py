@@ -0,0 +1,528 @@
+#!/usr/bin/env python
+
+"""benchmark_allocation
+
+Measures how bidding and winner determination scale with the number of
+tasks and robots, for each mechanism, so that we know which mechanisms are
+safe to use with larger teams and task sets.
+
+Each case (a mechanism, a number of tasks, a number of robots and a seed)
+allocates tasks once, in-process, with the auctioneer's Auction* classes and
+RobotController.bid() (as in simulate_experiments.py). Robots and tasks are
+placed at random (by seed) in a square, and path costs are straight-line
+distances. For every auction round, we record:
+
+  - ROUND_TASKS: how many tasks were left to allocate
+  - ROUND_TIME: how long the round took, from announcement to award
+  - BID_TIME: how long robots took to bid (in RobotController.bid(),
+    including the auctioneer recording their bids)
+  - WD_TIME: how long determine_winner() took
+  - NUM_*: the number of messages (and bids) sent
+
+and, for the whole case:
+
+  - PEAK_MEMORY_MB: how much the process grew (its peak resident set size,
+    beyond what it was before the case)
+  - CUMULATIVE_COST_TIME: how long RobotController._cumulative_cost() took
+    to cost every robot's agenda, once tasks were allocated
+
+Cases run in their own processes (-j of them at a time, one by default so
+that they don't slow each other down), and give up after --timeout seconds.
+Rows are written to a CSV file, with plots of the totals per case.
+
+Given a baseline (the CSV file of an earlier run), totals that have grown
+by more than --tolerance are reported, and we exit with status 1.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import argparse
+from collections import defaultdict
+import csv
+import itertools
+import logging
+import math
+import multiprocessing
+import multiprocessing.pool
+import os
+import random
+import resource
+import sys
+import time
+
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+import mrta
+import mrta.cost_oracle
+
+import simulate_experiments
+
+# Winner determination is timed as when replaying bags
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis'))
+from replay_auctions import timed
+
+DEFAULT_CSV_FILENAME = 'benchmark.csv'
+
+DEFAULT_TASK_COUNTS = [4, 6, 8, 10, 12, 14, 16]
+DEFAULT_TEAM_SIZES = [3, 5, 10, 15, 20]
+
+# Side of the square (in meters) in which robots and tasks are placed
+DEFAULT_AREA_SIZE = 30.0
+
+# Seconds after which a case is given up on
+DEFAULT_TIMEOUT = 300.0
+
+# How much a total may grow (as a fraction of its baseline) before it's
+# reported, and how much it must grow by, at least (times are noisy)
+DEFAULT_TOLERANCE = 0.25
+MIN_TIME_REGRESSION = 0.01
+MIN_MEMORY_REGRESSION = 1.0
+
+field_names = ['MECHANISM',
+               'NUM_TASKS',
+               'NUM_ROBOTS',
+               'SEED',
+               'STATUS',
+               'AUCTION_ROUND',
+               'ROUND_TASKS',
+               'ROUND_TIME',
+               'BID_TIME',
+               'WD_TIME',
+               'NUM_ANNOUNCE_MSGS',
+               'NUM_BID_MSGS',
+               'NUM_BIDS',
+               'NUM_AWARD_MSGS',
+               'PEAK_MEMORY_MB',
+               'CUMULATIVE_COST_TIME']
+
+# Totals per case that are compared with the baseline: times and memory
+# (within a tolerance), and message counts (which shouldn't grow at all)
+TIME_FIELDS = ['ROUND_TIME', 'BID_TIME', 'WD_TIME', 'CUMULATIVE_COST_TIME']
+MEMORY_FIELDS = ['PEAK_MEMORY_MB']
+COUNT_FIELDS = ['NUM_ANNOUNCE_MSGS', 'NUM_BID_MSGS', 'NUM_BIDS', 'NUM_AWARD_MSGS']
+
+# Fields that are the same in every round of a case
+CASE_FIELDS = ['PEAK_MEMORY_MB', 'CUMULATIVE_COST_TIME']
+
+# The totals that are plotted
+PLOT_FIELDS = ['ROUND_TIME', 'BID_TIME', 'WD_TIME', 'PEAK_MEMORY_MB', 'NUM_BIDS']
+
+
+class SyntheticOracle(object):
+    """ Straight-line path costs (see mrta.cost_oracle.CostOracle) """
+
+    def precompute(self, points):
+        pass
+
+    def costs(self, start, goals):
+        x, y = mrta.cost_oracle.xy(start)
+        return [math.hypot(gx - x, gy - y) for gx, gy in (mrta.cost_oracle.xy(goal) for goal in goals)]
+
+
+def _time_bids(robot, round_bid_times, auctioneer):
+    """ Add the time robot spends in bid() to round_bid_times (by auction round) """
+    bid = robot.bid
+
+    def timed_bid(job):
+        start = time.time()
+        bid(job)
+        round_bid_times[auctioneer.auction_round] += time.time() - start
+
+    robot.bid = timed_bid
+
+
+def _count_messages(simulation, round_counts):
+    """ Count the messages published in each auction round, by field name """
+    auctioneer = simulation.auctioneer
+
+    def counter(field_name, num_bids=None):
+        def count(msg):
+            round_counts[auctioneer.auction_round][field_name] += 1
+            if num_bids is not None:
+                round_counts[auctioneer.auction_round]['NUM_BIDS'] += num_bids(msg)
+        return count
+
+    simulation.bus.subscribe('/tasks/announce', counter('NUM_ANNOUNCE_MSGS'))
+    simulation.bus.subscribe('/tasks/bid', counter('NUM_BID_MSGS', lambda msg: 1))
+    simulation.bus.subscribe('/tasks/bids', counter('NUM_BID_MSGS', lambda msg: len(msg.bids)))
+    simulation.bus.subscribe('/tasks/award', counter('NUM_AWARD_MSGS'))
+
+
+def run_case(case):
+    """
+    Allocate a case's tasks and measure it
+
+    :param tuple case: (mechanism, number of tasks, number of robots, seed)
+    :return: a row (dict, by field name) for each auction round
+    """
+    mechanism, num_tasks, num_robots, seed = case
+
+    rng = random.Random(seed)
+
+    def point():
+        return mrta.Point(rng.uniform(0, _args.area), rng.uniform(0, _args.area))
+
+    # Robots are placed first, so that the same seed places them (and, with
+    # the same number of robots, the tasks) the same way for every mechanism
+    start_poses = [simulate_experiments.mrta_robot_controller.RobotController._point_to_pose(point())
+                   for r in xrange(num_robots)]
+
+    tasks = []
+    for i in xrange(num_tasks):
+        location = point()
+        tasks.append(mrta.SensorSweepTask(str(i + 1), location.x, location.y))
+
+    path_costs = simulate_experiments.PathCosts(SyntheticOracle(), start_poses + [t.location for t in tasks])
+
+    simulation = simulate_experiments.Simulation(mechanism, tasks, start_poses, path_costs,
+                                                 wd_time_budget=_args.wd_time_budget,
+                                                 opt_objective=_args.opt_objective)
+
+    auctioneer = simulation.auctioneer
+    auctioneer.auction_class = timed(auctioneer.auction_class)
+
+    round_bid_times = defaultdict(float)
+    for robot in simulation.robots.values():
+        _time_bids(robot, round_bid_times, auctioneer)
+
+    round_counts = defaultdict(lambda: defaultdict(int))
+    _count_messages(simulation, round_counts)
+
+    for task in tasks:
+        auctioneer.add_task(task)
+
+    memory_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    # Each round runs in its Auction's constructor
+    round_times = {}
+    auction_class = auctioneer.auction_class
+
+    def auction(auctioneer, round_tasks, auction_round):
+        start = time.time()
+        instance = auction_class(auctioneer, round_tasks, auction_round)
+        round_times[auction_round] = (time.time() - start, len(round_tasks))
+        return instance
+
+    auctioneer.auction_class = auction
+
+    allocated = auctioneer.allocate()
+
+    # Cost every robot's agenda, as the controller used to before bidding
+    start = time.time()
+    for robot in simulation.robots.values():
+        robot._cumulative_cost(robot.start_pose, robot.agenda)
+    cumulative_cost_time = time.time() - start
+
+    memory_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    case_fields = {'MECHANISM': mechanism,
+                   'NUM_TASKS': num_tasks,
+                   'NUM_ROBOTS': num_robots,
+                   'SEED': seed,
+                   'STATUS': 'ok' if allocated else 'incomplete',
+                   # ru_maxrss is in kilobytes
+                   'PEAK_MEMORY_MB': (memory_after - memory_before) / 1024.0,
+                   'CUMULATIVE_COST_TIME': cumulative_cost_time}
+
+    rows = []
+    for auction in auctioneer.auctions:
+        auction_round = auction.auction_round
+        round_time, round_tasks = round_times[auction_round]
+
+        row = dict(case_fields)
+        row.update({'AUCTION_ROUND': auction_round,
+                    'ROUND_TASKS': round_tasks,
+                    'ROUND_TIME': round_time,
+                    'BID_TIME': round_bid_times[auction_round],
+                    'WD_TIME': auction.wd_end - auction.wd_start})
+
+        for field_name in COUNT_FIELDS:
+            row[field_name] = round_counts[auction_round][field_name]
+
+        rows.append(row)
+
+    return rows
+
+
+def _case_worker(case, conn):
+    """ Run a case and send its rows (or the error) back. Runs in its own process. """
+    try:
+        conn.send(run_case(case))
+    except:
+        conn.send("{0}: {1}".format(sys.exc_info()[0].__name__, sys.exc_info()[1]))
+    finally:
+        conn.close()
+
+
+def run_case_in_process(case):
+    """ run_case() in a new process, so that its memory is measured on its own and it can be stopped """
+    parent_conn, child_conn = multiprocessing.Pipe(False)
+
+    process = multiprocessing.Process(target=_case_worker, args=(case, child_conn))
+    process.start()
+    child_conn.close()
+
+    result = None
+    if parent_conn.poll(_args.timeout):
+        try:
+            result = parent_conn.recv()
+        except EOFError:
+            result = 'crashed'
+
+    if result is None:
+        process.terminate()
+        status = 'timeout'
+    elif isinstance(result, basestring):
+        status = 'error'
+        print("{0}: {1}".format(case, result))
+    else:
+        status = None
+
+    process.join()
+
+    if status is not None:
+        mechanism, num_tasks, num_robots, seed = case
+        result = [{'MECHANISM': mechanism, 'NUM_TASKS': num_tasks, 'NUM_ROBOTS': num_robots,
+                   'SEED': seed, 'STATUS': status}]
+
+    return result
+
+
+def read_rows(filename):
+    """ The rows of a benchmark CSV file, with numbers converted """
+    rows = []
+
+    with open(filename) as f:
+        for row in csv.DictReader(f):
+            for key, value in row.items():
+                try:
+                    row[key] = float(value)
+                except (TypeError, ValueError):
+                    pass
+            rows.append(row)
+
+    return rows
+
+
+def case_totals(rows):
+    """
+    The totals of each case (over its rounds), averaged over seeds. Only
+    cases that finished (in every seed) are included.
+
+    :return: a dict of (mechanism, number of tasks, number of robots) => {field name: total}
+    """
+    seed_totals = defaultdict(lambda: defaultdict(float))
+    failed = set()
+
+    for row in rows:
+        key = (row['MECHANISM'], int(row['NUM_TASKS']), int(row['NUM_ROBOTS']))
+
+        if row['STATUS'] != 'ok':
+            failed.add(key)
+            continue
+
+        totals = seed_totals[key + (int(row['SEED']),)]
+        for field_name in TIME_FIELDS + MEMORY_FIELDS + COUNT_FIELDS:
+            if field_name in CASE_FIELDS:
+                totals[field_name] = row[field_name]
+            else:
+                totals[field_name] += row[field_name]
+
+    sums = defaultdict(lambda: defaultdict(float))
+    counts = defaultdict(int)
+
+    for seed_key, totals in seed_totals.items():
+        key = seed_key[:3]
+        counts[key] += 1
+        for field_name, value in totals.items():
+            sums[key][field_name] += value
+
+    return dict((key, dict((field_name, value / counts[key]) for field_name, value in sums[key].items()))
+                for key in sums if key not in failed)
+
+
+def compare(totals, baseline_totals, tolerance, cases):
+    """
+    Report totals that have grown beyond their baseline
+
+    :param set cases: the (mechanism, number of tasks, number of robots) cases
+                      that were run (whether or not they finished)
+    :return: the number of regressions
+    :rtype: int
+    """
+    regressions = 0
+
+    for key in sorted(totals):
+        if key not in baseline_totals:
+            continue
+
+        for field_name in TIME_FIELDS + MEMORY_FIELDS + COUNT_FIELDS:
+            value = totals[key].get(field_name, 0.0)
+            baseline = baseline_totals[key].get(field_name, 0.0)
+
+            if field_name in COUNT_FIELDS:
+                regressed = value > baseline
+            else:
+                min_growth = MIN_TIME_REGRESSION if field_name in TIME_FIELDS else MIN_MEMORY_REGRESSION
+                regressed = value > baseline * (1 + tolerance) and value - baseline > min_growth
+
+            if regressed:
+                regressions += 1
+                print("REGRESSION {0} tasks={1} robots={2}: {3} {4:.6f} (baseline {5:.6f})".format(
+                    key[0], key[1], key[2], field_name, value, baseline))
+
+    # Cases that used to finish but no longer do
+    for key in sorted((set(baseline_totals) & cases) - set(totals)):
+        print("REGRESSION {0} tasks={1} robots={2}: didn't finish".format(*key))
+        regressions += 1
+
+    return regressions
+
+
+def plot(totals, plot_dir):
+    """ Plot each of PLOT_FIELDS against the number of tasks, a line per
+    mechanism and a subplot per team size
+    """
+    mechanisms = sorted(set(key[0] for key in totals))
+    team_sizes = sorted(set(key[2] for key in totals))
+
+    if not team_sizes:
+        return
+
+    for field_name in PLOT_FIELDS:
+        fig, axes = plt.subplots(1, len(team_sizes), figsize=(4 * len(team_sizes), 4), squeeze=False)
+
+        for ax, num_robots in zip(axes[0], team_sizes):
+            for mechanism in mechanisms:
+                points = sorted((key[1], totals[key][field_name]) for key in totals
+                                if key[0] == mechanism and key[2] == num_robots)
+                if points:
+                    ax.plot([p[0] for p in points], [p[1] for p in points], marker='o', label=mechanism)
+
+            ax.set_title("{0} robots".format(num_robots))
+            ax.set_xlabel('Tasks')
+            if field_name not in MEMORY_FIELDS:
+                ax.set_yscale('symlog', linthreshy=1e-3 if field_name in TIME_FIELDS else 1)
+
+        axes[0][0].set_ylabel(field_name)
+        axes[0][-1].legend(loc='best', fontsize='small')
+
+        fig.tight_layout()
+        fig.savefig(os.path.join(plot_dir, "{0}.png".format(field_name.lower())))
+        plt.close(fig)
+
+
+# Set in main() before cases run, and inherited by them
+_args = None
+
+
+def main(args):
+    global _args
+    _args = args
+
+    logging.basicConfig(format='%(message)s')
+    logging.getLogger('rosout').setLevel(logging.WARNING)
+
+    cases = list(itertools.product(args.mechanisms, args.tasks, args.robots, range(args.repeat)))
+
+    print("Running {0} cases...".format(len(cases)))
+
+    csv_file = open(args.output, 'wb')
+    csv_writer = csv.DictWriter(csv_file, field_names)
+    csv_writer.writeheader()
+
+    pool = multiprocessing.pool.ThreadPool(args.jobs)
+
+    rows = []
+    for case, case_rows in itertools.izip(cases, pool.imap(run_case_in_process, cases)):
+        csv_writer.writerows(case_rows)
+        csv_file.flush()
+
+        rows.extend(case_rows)
+
+        status = case_rows[0]['STATUS']
+        wd_time = sum(row.get('WD_TIME', 0.0) for row in case_rows)
+        print("{0} tasks={1} robots={2} seed={3}: {4} ({5} rounds, {6:.6f} seconds determining winners)".format(
+            case[0], case[1], case[2], case[3], status, len(case_rows) if status == 'ok' else 0, wd_time))
+
+    pool.close()
+    pool.join()
+    csv_file.close()
+
+    # Read our rows back, so that they're compared as the baseline's are
+    totals = case_totals(read_rows(args.output))
+
+    if args.plot_dir:
+        if not os.path.isdir(args.plot_dir):
+            os.makedirs(args.plot_dir)
+        plot(totals, args.plot_dir)
+
+    if args.baseline:
+        cases = set((mechanism, num_tasks, num_robots) for mechanism, num_tasks, num_robots, seed in cases)
+
+        regressions = compare(totals, case_totals(read_rows(args.baseline)), args.tolerance, cases)
+        print("{0} regression(s) against {1}".format(regressions, args.baseline))
+
+        if regressions:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark bidding and winner determination as tasks and robots are added.')
+
+    parser.add_argument('-m', '--mechanisms',
+                        nargs='+',
+                        choices=simulate_experiments.MECHANISMS,
+                        default=simulate_experiments.MECHANISMS,
+                        help='Mechanisms to benchmark.')
+    parser.add_argument('-t', '--tasks',
+                        nargs='+',
+                        type=int,
+                        default=DEFAULT_TASK_COUNTS,
+                        help='Numbers of tasks.')
+    parser.add_argument('-n', '--robots',
+                        nargs='+',
+                        type=int,
+                        default=DEFAULT_TEAM_SIZES,
+                        help='Numbers of robots.')
+    parser.add_argument('-r', '--repeat',
+                        type=int,
+                        default=3,
+                        help='Number of seeds (placements of robots and tasks) per case.')
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=1,
+                        help='Number of cases to run in parallel (which makes their times noisier).')
+    parser.add_argument('--timeout',
+                        type=float,
+                        default=DEFAULT_TIMEOUT,
+                        help='Seconds after which a case is given up on.')
+    parser.add_argument('--area',
+                        type=float,
+                        default=DEFAULT_AREA_SIZE,
+                        help='Side of the square (in meters) in which robots and tasks are placed.')
+    parser.add_argument('--wd_time_budget',
+                        type=float,
+                        default=simulate_experiments.mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                        help='Seconds that SUM/MAX winner determination may take (0 to always find an optimal allocation).')
+    parser.add_argument('--opt_objective',
+                        choices=['SUM', 'MAX'],
+                        default=simulate_experiments.mrta_auctioneer.DEFAULT_OPT_OBJECTIVE,
+                        help='What OPT minimizes.')
+    parser.add_argument('-o', '--output',
+                        default=DEFAULT_CSV_FILENAME,
+                        help="Name of the output .csv file")
+    parser.add_argument('-p', '--plot_dir',
+                        help='Directory in which to save plots.')
+    parser.add_argument('-b', '--baseline',
+                        help='CSV file of an earlier run to compare with.')
+    parser.add_argument('--tolerance',
+                        type=float,
+                        default=DEFAULT_TOLERANCE,
+                        help='How much (as a fraction) a time or memory total may grow beyond its baseline.')
+
+    sys.exit(main(parser.parse_args()))
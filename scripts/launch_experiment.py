@@ -52,8 +52,8 @@ world_files = {'brooklyn': {'clustered': 'brooklyn_arena_3_robots_clustered.worl
 mechanisms = ['OSI', 'PSI', 'SSI', 'RR']
 
 # Topics to record with rosbag
-record_topics = ['/experiment', '/tasks/announce', '/tasks/bid',
-                 '/tasks/award', '/tasks/status', '/tasks/new', '/debug']
+record_topics = ['/experiment', '/tasks/announce', '/tasks/bid', '/tasks/bids',
+                 '/tasks/award', '/tasks/status', '/tasks/new', '/tasks/consensus', '/debug']
 
 exp_running = False
 
@@ -74,8 +74,8 @@ world_files = {'brooklyn': {'clustered': 'brooklyn_arena_3_robots_clustered.worl
 mechanisms = ['OSI', 'PSI', 'SSI', 'RR', 'SUM', 'MAX']
 
 # Topics to record with rosbag
-record_topics = ['/experiment', '/tasks/announce', '/tasks/bid',
-                 '/tasks/award', '/tasks/status', '/tasks/new', '/debug']
+record_topics = ['/experiment', '/tasks/announce', '/tasks/bid', '/tasks/bids',
+                 '/tasks/award', '/tasks/status', '/tasks/new', '/tasks/consensus', '/debug']
 
 exp_running = False
 
@@ -229,7 +229,7 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser(description='Launch a multirobot task-allocation experiment.')
 
     parser.add_argument('mechanism',
-                        choices=['OSI', 'PSI', 'SSI', 'RR', 'SUM', 'MAX', 'SEL'],
+                        choices=['OSI', 'PSI', 'SSI', 'RR', 'SUM', 'MAX', 'OPT', 'CBBA', 'SEL'],
                         help='Mechanism to allocate tasks.')
     parser.add_argument('map',
                         choices=['brooklyn', 'smartlab', 'strand', 'strand-restricted'],
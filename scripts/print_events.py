@@ -10,10 +10,13 @@ exp_topics = { 'experiment': [ '/experiment' ],
                'tasks': [ '/tasks/announce',
                           '/tasks/award',
                           '/tasks/bid',
-                          '/tasks/status' ],
+                          '/tasks/bids',
+                          '/tasks/status',
+                          '/tasks/consensus' ],
                'announcements': ['/tasks/announce'],
-               'bids': ['/tasks/bid'],
+               'bids': ['/tasks/bid', '/tasks/bids'],
                'awards': ['/tasks/award'],
+               'consensus': ['/tasks/consensus'],
                # 'position': [ '/robot_3/amcl_pose'],
                'debug': ['/debug'],
                'position': ['/robot_1/amcl_pose',
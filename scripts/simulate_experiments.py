@@ -0,0 +1,882 @@
+#!/usr/bin/env python
+
+"""simulate_experiments
+
+Runs task-allocation experiments in-process, without Stage, move_base, the
+master relay or a ROS master, so that mechanisms can be compared over
+thousands of scenarios (from tasks.db) and start configs in minutes rather
+than in 10-20 minutes per run.
+
+The auctioneer's Auction* classes and RobotController.bid() run unchanged:
+SimAuctioneer and SimRobot stand in for the Auctioneer and RobotController
+nodes, and the messages they publish are delivered to each other directly
+(and counted) by a Bus. Path costs are read from a matrix between the
+robots' start poses and the task locations, computed once per scenario and
+start config with mrta.cost_oracle.
+
+Once tasks have been allocated, a discrete-event clock moves each robot
+through its agenda at a fixed speed, choosing tasks roughly the way
+RobotController.choose_task() does: the least constrained tasks first,
+then tasks that teammates are waiting at, then the first along the robot's
+tour. Tasks that arrive later (arrival_time > 0) start a new allocation
+phase when they arrive.
+
+Every run is written as a row of the same CSV that parse_stats_csv.py writes
+from a bag, with a few differences:
+
+  - Collisions aren't simulated, so TOTAL_COLLISIONS and the delay times
+    are always zero.
+  - DELIBERATION_TIME is the (wall-clock) time that allocation takes to
+    compute, without any message latency.
+  - Robots bid from the last task they reached (or their start pose), even
+    if they're moving when tasks are announced.
+  - There are no bags, so BAG_FILENAME is empty, as are the median,
+    message-time and mechanism-selection columns.
+
+CBBA isn't simulated, since robots agree on an allocation over time.
+
+Usage:
+
+  simulate_experiments.py strand-restricted PSI SSI -s clustered -s random_starts.txt -t scenario_id_list.txt
+
+Start configs are either the names of start configs in
+launch_experiment_singlemaster.py (read from their Stage world files) or
+files of start poses, one config per line, as in robot_start_position_list.txt.
+
+Eric Schneider <eric.schneider@kcl.ac.uk>
+"""
+
+import argparse
+from collections import defaultdict, OrderedDict
+import copy
+import csv
+import datetime
+import heapq
+import imp
+import itertools
+import logging
+import multiprocessing
+import os
+import re
+import signal
+import sys
+from threading import Condition, Event, Lock
+import time
+
+import rospkg
+from toposort import toposort, CircularDependencyError
+
+import mrta
+import mrta.agenda_tour
+import mrta.cost_oracle
+import mrta.file_db
+import mrta.tour
+
+# Maps and start configs, as they're launched for real
+from launch_experiment_singlemaster import maps, world_files
+
+# ...which would catch SIGINT to kill the processes it launches
+signal.signal(signal.SIGINT, signal.default_int_handler)
+
+# The columns (and some helpers) of the CSV that parse_stats_csv.py writes
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'analysis'))
+import parse_stats_csv
+
+TASKS_DB_FILENAME = 'tasks.db'
+
+DEFAULT_CSV_FILENAME = 'sim_stats.csv'
+
+# Robot speed, in meters per second. A little under the max_vel_x of
+# mrta_robot_controller/param/move_base_generic/dwa_local_planner_params.yaml
+DEFAULT_SPEED = 0.5
+
+# Runs that take longer than this many (simulated) seconds time out, as in
+# launch_experiment_singlemaster.py
+DEFAULT_TIME_LIMIT = 1200.0
+
+# The mechanisms that can be simulated
+MECHANISMS = ['OSI', 'PSI', 'SSI', 'RR', 'SUM', 'MAX', 'OPT']
+
+# Robot start poses in Stage world (and .inc) files
+START_POSE_RE = re.compile(r'^\s*turtlebot\s*\(\s*pose\s*\[\s*(\S+)\s+(\S+)')
+INCLUDE_RE = re.compile(r'^\s*include\s+"(/[^"]+)"')
+
+
+def load_node(package, name):
+    """ Import a node's script (which has no .py extension) as a module, once """
+    if name not in sys.modules:
+        imp.load_source(name, os.path.join(rospkg.RosPack().get_path(package), 'scripts', name))
+
+    return sys.modules[name]
+
+mrta_auctioneer = load_node('mrta_auctioneer', 'mrta_auctioneer')
+mrta_robot_controller = load_node('mrta_robot_controller', 'mrta_robot_controller')
+
+AUCTIONS = {'OSI': mrta_auctioneer.AuctionOSI,
+            'PSI': mrta_auctioneer.AuctionPSI,
+            'SSI': mrta_auctioneer.AuctionSSI,
+            'RR': mrta_auctioneer.AuctionRR,
+            'SUM': mrta_auctioneer.AuctionSUM,
+            'MAX': mrta_auctioneer.AuctionMAX,
+            'OPT': mrta_auctioneer.AuctionOPT}
+
+
+class Bus(object):
+    """ Delivers published messages straight to their subscribers' callbacks, and counts them """
+
+    def __init__(self):
+        self.subscribers = defaultdict(list)
+
+        # The number of messages published on each topic, and the last one
+        self.counts = defaultdict(int)
+        self.messages = defaultdict(list)
+
+    def subscribe(self, topic, callback):
+        self.subscribers[topic].append(callback)
+
+    def publish(self, topic, msg):
+        self.counts[topic] += 1
+
+        # Only keep what parse_stats_csv.py reads from a bag
+        if topic in ('/tasks/announce', '/tasks/bid', '/tasks/bids', '/tasks/award'):
+            self.messages[topic].append(msg)
+
+        for callback in self.subscribers[topic]:
+            callback(msg)
+
+    def publisher(self, topic):
+        return BusPublisher(self, topic)
+
+
+class BusPublisher(object):
+    """ Stands in for a rospy.Publisher """
+
+    def __init__(self, bus, topic):
+        self.bus = bus
+        self.topic = topic
+
+    def publish(self, msg):
+        self.bus.publish(self.topic, msg)
+
+
+class _SyncResult(object):
+    """ A multiprocessing.pool.AsyncResult that's ready as soon as it's made """
+
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, timeout=None):
+        return self.value
+
+    def wait(self, timeout=None):
+        pass
+
+    def ready(self):
+        return True
+
+
+class _SyncPool(object):
+    """ Stands in for RobotController.bid_pool: path costs are looked up right away """
+
+    @staticmethod
+    def apply_async(func, args=()):
+        return _SyncResult(func(*args))
+
+
+class _SimState(object):
+    """ Stands in for RobotController.fsm, whose state is only logged while bidding """
+    current = 'simulated'
+
+
+class PathCosts(object):
+    """ Path costs between a fixed set of points (e.g., robots' start poses and
+    task locations), computed once and then read from a matrix
+    """
+
+    def __init__(self, oracle, points):
+        """
+        :param mrta.cost_oracle.CostOracle oracle: answers queries for other points
+        :param points: geometry_msgs.msg.Pose, mrta.Point or (x, y) tuples
+        """
+        self.oracle = oracle
+
+        self.index = OrderedDict()
+        for point in points:
+            self.index.setdefault(self._key(point), len(self.index))
+
+        nodes = self.index.keys()
+
+        oracle.precompute(nodes)
+        self.matrix = [oracle.costs(node, nodes) for node in nodes]
+
+    @staticmethod
+    def _key(point):
+        x, y = mrta.cost_oracle.xy(point)
+        return round(x, 6), round(y, 6)
+
+    def __call__(self, start, goals):
+        """ Path costs from start to each of goals (see RobotController.get_path_costs()) """
+        i = self.index.get(self._key(start))
+        columns = [self.index.get(self._key(goal)) for goal in goals]
+
+        if i is None or None in columns:
+            return self.oracle.costs(start, goals)
+
+        return [self.matrix[i][j] for j in columns]
+
+
+class SimAuctioneer(mrta_auctioneer.Auctioneer):
+    """ An Auctioneer without a node: just what the Auction* classes need """
+
+    def __init__(self, bus, mechanism, robot_names, wd_time_budget=mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                 opt_objective=mrta_auctioneer.DEFAULT_OPT_OBJECTIVE):
+        self.mechanism = mechanism
+        self.auction_class = AUCTIONS[mechanism]
+
+        self.experiment_pub = bus.publisher('/experiment')
+        self.announce_pub = bus.publisher('/tasks/announce')
+        self.award_pub = bus.publisher('/tasks/award')
+        self.debug_pub = bus.publisher('/debug')
+        self.marker_pub = bus.publisher('visualization_marker_array')
+
+        self.tasks = []
+        self.tasks_by_id = {}
+
+        self.team_members = list(robot_names)
+        self.team_members_completed = []
+        self._team_cycle = itertools.cycle(self.team_members)
+
+        self.auction_round = 0
+        self.bids = {}
+        self.bids_lock = Lock()
+        self.bids_received = Condition(self.bids_lock)
+
+        self.awards_lock = Lock()
+        self.awards_acked = Condition(self.awards_lock)
+        self.unacked_awards = set()
+        self.award_acks = defaultdict(set)
+        self.consensus_counts = defaultdict(int)
+        self.last_consensus_time = None
+
+        self.awarded = defaultdict(list)
+
+        # Every round's Auction, in order
+        self.auctions = []
+
+        # Every robot bids (and acknowledges its awards) before publish() returns
+        self.bid_deadline = mrta_auctioneer.DEFAULT_BID_DEADLINE
+        self.award_ack_timeout = mrta_auctioneer.DEFAULT_AWARD_ACK_TIMEOUT
+
+        self.wd_time_budget = wd_time_budget
+        self.opt_objective = opt_objective
+
+    def publish_task_markers(self, task_colors):
+        """ Nobody's watching in rviz """
+        pass
+
+    def add_task(self, task):
+        self.tasks.append(task)
+        self.tasks_by_id[task.task_id] = task
+
+    def allocate(self):
+        """
+        Award every unallocated task, in as many auction rounds as the
+        mechanism needs (as in Auctioneer.choose_mechanism())
+
+        :return: False if a round awarded nothing (so tasks can never be allocated)
+        :rtype: bool
+        """
+        def progress(tasks):
+            # Multirobot tasks may be awarded a robot at a time (e.g., in SSI)
+            return sum(task.awarded + task.num_robots_allocated for task in tasks)
+
+        while True:
+            unallocated = [task for task in self.tasks if not task.awarded]
+            if not unallocated:
+                return True
+
+            before = progress(unallocated)
+
+            self.auction_round += 1
+            self.auctions.append(self.auction_class(self, unallocated, self.auction_round))
+
+            if progress(unallocated) == before:
+                return False
+
+
+class SimRobot(mrta_robot_controller.RobotController):
+    """ A RobotController without a node: it bids (with RobotController.bid())
+    and wins tasks, but moves in Simulation
+    """
+
+    def __init__(self, bus, robot_name, start_pose, path_costs):
+        self.robot_name = robot_name
+        self.start_pose = start_pose
+        self.path_costs = path_costs
+
+        self.bid_pub = bus.publisher('/tasks/bids')
+        self.task_status_pub = bus.publisher('/tasks/status')
+        self.debug_pub = bus.publisher('/debug')
+
+        self.fsm = _SimState()
+
+        self.agenda_lock = Lock()
+        self.agenda = []
+
+        self.current_pose = start_pose
+        self.tour_time_budget = mrta.tour.DEFAULT_TIME_BUDGET
+        self.agenda_tour = mrta.agenda_tour.AgendaTour(self.get_path_costs, time_budget=self.tour_time_budget)
+        self.agenda_tour.set_start(start_pose)
+
+        self.bid_pool = _SyncPool()
+        self._latest_bid_job = None
+
+        self._costmaps_ready = Event()
+        self._costmaps_ready.set()
+
+        # What Simulation keeps track of: our distance travelled, and our
+        # 'moving', 'waiting' and 'executing' intervals ([begin, end, label])
+        self.busy = False
+        self.distance = 0.0
+        self.intervals = []
+
+    def on_task_announced(self, announce_msg):
+        """ Bid right away, rather than in the bid worker """
+        job = self._start_bid_job(announce_msg)
+        self._latest_bid_job = job
+        self.bid(job)
+
+    def get_path_costs(self, start, goals):
+        return self.path_costs(start, goals)
+
+    def get_path_cost(self, start, goal):
+        return self.path_costs(start, [goal])[0]
+
+    def _publish_path_cost_stats(self):
+        pass
+
+    def move_to(self, pose):
+        self.current_pose = pose
+        self.agenda_tour.set_start(pose)
+
+    def interval_time(self, label):
+        return sum(end - begin for begin, end, l in self.intervals if l == label)
+
+
+class Simulation(object):
+    """ One run: a mechanism allocating a scenario's tasks to robots at their start poses """
+
+    def __init__(self, mechanism, tasks, start_poses, path_costs, speed=DEFAULT_SPEED,
+                 time_limit=DEFAULT_TIME_LIMIT, wd_time_budget=mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                 opt_objective=mrta_auctioneer.DEFAULT_OPT_OBJECTIVE):
+        """
+        :param str mechanism: one of MECHANISMS
+        :param mrta.SensorSweepTask[] tasks: the scenario's tasks (which are changed)
+        :param geometry_msgs.msg.Pose[] start_poses: one per robot
+        :param PathCosts path_costs: path costs between start poses and tasks
+        :param float speed: robot speed (meters per second)
+        :param float time_limit: simulated seconds after which the run times out
+        """
+        self.tasks = sorted(tasks, key=lambda t: t.arrival_time)
+        self.tasks_by_id = dict((t.task_id, t) for t in self.tasks)
+        self.speed = speed
+        self.time_limit = time_limit
+
+        self.bus = Bus()
+
+        robot_names = ['robot_{0}'.format(i + 1) for i in xrange(len(start_poses))]
+
+        self.auctioneer = SimAuctioneer(self.bus, mechanism, robot_names, wd_time_budget, opt_objective)
+
+        self.robots = OrderedDict()
+        for robot_name, start_pose in zip(robot_names, start_poses):
+            robot = SimRobot(self.bus, robot_name, start_pose, path_costs)
+            self.robots[robot_name] = robot
+
+            self.bus.subscribe('/tasks/announce', robot.on_task_announced)
+            self.bus.subscribe('/tasks/award', robot.won)
+
+        self.bus.subscribe('/tasks/bid', self.auctioneer.on_bid_received)
+        self.bus.subscribe('/tasks/bids', self.auctioneer.on_bids_received)
+        self.bus.subscribe('/tasks/status', self.auctioneer.on_task_status)
+
+        # The clock, and events waiting to happen: (time, sequence number, callback, args)
+        self.now = 0.0
+        self._events = []
+        self._sequence = itertools.count()
+
+        # Experiment phases, as [begin, end, label] intervals
+        self.phases = []
+        self.allocation_end = 0.0
+        self.deliberation_time = 0.0
+
+        # Robots moving toward, and waiting at (with their arrival times), each task
+        self.moving_count = defaultdict(int)
+        self.waiting = defaultdict(list)
+
+        self.completed = set()
+        self.end_time = None
+
+    def _schedule(self, delay, callback, *args):
+        heapq.heappush(self._events, (self.now + delay, next(self._sequence), callback, args))
+
+    def _phase(self, label):
+        """ The current phase, if it's label and hasn't ended """
+        if self.phases and self.phases[-1][2] == label and self.phases[-1][1] is None:
+            return self.phases[-1]
+        return None
+
+    def run(self):
+        """
+        :return: False if the run timed out (or its tasks couldn't be allocated)
+        :rtype: bool
+        """
+        for arrival_time in sorted(set(t.arrival_time for t in self.tasks)):
+            self._schedule(arrival_time, self._allocate)
+
+        while self._events and self.end_time is None:
+            event_time, sequence, callback, args = heapq.heappop(self._events)
+
+            if event_time > self.time_limit:
+                return False
+
+            self.now = event_time
+            if callback(*args) is False:
+                return False
+
+        return self.end_time is not None
+
+    def _allocate(self):
+        """ Tasks have arrived: end the execution phase (if any) and allocate them """
+        for task in self.tasks:
+            if task.arrival_time <= self.now and task.task_id not in self.auctioneer.tasks_by_id:
+                self.auctioneer.add_task(task)
+
+        execution = self._phase('execution')
+        if execution:
+            execution[1] = self.now
+
+        start = time.time()
+        allocated = self.auctioneer.allocate()
+        deliberation_time = time.time() - start
+
+        self.deliberation_time += deliberation_time
+        self.allocation_end = self.now + deliberation_time
+
+        self.phases.append([self.now, self.allocation_end, 'allocation'])
+        self.phases.append([self.allocation_end, None, 'execution'])
+
+        for robot in self.robots.values():
+            if not robot.busy:
+                self._schedule(deliberation_time, self._choose_task, robot)
+
+        return allocated
+
+    def _least_constrained(self, robot):
+        """ Our uncompleted tasks with the fewest unmet dependencies (see RobotController.choose_task()) """
+        uncompleted = [t for t in robot.agenda if not t.completed]
+
+        task_deps = dict((t.task_id, set(d for d in t.depends if d not in self.completed)) for t in uncompleted)
+
+        try:
+            for task_ids in toposort(task_deps):
+                candidates = [t for t in uncompleted if t.task_id in task_ids]
+                if candidates:
+                    return candidates
+        except CircularDependencyError:
+            pass
+
+        return uncompleted
+
+    def _choose_task(self, robot):
+        if robot.busy:
+            return
+
+        # Newly won tasks can't be started until allocation is over
+        if self.now < self.allocation_end:
+            self._schedule(self.allocation_end - self.now, self._choose_task, robot)
+            return
+
+        candidates = self._least_constrained(robot)
+        if not candidates:
+            return
+
+        # Prioritize single-robot tasks that other tasks depend on, then
+        # tasks that teammates are moving toward or waiting at
+        depended_on = [t for t in candidates if t.num_robots == 1 and
+                       any(t.task_id in other.depends for other in robot.agenda if other is not t)]
+        if depended_on:
+            candidates = depended_on
+
+        enroute = [t for t in candidates if 0 < self.moving_count[t.task_id] < t.num_robots]
+        if enroute:
+            candidates = enroute
+
+        waiting = [t for t in candidates if 0 < len(self.waiting[t.task_id]) < t.num_robots]
+        if waiting:
+            candidates = waiting
+
+        # The first candidate along our (improved) tour
+        robot.agenda_tour.set_start(robot.current_pose)
+        robot.agenda_tour.optimize()
+
+        tour_candidates = [t for t in robot.agenda_tour.tasks if t in candidates]
+        task = tour_candidates[0] if tour_candidates else candidates[0]
+
+        pose = robot._point_to_pose(task.location)
+        distance = robot.get_path_cost(robot.current_pose, pose)
+        travel_time = distance / self.speed
+
+        robot.busy = True
+        robot.distance += distance
+        robot.intervals.append([self.now, self.now + travel_time, 'moving'])
+        self.moving_count[task.task_id] += 1
+
+        self._schedule(travel_time, self._arrive, robot, task, pose)
+
+    def _arrive(self, robot, task, pose):
+        robot.move_to(pose)
+
+        self.moving_count[task.task_id] -= 1
+        self.waiting[task.task_id].append((robot, task, self.now))
+
+        self._try_begin(task.task_id)
+
+    def _try_begin(self, task_id):
+        """ Begin a task once enough robots have arrived and its dependencies are met """
+        waiting = self.waiting[task_id]
+        if not waiting:
+            return
+
+        num_robots = waiting[0][1].num_robots
+        if len(waiting) < num_robots or any(d not in self.completed for d in waiting[0][1].depends):
+            return
+
+        for robot, task, arrival_time in waiting:
+            robot.intervals.append([arrival_time, self.now, 'waiting'])
+            robot.intervals.append([self.now, self.now + task.duration, 'executing'])
+            self._schedule(task.duration, self._succeed, robot, task)
+
+        del self.waiting[task_id]
+
+    def _succeed(self, robot, task):
+        task.completed = True
+        robot.agenda_tour.remove(task)
+        robot.busy = False
+
+        self.completed.add(task.task_id)
+        self.tasks_by_id[task.task_id].completed = True
+
+        # Teammates may be waiting for this task to be done
+        for task_id in self.waiting.keys():
+            self._try_begin(task_id)
+
+        self._choose_task(robot)
+
+        if all(t.completed for t in self.auctioneer.tasks):
+            execution = self._phase('execution')
+            if execution:
+                execution[1] = max(self.now, execution[0])
+
+            if all(t.completed for t in self.tasks):
+                self.end_time = self.now
+
+    def stats(self):
+        """ The run's row, keyed by parse_stats_csv.field_names """
+        row_fields = dict((field_name, None) for field_name in parse_stats_csv.field_names)
+
+        exec_intervals = [p for p in self.phases if p[2] == 'execution' and p[1] is not None]
+
+        row_fields['TOTAL_RUN_TIME'] = self.end_time
+        row_fields['DELIBERATION_TIME'] = self.deliberation_time
+        row_fields['EXECUTION_PHASE_TIME'] = sum(end - begin for begin, end, label in exec_intervals)
+        row_fields['MECHANISM_SELECTION_TIME'] = 0.0
+
+        # Time between the end of one execution phase and the next allocation
+        nap_time = 0.0
+        for phase, next_phase in zip(self.phases, self.phases[1:]):
+            if phase[2] == 'execution' and next_phase[2] == 'allocation':
+                nap_time += max(0.0, next_phase[0] - phase[1])
+        row_fields['NAP_TIME'] = nap_time
+
+        totals = defaultdict(float)
+
+        for j, robot in enumerate(self.robots.values(), 1):
+            startx, starty = mrta.cost_oracle.xy(robot.start_pose)
+
+            idle_time = 0.0
+            if robot.intervals:
+                idle_intervals = parse_stats_csv._get_idle_intervals([i for i in robot.intervals if i[2] != 'executing'],
+                                                                     exec_intervals,
+                                                                     robot.robot_name)
+                idle_time = max(0.0, sum(end - begin for begin, end, label in idle_intervals))
+
+            robot_stats = {'STARTX': startx,
+                           'STARTY': starty,
+                           'DISTANCE': robot.distance,
+                           'MOVEMENT_TIME': robot.interval_time('moving'),
+                           'WAITING_TIME': robot.interval_time('waiting'),
+                           'IDLE_TIME': idle_time,
+                           'DELAY_TIME': 0.0}
+
+            for key, value in robot_stats.items():
+                row_fields['ROBOT{0}_{1}'.format(j, key)] = value
+
+            totals['MOVEMENT_TIME'] += robot_stats['MOVEMENT_TIME']
+            totals['EXECUTION_TIME'] += robot.interval_time('executing')
+            totals['WAITING_TIME'] += robot_stats['WAITING_TIME']
+            totals['IDLE_TIME'] += idle_time
+            totals['DISTANCE'] += robot.distance
+
+        for key, value in totals.items():
+            row_fields['TOTAL_{0}'.format(key)] = value
+
+        row_fields['TOTAL_DELAY_TIME'] = 0.0
+        row_fields['TOTAL_COLLISIONS'] = 0
+        row_fields['TOTAL_DISTANCE_TO_ASSIGNED_MEDIANS'] = 0.0
+
+        row_fields['MAXIMUM_ROBOT_DISTANCE'] = max(robot.distance for robot in self.robots.values())
+
+        # Deliberation metrics, counted as parse_stats_csv.py counts them
+        messages = self.bus.messages
+        row_fields['NUM_ANNOUNCE_MSGS'] = len(messages['/tasks/announce'])
+        row_fields['NUM_ANNOUNCE_TASKS'] = sum(len(m.tasks) for m in messages['/tasks/announce'])
+        row_fields['NUM_BID_MSGS'] = len(messages['/tasks/bid']) + sum(len(m.bids) for m in messages['/tasks/bids'])
+
+        alloc_msg_bytes = 0
+        for topic in ('/tasks/announce', '/tasks/award'):
+            if messages[topic]:
+                alloc_msg_bytes += sys.getsizeof(messages[topic][-1])
+        bid_msgs = messages['/tasks/bids'] or messages['/tasks/bid']
+        if bid_msgs:
+            alloc_msg_bytes += sys.getsizeof(bid_msgs[-1])
+        row_fields['ALLOC_MSG_BYTES'] = alloc_msg_bytes
+
+        for key, value in row_fields.items():
+            if isinstance(value, float):
+                row_fields[key] = round(value, 6)
+
+        return row_fields
+
+
+def read_world_starts(world_file):
+    """ The start poses of the robots (turtlebots) in a Stage world file,
+    including any it includes by absolute path (e.g., random starts)
+    """
+    starts = []
+
+    with open(world_file) as f:
+        for line in f:
+            match = START_POSE_RE.match(line)
+            if match:
+                starts.append((float(match.group(1)), float(match.group(2))))
+                continue
+
+            match = INCLUDE_RE.match(line)
+            if match and os.path.exists(match.group(1)):
+                starts.extend(read_world_starts(match.group(1)))
+
+    return starts
+
+
+def read_start_configs(map_name, start_args):
+    """
+    :param str map_name: a key of maps
+    :param str[] start_args: names of start configs (keys of world_files[map_name]),
+        or files with a start config (x1 y1 x2 y2 ...) per line
+    :return: an OrderedDict of start config name => [(x, y)]
+    """
+    start_configs = OrderedDict()
+    stage_dir = os.path.join(rospkg.RosPack().get_path('mrta'), 'config', 'stage')
+
+    for start_arg in start_args:
+        if start_arg in world_files[map_name]:
+            starts = read_world_starts(os.path.join(stage_dir, world_files[map_name][start_arg]))
+
+            if not starts:
+                # E.g., random starts that haven't been generated yet
+                print("No robots in {0}'s '{1}' world! Skipping...".format(map_name, start_arg))
+            else:
+                start_configs[start_arg] = starts
+            continue
+
+        with open(start_arg) as f:
+            for line_num, line in enumerate(f, 1):
+                values = [float(v) for v in line.split()]
+                if values:
+                    name = "{0}:{1}".format(os.path.basename(start_arg), line_num)
+                    start_configs[name] = zip(values[0::2], values[1::2])
+
+    return start_configs
+
+
+def read_scenario_ids(scenario_args):
+    """ Scenario ids, given directly or in files (one per line, as in scenario_id_list.txt) """
+    scenario_ids = []
+
+    for scenario_arg in scenario_args:
+        if os.path.isfile(scenario_arg):
+            with open(scenario_arg) as f:
+                scenario_ids.extend(line.strip() for line in f if line.strip())
+        else:
+            scenario_ids.append(scenario_arg)
+
+    return scenario_ids
+
+
+def load_scenarios(scenario_ids):
+    """ Read every scenario's tasks from tasks.db at once, so that workers don't contend for its lock """
+    scenarios = OrderedDict()
+
+    task_db = mrta.file_db.FileDB(TASKS_DB_FILENAME)
+    try:
+        for scenario_id in scenario_ids:
+            try:
+                scenarios[scenario_id] = task_db[scenario_id]
+            except KeyError:
+                print("Scenario {0} isn't in {1}! Skipping...".format(scenario_id, TASKS_DB_FILENAME))
+    finally:
+        task_db.close()
+
+    for tasks in scenarios.values():
+        for task in tasks:
+            # Some stored tasks don't have an arrival time (see Auctioneer.load_tasks_from_db())
+            if not hasattr(task, 'arrival_time'):
+                task.arrival_time = 0.0
+
+    return scenarios
+
+
+# Set in main() before workers start, and inherited by them
+_oracle = None
+_args = None
+
+
+def simulate(job):
+    """
+    Run every mechanism on one scenario and start config. Runs in a worker.
+
+    :param tuple job: (scenario_id, tasks, start config name, start points)
+    :return: a row (list of values, in the order of parse_stats_csv.field_names) for each run that finished
+    """
+    scenario_id, tasks, start_config, starts = job
+
+    start_poses = [mrta_robot_controller.RobotController._point_to_pose(mrta.Point(x, y)) for x, y in starts]
+    path_costs = PathCosts(_oracle, start_poses + [t.location for t in tasks])
+
+    rows = []
+    for mechanism in _args.mechanisms:
+        simulation = Simulation(mechanism,
+                                copy.deepcopy(tasks),
+                                start_poses,
+                                path_costs,
+                                speed=_args.speed,
+                                time_limit=_args.time_limit,
+                                wd_time_budget=_args.wd_time_budget,
+                                opt_objective=_args.opt_objective)
+
+        if not simulation.run():
+            print("{0} {1} {2}: timed out! Skipping...".format(scenario_id, start_config, mechanism))
+            continue
+
+        row_fields = simulation.stats()
+        row_fields['DATETIME'] = datetime.datetime.now().strftime('%Y-%m-%d-%H-%M-%S')
+        row_fields['MAP'] = _args.map
+        row_fields['START_CONFIG'] = start_config
+        row_fields['MECHANISM'] = mechanism
+        row_fields['SCENARIO_ID'] = scenario_id
+
+        rows.append([row_fields[fn] for fn in parse_stats_csv.field_names])
+
+    return rows
+
+
+def main(args):
+    global _oracle, _args
+    _args = args
+
+    logging.basicConfig(format='%(message)s')
+    logging.getLogger('rosout').setLevel(logging.INFO if args.verbose else logging.WARNING)
+
+    start_configs = read_start_configs(args.map, args.starts)
+    scenarios = load_scenarios(read_scenario_ids(args.scenarios))
+
+    _oracle = mrta.cost_oracle.CostOracle(maps[args.map]['yaml'])
+
+    jobs = [(scenario_id, tasks, start_config, starts)
+            for scenario_id, tasks in scenarios.items()
+            for start_config, starts in start_configs.items()]
+
+    print("Simulating {0} runs ({1} scenarios x {2} start configs x {3} mechanisms)...".format(
+        len(jobs) * len(args.mechanisms), len(scenarios), len(start_configs), len(args.mechanisms)))
+
+    csv_file = csv.writer(open(args.output, 'wb'))
+    csv_file.writerow(parse_stats_csv.field_names)
+
+    start = time.time()
+
+    if args.jobs > 1:
+        pool = multiprocessing.Pool(args.jobs)
+        results = pool.imap_unordered(simulate, jobs)
+    else:
+        pool = None
+        results = itertools.imap(simulate, jobs)
+
+    run_count = 0
+    for rows in results:
+        csv_file.writerows(rows)
+        run_count += len(rows)
+
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    print("Wrote {0} runs to {1} in {2:.1f} seconds".format(run_count, args.output, time.time() - start))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate multirobot task-allocation experiments, without ROS.')
+
+    parser.add_argument('map',
+                        choices=[m for m in maps if isinstance(maps[m], dict)],
+                        help='Map through which the robots move.')
+    parser.add_argument('mechanisms',
+                        nargs='+',
+                        choices=MECHANISMS,
+                        help='Mechanism(s) to allocate tasks.')
+    parser.add_argument('-s', '--starts',
+                        action='append',
+                        required=True,
+                        help='A start config (e.g., clustered), or a file of start poses (x1 y1 x2 y2 x3 y3 per line).')
+    parser.add_argument('-t', '--scenarios',
+                        action='append',
+                        required=True,
+                        help='A scenario id in {0}, or a file of them (one per line).'.format(TASKS_DB_FILENAME))
+    parser.add_argument('-o', '--output',
+                        default=DEFAULT_CSV_FILENAME,
+                        help="Name of the output .csv file")
+    parser.add_argument('-j', '--jobs',
+                        type=int,
+                        default=multiprocessing.cpu_count(),
+                        help='Number of runs to simulate in parallel.')
+    parser.add_argument('--speed',
+                        type=float,
+                        default=DEFAULT_SPEED,
+                        help='Robot speed, in meters per second.')
+    parser.add_argument('--time_limit',
+                        type=float,
+                        default=DEFAULT_TIME_LIMIT,
+                        help='Simulated seconds after which a run times out.')
+    parser.add_argument('--wd_time_budget',
+                        type=float,
+                        default=mrta_auctioneer.DEFAULT_WD_TIME_BUDGET,
+                        help='Seconds that SUM/MAX winner determination may take (0 to always find an optimal allocation).')
+    parser.add_argument('--opt_objective',
+                        choices=['SUM', 'MAX'],
+                        default=mrta_auctioneer.DEFAULT_OPT_OBJECTIVE,
+                        help='What OPT minimizes.')
+    parser.add_argument('-v', '--verbose',
+                        action='store_true',
+                        help="Log what the auctioneer and robots do.")
+
+    main(parser.parse_args())